@@ -34,6 +34,7 @@ setup(
     ],
     keywords="amplitude, python, backend",
     install_requires=["dataclasses-json>=0.6.7","amplitude_analytics>=1.1.1","sseclient-py~=1.8.0"],
+    extras_require={"mmh3": ["mmh3>=3.0.0"]},
     package_dir={"": "src"},
     packages=["amplitude_experiment"],
     include_package_data=True,
@@ -15,3 +15,5 @@ from .local.config import LocalEvaluationConfig
 from .server_zone import ServerZone
 from .assignment import AssignmentConfig
 from .cohort.cohort_sync_config import CohortSyncConfig
+from .local.flag_snapshot_config import FlagSnapshotConfig
+from .local.evaluation_cache_config import EvaluationCacheConfig
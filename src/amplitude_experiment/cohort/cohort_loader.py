@@ -7,6 +7,7 @@ from .cohort import Cohort
 from .cohort_download_api import CohortDownloadApi
 from .cohort_storage import CohortStorage
 from ..exception import CohortsDownloadException
+from ..util.fork import register_after_fork
 
 
 class CohortLoader:
@@ -15,11 +16,22 @@ class CohortLoader:
         self.cohort_storage = cohort_storage
         self.jobs: Dict[str, Future] = {}
         self.lock_jobs = threading.Lock()
-        self.executor = ThreadPoolExecutor(
+        self.executor = self.__create_executor()
+        register_after_fork(self._reinit_after_fork)
+
+    @staticmethod
+    def __create_executor() -> ThreadPoolExecutor:
+        return ThreadPoolExecutor(
             max_workers=32,
             thread_name_prefix='CohortLoaderExecutor'
         )
 
+    def _reinit_after_fork(self):
+        # The executor's workers do not exist in the child, and jobs in flight at fork time never complete there.
+        self.jobs = {}
+        self.lock_jobs = threading.Lock()
+        self.executor = self.__create_executor()
+
     def load_cohort(self, cohort_id: str) -> Future:
         with self.lock_jobs:
             if cohort_id not in self.jobs:
@@ -0,0 +1,35 @@
+from typing import List, Set
+
+from .cohort_storage import CohortStorage
+from ..evaluation.select import MembershipView
+
+
+class CohortMembership(MembershipView):
+    """
+    Cohorts a user or group belongs to, as the cohort_ids of an evaluation context. Membership is looked up in the
+    cohort storage only for the cohort ids of the conditions the engine reaches, and only among the cohorts targeted
+    by the flags being evaluated. Each cohort is looked up at most once per evaluation.
+    """
+
+    def __init__(self, cohort_storage: CohortStorage, group_type: str, group_name: str, cohort_ids: Set[str]):
+        self.cohort_storage = cohort_storage
+        self.group_type = group_type
+        self.group_name = group_name
+        self.cohort_ids = cohort_ids
+        self._checked: Set[str] = set()
+        self._members: Set[str] = set()
+
+    def contains_any(self, values: List[str]) -> bool:
+        self._resolve(self.cohort_ids.intersection(values))
+        return any(value in self._members for value in values)
+
+    def to_list(self) -> List[str]:
+        self._resolve(self.cohort_ids)
+        return list(self._members)
+
+    def _resolve(self, cohort_ids: Set[str]):
+        unchecked = cohort_ids - self._checked
+        if unchecked:
+            self._members.update(self.cohort_storage.get_cohorts_for_group(self.group_type, self.group_name,
+                                                                           unchecked))
+            self._checked.update(unchecked)
@@ -2,6 +2,7 @@ from typing import Dict, Set, Optional
 from threading import RLock
 
 from .cohort import Cohort, USER_GROUP_TYPE
+from ..util.fork import register_after_fork
 
 
 class CohortStorage:
@@ -26,12 +27,24 @@ class CohortStorage:
     def get_cohort_ids(self) -> Set[str]:
         raise NotImplementedError
 
+    def get_revision(self) -> Optional[int]:
+        """
+        A value which changes whenever a cohort is put or deleted, or None if the storage does not track changes.
+        Local evaluation results are only cached for storages which track changes.
+        """
+        return None
+
 
 class InMemoryCohortStorage(CohortStorage):
     def __init__(self):
         self.lock = RLock()
         self.group_to_cohort_store: Dict[str, Set[str]] = {}
         self.cohort_store: Dict[str, Cohort] = {}
+        self.revision = 0
+        register_after_fork(self._reinit_after_fork)
+
+    def _reinit_after_fork(self):
+        self.lock = RLock()
 
     def get_cohort(self, cohort_id: str):
         with self.lock:
@@ -46,10 +59,10 @@ class InMemoryCohortStorage(CohortStorage):
     def get_cohorts_for_group(self, group_type: str, group_name: str, cohort_ids: Set[str]) -> Set[str]:
         result = set()
         with self.lock:
-            group_type_cohorts = self.group_to_cohort_store.get(group_type, {})
-            for cohort_id in group_type_cohorts:
-                members = self.cohort_store.get(cohort_id).member_ids
-                if cohort_id in cohort_ids and group_name in members:
+            # Lookups are usually for the few cohorts of one condition, so iterate those rather than the group's.
+            for cohort_id in cohort_ids:
+                cohort = self.cohort_store.get(cohort_id)
+                if cohort is not None and cohort.group_type == group_type and group_name in cohort.member_ids:
                     result.add(cohort_id)
         return result
 
@@ -59,6 +72,7 @@ class InMemoryCohortStorage(CohortStorage):
                 self.group_to_cohort_store[cohort.group_type] = set()
             self.group_to_cohort_store[cohort.group_type].add(cohort.id)
             self.cohort_store[cohort.id] = cohort
+            self.revision += 1
 
     def delete_cohort(self, group_type: str, cohort_id: str):
         with self.lock:
@@ -67,7 +81,11 @@ class InMemoryCohortStorage(CohortStorage):
                 group_cohorts.remove(cohort_id)
             if cohort_id in self.cohort_store:
                 del self.cohort_store[cohort_id]
+                self.revision += 1
 
     def get_cohort_ids(self):
         with self.lock:
             return set(self.cohort_store.keys())
+
+    def get_revision(self) -> int:
+        return self.revision
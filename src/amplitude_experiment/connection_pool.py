@@ -1,10 +1,99 @@
+import bisect
+import heapq
+import http.client
+import itertools
 import threading
 import time
 import logging
-from typing import Any
+import ssl
+import weakref
+from dataclasses import dataclass
+from typing import Any, List, Optional
 
 from http.client import HTTPConnection, HTTPResponse, HTTPSConnection
 
+from .util.fork import register_after_fork
+
+
+# Upper bounds, in milliseconds, of the acquire wait and request latency histogram buckets. A final bucket counts
+# everything above the last bound.
+LATENCY_BUCKETS_MILLIS = [1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+# Connect timeout of prewarmed connections when the pool has no read timeout.
+PREWARM_CONNECT_TIMEOUT_SECONDS = 10
+
+
+class ConnectionPoolListener:
+    """
+    Optional callbacks invoked by HTTPConnectionPool. Override the methods of interest. Callbacks run on the thread
+    using the pool, after it released the pool's lock, so they should be fast. Exceptions raised by callbacks are
+    logged and otherwise ignored.
+    """
+
+    def on_acquire(self, wait_seconds: float, in_use: int, idle: int) -> None:
+        """Called after a connection is handed out, with the time spent waiting for it and the pool gauges."""
+        pass
+
+    def on_acquire_timeout(self, wait_seconds: float) -> None:
+        """Called when acquire gives up because the pool stayed exhausted."""
+        pass
+
+    def on_connection_created(self) -> None:
+        pass
+
+    def on_connection_closed(self, count: int) -> None:
+        pass
+
+    def on_request(self, latency_seconds: float, error: Optional[Exception]) -> None:
+        """Called after every request made on a pooled connection."""
+        pass
+
+
+@dataclass
+class ConnectionPoolStats:
+    """Point-in-time snapshot of HTTPConnectionPool counters and gauges."""
+    max_size: Optional[int]
+    in_use: int
+    idle: int
+    created: int
+    closed: int
+    recreated: int
+    acquired: int
+    acquire_waits: int
+    acquire_timeouts: int
+    acquire_wait_seconds: float
+    acquire_wait_histogram: List[int]
+    requests: int
+    request_errors: int
+    request_seconds: float
+    request_latency_histogram: List[int]
+    prewarmed: int
+    tls_sessions_reused: int
+
+
+class _SessionReusingSSLContext:
+    """
+    Wraps the pool's SSLContext so the sockets HTTPSConnection wraps resume the pool's most recent TLS session, and
+    connections after the first skip the full handshake when the server supports session resumption. Everything
+    except wrap_socket is delegated to the wrapped context.
+    """
+
+    def __init__(self, pool: 'HTTPConnectionPool', context: ssl.SSLContext) -> None:
+        self._pool = pool
+        self._context = context
+
+    def wrap_socket(self, sock: Any, *args: Any, **kwargs: Any) -> ssl.SSLSocket:
+        if kwargs.get('session') is None:
+            kwargs['session'] = self._pool._tls_session
+        ssl_sock = self._context.wrap_socket(sock, *args, **kwargs)
+        if ssl_sock.session_reused:
+            with self._pool._stats_lock:
+                self._pool._tls_sessions_reused += 1
+        return ssl_sock
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._context, name)
+
 
 class WrapperHTTPConnection:
 
@@ -29,11 +118,14 @@ class WrapperHTTPConnection:
         self.pool.release(self)
 
     def request(self, *args: Any, **kwargs: Any) -> HTTPResponse:
+        start = time.monotonic()
         try:
             self.conn.request(*args, **kwargs)
             self.response = self.conn.getresponse()
+            self.pool._record_request(time.monotonic() - start, None)
             return self.response
         except Exception as e:
+            self.pool._record_request(time.monotonic() - start, e)
             self.close()
             raise e
 
@@ -45,7 +137,8 @@ class WrapperHTTPConnection:
 class HTTPConnectionPool:
 
     def __init__(self, host: str, port: int = None, max_size: int = None, idle_timeout: int = None,
-                 read_timeout: float = None, scheme: str = 'https') -> None:
+                 read_timeout: float = None, scheme: str = 'https',
+                 listener: ConnectionPoolListener = None, min_idle: int = 0) -> None:
         """
         A simple connection pool to reuse the http connections
         :param host: pass
@@ -54,6 +147,9 @@ class HTTPConnectionPool:
         :param idle_timeout: Idle timeout to clear the connection
         :param read_timeout: Read timeout with connection
         :param scheme: http or https
+        :param listener: Optional callbacks for pool instrumentation
+        :param min_idle: Connections to keep established and idle, opened in the background so requests do not pay
+            for the TCP and TLS handshakes. These connections are not closed by the idle timeout.
         """
         self.host = host
         self.port = port
@@ -61,49 +157,94 @@ class HTTPConnectionPool:
         self.idle_timeout = idle_timeout
         self.read_timeout = read_timeout
         self.scheme = scheme
+        self.min_idle = min_idle if max_size is None else min(min_idle, max_size)
+        # One context for every connection in the pool, so TLS sessions can be resumed across connections.
+        self._ssl_context = None if scheme == 'http:' else _SessionReusingSSLContext(self, _create_ssl_context())
+        self._tls_session = None
         self._lock = threading.Condition()
         self._pool = []
         self.conn_num = 0
         self.is_closed = False
-        self._clearer = None
+        self.listener = listener
+        self._stats_lock = threading.Lock()
+        self._created = 0
+        self._closed = 0
+        self._recreated = 0
+        self._acquired = 0
+        self._acquire_waits = 0
+        self._acquire_timeouts = 0
+        self._acquire_wait_seconds = 0.0
+        self._acquire_wait_histogram = [0] * (len(LATENCY_BUCKETS_MILLIS) + 1)
+        self._requests = 0
+        self._request_errors = 0
+        self._request_seconds = 0.0
+        self._request_latency_histogram = [0] * (len(LATENCY_BUCKETS_MILLIS) + 1)
+        self._prewarmed = 0
+        self._tls_sessions_reused = 0
+        self._prewarming = False
         self.start_clear_conn()
+        register_after_fork(self._reinit_after_fork)
 
     def acquire(self, blocking: bool = True, timeout: int = None) -> WrapperHTTPConnection:
         if self.is_closed:
             raise ConnectionPoolClosed
-        with self._lock:
-            if self.max_size is None or not self.is_full():
-                if self.is_pool_empty():
-                    self._put_connection(self._create_connection())
-            else:
-                if not blocking:
-                    if self.is_pool_empty():
-                        raise EmptyPoolError
-                elif timeout is None:
-                    while self.is_pool_empty():
-                        self._lock.wait()
-                elif timeout < 0:
-                    raise ValueError("'timeout' must be a non-negative number")
-                else:
-                    end_time = time.time() + timeout
-                    while self.is_pool_empty():
-                        remaining = end_time - time.time()
-                        if remaining <= 0:
-                            raise EmptyPoolError
-                        self._lock.wait(remaining)
-            return self._get_connection()
+        start = time.monotonic()
+        waited = False
+        # Listener callbacks are collected under the lock and called once it is released.
+        events = []
+        try:
+            with self._lock:
+                self._evict_idle_connections(events)
+                try:
+                    if self.max_size is None or not self.is_full():
+                        if self.is_pool_empty():
+                            self._put_connection(self._create_connection(events))
+                    else:
+                        if not blocking:
+                            if self.is_pool_empty():
+                                raise EmptyPoolError
+                        elif timeout is None:
+                            while self.is_pool_empty():
+                                waited = True
+                                self._lock.wait()
+                        elif timeout < 0:
+                            raise ValueError("'timeout' must be a non-negative number")
+                        else:
+                            end_time = time.time() + timeout
+                            while self.is_pool_empty():
+                                remaining = end_time - time.time()
+                                if remaining <= 0:
+                                    raise EmptyPoolError
+                                waited = True
+                                self._lock.wait(remaining)
+                    conn = self._get_connection()
+                except EmptyPoolError:
+                    self._record_acquire_timeout(time.monotonic() - start, events)
+                    raise
+                self._record_acquire(time.monotonic() - start, waited, events)
+                return conn
+        finally:
+            self._notify_listener(events)
 
     def release(self, conn: WrapperHTTPConnection) -> None:
         if self.is_closed:
             conn.close()
+            self._record_closed(1)
             return
-        with self._lock:
-            if not conn.is_available:
-                conn.close()
-                self.conn_num -= 1
-                conn = self._create_connection()
-            self._put_connection(conn)
-            self._lock.notify()
+        events = []
+        try:
+            with self._lock:
+                if not conn.is_available:
+                    conn.close()
+                    self.conn_num -= 1
+                    self._record_closed(1, events)
+                    with self._stats_lock:
+                        self._recreated += 1
+                    conn = self._create_connection(events)
+                self._put_connection(conn)
+                self._lock.notify()
+        finally:
+            self._notify_listener(events)
 
     def _get_connection(self) -> WrapperHTTPConnection:
         try:
@@ -114,11 +255,26 @@ class HTTPConnectionPool:
     def _put_connection(self, conn: WrapperHTTPConnection) -> None:
         conn.last_time = time.time()
         self._pool.append(conn)
+        self._remember_tls_session(conn)
+
+    def _remember_tls_session(self, conn: WrapperHTTPConnection) -> None:
+        # TLS 1.3 session tickets arrive after the handshake, so the session is read when a used connection
+        # returns to the pool rather than right after connecting.
+        session = getattr(conn.conn.sock, 'session', None)
+        if session is not None:
+            self._tls_session = session
 
-    def _create_connection(self) -> WrapperHTTPConnection:
+    def _create_connection(self, events: list) -> WrapperHTTPConnection:
+        """Must be called with the lock held; the listener is notified through events."""
         self.conn_num += 1
-        connection = HTTPConnection if self.scheme == 'http:' else HTTPSConnection
-        return WrapperHTTPConnection(self, connection(self.host, self.port, timeout=self.read_timeout))
+        with self._stats_lock:
+            self._created += 1
+        self._add_listener_event(events, 'on_connection_created')
+        if self.scheme == 'http:':
+            connection = HTTPConnection(self.host, self.port, timeout=self.read_timeout)
+        else:
+            connection = HTTPSConnection(self.host, self.port, timeout=self.read_timeout, context=self._ssl_context)
+        return WrapperHTTPConnection(self, connection)
 
     def is_pool_empty(self) -> bool:
         return len(self._pool) == 0
@@ -133,48 +289,223 @@ class HTTPConnectionPool:
             return
         self.is_closed = True
         self.stop_clear_conn()
-        pool, self._pool = self._pool, None
+        with self._lock:
+            pool, self._pool = self._pool, None
         for conn in pool:
             conn.close()
+        self._record_closed(len(pool))
 
     def clear_idle_conn(self) -> None:
         if self.is_closed:
             raise ConnectionPoolClosed
-        # Staring a thread to clear idle connections
-        threading.Thread(target=self._clear_idle_conn).start()
+        self._clear_idle_conn()
 
     def _clear_idle_conn(self) -> None:
-        if not self._lock.acquire(timeout=self.idle_timeout):
+        events = []
+        try:
+            with self._lock:
+                if self.is_closed:
+                    return
+                self._evict_idle_connections(events)
+        finally:
+            self._notify_listener(events)
+
+    def prewarm(self) -> int:
+        """
+        Open connections until at least min_idle are idle in the pool, without exceeding max_size. Connects outside
+        the pool lock, so concurrent acquires are not blocked by handshakes.
+            Returns:
+                The number of connections established.
+        """
+        events = []
+        with self._lock:
+            if self.is_closed:
+                return 0
+            missing = self.min_idle - len(self._pool)
+            if self.max_size is not None:
+                missing = min(missing, self.max_size - self.conn_num)
+            # Counted in conn_num while connecting, like connections in use.
+            conns = [self._create_connection(events) for _ in range(max(0, missing))]
+        self._notify_listener(events)
+        established = 0
+        connect_timeout = self.read_timeout if self.read_timeout is not None else PREWARM_CONNECT_TIMEOUT_SECONDS
+        for conn in conns:
+            try:
+                conn.conn.timeout = connect_timeout
+                conn.conn.connect()
+                conn.conn.timeout = self.read_timeout
+                conn.conn.sock.settimeout(self.read_timeout)
+            except Exception as e:
+                logging.getLogger("Amplitude").debug(f"[Experiment] Failed to prewarm connection: {e}")
+                conn.close()
+                with self._lock:
+                    self.conn_num -= 1
+                self._record_closed(1)
+                continue
+            with self._lock:
+                closed = self.is_closed
+                if not closed:
+                    self._put_connection(conn)
+                    self._lock.notify()
+            if closed:
+                conn.close()
+                self._record_closed(1)
+                continue
+            established += 1
+        if established:
+            with self._stats_lock:
+                self._prewarmed += established
+        return established
+
+    def _start_prewarm(self) -> None:
+        """Prewarm on a thread of its own, so slow handshakes never hold up the reaper shared by all pools."""
+        with self._lock:
+            if self._prewarming or self.is_closed or len(self._pool) >= self.min_idle:
+                return
+            self._prewarming = True
+        threading.Thread(target=self._prewarm_in_background, name='HTTPConnectionPoolPrewarm', daemon=True).start()
+
+    def _prewarm_in_background(self) -> None:
+        try:
+            self.prewarm()
+        except Exception as e:
+            logging.getLogger("Amplitude").debug(f"[Experiment] Failed to prewarm connections: {e}")
+        finally:
+            with self._lock:
+                self._prewarming = False
+
+    def _evict_idle_connections(self, events: list) -> None:
+        """
+        Close pooled connections idle for at least idle_timeout, except the min_idle most recently used ones. Must be
+        called with the lock held; the listener is notified through events.
+        """
+        if self.idle_timeout is None or self.is_pool_empty():
             return
         current_time = time.time()
-        if self.is_pool_empty():
-            pass
-        elif current_time - self._pool[-1].last_time >= self.idle_timeout:
-            self.conn_num -= len(self._pool)
-            self._pool.clear()
-        else:
-            left, right = 0, len(self._pool) - 1
-            while left < right:
-                mid = (left + right) // 2
-                if current_time - self._pool[mid].last_time >= self.idle_timeout:
-                    left = mid + 1
-                else:
-                    right = mid
-            self._pool = self._pool[left:]
-            self.conn_num -= left
-        self._lock.release()
+        # Connections are appended on release, so the pool is ordered from least to most recently used.
+        if current_time - self._pool[0].last_time < self.idle_timeout:
+            return
+        left, right = 0, len(self._pool)
+        while left < right:
+            mid = (left + right) // 2
+            if current_time - self._pool[mid].last_time >= self.idle_timeout:
+                left = mid + 1
+            else:
+                right = mid
+        # The pool keeps min_idle connections open, rather than closing and reopening them every idle_timeout.
+        left = min(left, len(self._pool) - self.min_idle)
+        if left <= 0:
+            return
+        expired, self._pool = self._pool[:left], self._pool[left:]
+        for conn in expired:
+            conn.close()
+        self.conn_num -= len(expired)
+        self._record_closed(len(expired), events)
 
     def start_clear_conn(self) -> None:
-        if self.idle_timeout is None:
-            return
-        self.clear_idle_conn()
-        self._clearer = threading.Timer(self.idle_timeout, self.start_clear_conn)
-        self._clearer.daemon = True
-        self._clearer.start()
+        if self.min_idle > 0:
+            _reaper.schedule(self, 0)
+        elif self.idle_timeout is not None:
+            _reaper.schedule(self, self.idle_timeout)
 
     def stop_clear_conn(self) -> None:
-        if self._clearer is not None:
-            self._clearer.cancel()
+        # The shared reaper drops closed pools when their deadline comes up.
+        pass
+
+    def _reinit_after_fork(self) -> None:
+        # Pooled sockets are shared with the parent process; closing them here only releases this process's file
+        # descriptors. Connections which were in use belonged to threads that do not exist in this process.
+        self._lock = threading.Condition()
+        self._stats_lock = threading.Lock()
+        self._prewarming = False
+        if self.is_closed:
+            return
+        pool, self._pool = self._pool, []
+        for conn in pool:
+            conn.close()
+        self.conn_num = 0
+        self.start_clear_conn()
+
+    def stats(self) -> ConnectionPoolStats:
+        """
+        Snapshot of the pool's counters and gauges: connections in use and idle, connection churn, acquire waits
+        (including how often the pool was exhausted) and request latency. Histograms count observations per
+        LATENCY_BUCKETS_MILLIS bucket, with a final overflow bucket.
+        """
+        with self._lock:
+            idle = 0 if self._pool is None else len(self._pool)
+            in_use = max(0, self.conn_num - idle)
+        with self._stats_lock:
+            return ConnectionPoolStats(
+                max_size=self.max_size,
+                in_use=in_use,
+                idle=idle,
+                created=self._created,
+                closed=self._closed,
+                recreated=self._recreated,
+                acquired=self._acquired,
+                acquire_waits=self._acquire_waits,
+                acquire_timeouts=self._acquire_timeouts,
+                acquire_wait_seconds=self._acquire_wait_seconds,
+                acquire_wait_histogram=list(self._acquire_wait_histogram),
+                requests=self._requests,
+                request_errors=self._request_errors,
+                request_seconds=self._request_seconds,
+                request_latency_histogram=list(self._request_latency_histogram),
+                prewarmed=self._prewarmed,
+                tls_sessions_reused=self._tls_sessions_reused,
+            )
+
+    def _record_acquire(self, wait_seconds: float, waited: bool, events: list) -> None:
+        with self._stats_lock:
+            self._acquired += 1
+            if waited:
+                self._acquire_waits += 1
+            self._acquire_wait_seconds += wait_seconds
+            self._acquire_wait_histogram[_latency_bucket(wait_seconds)] += 1
+        idle = len(self._pool)
+        self._add_listener_event(events, 'on_acquire', wait_seconds, self.conn_num - idle, idle)
+
+    def _record_acquire_timeout(self, wait_seconds: float, events: list) -> None:
+        with self._stats_lock:
+            self._acquire_timeouts += 1
+        self._add_listener_event(events, 'on_acquire_timeout', wait_seconds)
+
+    def _record_closed(self, count: int, events: Optional[list] = None) -> None:
+        if count <= 0:
+            return
+        with self._stats_lock:
+            self._closed += count
+        if events is None:
+            self._call_listener('on_connection_closed', count)
+        else:
+            self._add_listener_event(events, 'on_connection_closed', count)
+
+    def _record_request(self, latency_seconds: float, error: Optional[Exception]) -> None:
+        with self._stats_lock:
+            self._requests += 1
+            if error is not None:
+                self._request_errors += 1
+            self._request_seconds += latency_seconds
+            self._request_latency_histogram[_latency_bucket(latency_seconds)] += 1
+        self._call_listener('on_request', latency_seconds, error)
+
+    def _add_listener_event(self, events: list, callback: str, *args: Any) -> None:
+        if self.listener is not None:
+            events.append((callback, args))
+
+    def _notify_listener(self, events: list) -> None:
+        """Call the listener callbacks collected in events. Must be called without the lock held."""
+        for callback, args in events:
+            self._call_listener(callback, *args)
+
+    def _call_listener(self, callback: str, *args: Any) -> None:
+        if self.listener is None:
+            return
+        try:
+            getattr(self.listener, callback)(*args)
+        except Exception as e:
+            logging.getLogger("Amplitude").warning(f"[Experiment] Connection pool listener {callback} failed: {e}")
 
     def __enter__(self) -> 'HTTPConnectionPool':
         return self
@@ -183,6 +514,79 @@ class HTTPConnectionPool:
         self.close()
 
 
+class _IdleConnectionReaper:
+    """
+    Single background thread closing idle connections, and reopening connections up to min_idle, for every
+    HTTPConnectionPool in the process. Pools are kept in a heap ordered by their next idle check deadline and
+    referenced weakly, so an unreachable pool is simply dropped. The thread starts on the first scheduled pool and
+    exits when no pools remain.
+    """
+
+    def __init__(self):
+        self._lock = threading.Condition()
+        self._heap = []
+        self._counter = itertools.count()
+        self._thread: Optional[threading.Thread] = None
+        register_after_fork(self._reinit_after_fork)
+
+    def _reinit_after_fork(self) -> None:
+        # Pools reschedule themselves after the reaper is reinitialized, see HTTPConnectionPool._reinit_after_fork.
+        self._lock = threading.Condition()
+        self._heap = []
+        self._thread = None
+
+    def schedule(self, pool: 'HTTPConnectionPool', delay: float) -> None:
+        with self._lock:
+            heapq.heappush(self._heap, (time.monotonic() + delay, next(self._counter), weakref.ref(pool)))
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='HTTPConnectionPoolReaper', daemon=True)
+                self._thread.start()
+            self._lock.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                while True:
+                    if not self._heap:
+                        self._thread = None
+                        return
+                    deadline = self._heap[0][0]
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._lock.wait(remaining)
+                _, _, pool_ref = heapq.heappop(self._heap)
+            pool = pool_ref()
+            if pool is None or pool.is_closed:
+                continue
+            try:
+                pool._clear_idle_conn()
+                pool._start_prewarm()
+            except Exception as e:
+                logging.getLogger("Amplitude").debug(f"[Experiment] Failed to clear idle connections: {e}")
+            if not pool.is_closed and pool.idle_timeout is not None:
+                self.schedule(pool, pool.idle_timeout)
+            del pool
+
+
+_reaper = _IdleConnectionReaper()
+
+
+def _create_ssl_context() -> ssl.SSLContext:
+    # Start from the context http.client uses by default, so overrides of ssl._create_default_https_context apply.
+    create_https_context = getattr(http.client, '_create_https_context', None)
+    if create_https_context is not None:
+        return create_https_context(11)
+    context = ssl._create_default_https_context()
+    if ssl.HAS_ALPN:
+        context.set_alpn_protocols(['http/1.1'])
+    return context
+
+
+def _latency_bucket(seconds: float) -> int:
+    return bisect.bisect_left(LATENCY_BUCKETS_MILLIS, seconds * 1000)
+
+
 class EmptyPoolError(Exception):
     pass
 
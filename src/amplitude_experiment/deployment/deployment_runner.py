@@ -1,5 +1,5 @@
 import logging
-from typing import Optional
+from typing import Optional, Union
 import threading
 
 from ..flag.flag_config_updater import FlagConfigPoller, FlagConfigStreamer, FlagConfigUpdaterFallbackRetryWrapper
@@ -7,9 +7,10 @@ from ..local.config import LocalEvaluationConfig
 from ..cohort.cohort_loader import CohortLoader
 from ..cohort.cohort_storage import CohortStorage
 from ..flag.flag_config_api import FlagConfigApi, FlagConfigStreamApi
+from ..flag.flag_config_async_stream_api import AsyncFlagConfigStreamApi
 from ..flag.flag_config_storage import FlagConfigStorage
 from ..local.poller import Poller
-from ..util.flag_config import get_all_cohort_ids_from_flags
+from ..util.fork import register_after_fork
 
 DEFAULT_STREAM_UPDATER_RETRY_DELAY_MILLIS = 15000
 DEFAULT_STREAM_UPDATER_RETRY_DELAY_MAX_JITTER_MILLIS = 1000
@@ -20,25 +21,32 @@ class DeploymentRunner:
             self,
             config: LocalEvaluationConfig,
             flag_config_api: FlagConfigApi,
-            flag_config_stream_api: Optional[FlagConfigStreamApi],
+            flag_config_stream_api: Optional[Union[FlagConfigStreamApi, AsyncFlagConfigStreamApi]],
             flag_config_storage: FlagConfigStorage,
             cohort_storage: CohortStorage,
             logger: logging.Logger,
             cohort_loader: Optional[CohortLoader] = None,
+            update_flag_configs: bool = True,
     ):
+        """
+        Keeps flag configs and their cohorts up to date. With update_flag_configs disabled, flag configs are
+        maintained elsewhere (e.g. read from a shared snapshot) and only the cohorts they target are kept up to date.
+        """
         self.config = config
         self.flag_config_api = flag_config_api
         self.flag_config_storage = flag_config_storage
         self.cohort_storage = cohort_storage
         self.cohort_loader = cohort_loader
         self.lock = threading.Lock()
-        self.flag_updater = FlagConfigUpdaterFallbackRetryWrapper(
-            FlagConfigPoller(flag_config_api, flag_config_storage, cohort_loader, cohort_storage, config, logger),
-            None,
-            0, 0, config.flag_config_polling_interval_millis, 0,
-            logger
-            )
-        if flag_config_stream_api:
+        self.flag_updater = None
+        if update_flag_configs:
+            self.flag_updater = FlagConfigUpdaterFallbackRetryWrapper(
+                FlagConfigPoller(flag_config_api, flag_config_storage, cohort_loader, cohort_storage, config, logger),
+                None,
+                0, 0, config.flag_config_polling_interval_millis, 0,
+                logger
+                )
+        if update_flag_configs and flag_config_stream_api:
             self.flag_updater = FlagConfigUpdaterFallbackRetryWrapper(
                 FlagConfigStreamer(flag_config_stream_api, flag_config_storage, cohort_loader, cohort_storage, logger),
                 self.flag_updater,
@@ -52,20 +60,28 @@ class DeploymentRunner:
             self.cohort_poller = Poller(self.config.cohort_sync_config.cohort_polling_interval_millis / 1000,
                                         self.__update_cohorts)
         self.logger = logger
+        register_after_fork(self._reinit_after_fork)
+
+    def _reinit_after_fork(self):
+        self.lock = threading.Lock()
 
     def start(self):
         with self.lock:
-            self.flag_updater.start(None)
+            if self.flag_updater:
+                self.flag_updater.start(None)
+            elif self.cohort_loader:
+                self.__update_cohorts()
             if self.cohort_loader:
                 self.cohort_poller.start()
 
     def stop(self):
-        self.flag_updater.stop()
+        if self.flag_updater:
+            self.flag_updater.stop()
         if self.cohort_poller:
             self.cohort_poller.stop()
 
     def __update_cohorts(self):
-        cohort_ids = get_all_cohort_ids_from_flags(list(self.flag_config_storage.get_flag_configs().values()))
+        cohort_ids = set().union(*self.flag_config_storage.get_snapshot().cohort_ids_by_flag.values())
         try:
             self.cohort_loader.download_cohorts(cohort_ids).result()
         except Exception as e:
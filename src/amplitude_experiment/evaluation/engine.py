@@ -1,16 +1,32 @@
-from typing import Any, Callable, List, Optional, Set, Union, Dict
+from bisect import bisect_right
+from types import MappingProxyType
+from typing import Any, Callable, List, Mapping, Optional, Set, Tuple, Union, Dict
 import json
 import re
+import weakref
 
+from .hash_cache import BucketingHashCache
 from .murmur3 import hash32x86
-from .select import select
-from .types import EvaluationOperator, EvaluationFlag, EvaluationVariant, EvaluationSegment, EvaluationCondition
+from .select import MembershipView, select
+from .types import EvaluationOperator, EvaluationFlag, EvaluationVariant, EvaluationSegment, EvaluationCondition, \
+    EvaluationBucket
 from .semantic_version import SemanticVersion
 
 
 class EvaluationEngine:
     """Feature flag evaluation engine."""
 
+    def __init__(self, hash_cache: Optional[BucketingHashCache] = None):
+        """
+        Parameters:
+            hash_cache (BucketingHashCache): Optional cache of bucketing hashes, shared by all evaluations.
+        """
+        self.hash_cache = hash_cache
+        # Values derived from flag configs, kept for as long as the config objects they were derived from.
+        self._metadata = IdentityMemo()
+        self._filter_values = IdentityMemo()
+        self._ranges = IdentityMemo()
+
     def evaluate(
             self,
             context: Dict[str, Any],
@@ -40,23 +56,52 @@ class EvaluationEngine:
         for segment in flag.segments:
             result = self.evaluate_segment(target, flag, segment)
             if result:
-                # Merge all metadata into the result
-                metadata = {}
-                if flag.metadata:
-                    metadata.update(flag.metadata)
-                if segment.metadata:
-                    metadata.update(segment.metadata)
-                if result.metadata:
-                    metadata.update(result.metadata)
-                result = EvaluationVariant(
-                    key=result.key,
-                    value=result.value,
-                    payload=result.payload,
-                    metadata=metadata
-                )
+                result = self.get_result(flag, segment, result)
                 break
         return result
 
+    def get_result(
+            self,
+            flag: EvaluationFlag,
+            segment: EvaluationSegment,
+            variant: EvaluationVariant
+    ) -> EvaluationVariant:
+        """
+        Result of a flag for a variant of one of its segments, with the flag, segment and variant metadata merged.
+        The merged metadata is read-only and shared by every result for the same flag, segment and variant.
+        """
+        return EvaluationVariant(
+            key=variant.key,
+            value=variant.value,
+            payload=variant.payload,
+            metadata=self.get_result_metadata(flag, segment, variant)
+        )
+
+    def get_result_metadata(
+            self,
+            flag: EvaluationFlag,
+            segment: EvaluationSegment,
+            variant: EvaluationVariant
+    ) -> Mapping[str, Any]:
+        """Merged metadata of a flag, one of its segments and a variant, built once per segment and variant."""
+        merged = self._metadata.get(segment)
+        if merged is None:
+            merged = self._metadata.put(segment, {})
+        entry = merged.get(id(variant))
+        if entry is not None and entry[0] is variant:
+            return entry[1]
+        # Merge all metadata into the result
+        metadata = {}
+        if flag.metadata:
+            metadata.update(flag.metadata)
+        if segment.metadata:
+            metadata.update(segment.metadata)
+        if variant.metadata:
+            metadata.update(variant.metadata)
+        metadata = MappingProxyType(metadata)
+        merged[id(variant)] = (variant, metadata)
+        return metadata
+
     def evaluate_segment(
             self,
             target: Dict[str, Any],
@@ -109,32 +154,53 @@ class EvaluationEngine:
     ) -> bool:
         """Match a single condition."""
         prop_value = select(target, condition.selector)
+        filter_values = self.get_filter_values(condition)
+        if isinstance(prop_value, MembershipView):
+            if condition.op in (EvaluationOperator.SET_CONTAINS_ANY, EvaluationOperator.SET_DOES_NOT_CONTAIN_ANY):
+                return self.match_membership(prop_value, condition.op, filter_values)
+            prop_value = prop_value.to_list()
 
         # Null values use dedicated null matching. For non-null values, we try
         # to coerce to a string list first: set operators require a list, and
         # non-set operators use any-match semantics over the elements when the
         # value is multi-valued. Scalars fall through to single-string matching.
         if not prop_value:
-            return self.match_null(condition.op, condition.values)
+            return self.match_null(condition.op, filter_values)
 
         prop_value_string_list = self.coerce_string_array(prop_value)
         if self.is_set_operator(condition.op):
             if not prop_value_string_list:
                 return False
-            return self.match_set(prop_value_string_list, condition.op, condition.values)
+            return self.match_set(prop_value_string_list, condition.op, filter_values)
         if prop_value_string_list is not None:
             return self.match_strings_non_set(
-                prop_value_string_list, condition.op, condition.values
+                prop_value_string_list, condition.op, filter_values
             )
         prop_value_string = self.coerce_string(prop_value)
         if prop_value_string is not None:
             return self.match_string(
                 prop_value_string,
                 condition.op,
-                condition.values
+                filter_values
             )
         return False
 
+    def get_filter_values(self, condition: EvaluationCondition) -> 'FilterValues':
+        """Filter values of a condition, built once per condition."""
+        filter_values = self._filter_values.get(condition)
+        if filter_values is None:
+            filter_values = self._filter_values.put(condition, FilterValues(condition.values))
+        return filter_values
+
+    def match_membership(self, membership: MembershipView, op: str, filter_values: List[str]) -> bool:
+        """Match `set contains any` and `set does not contain any` against a lazily resolved set."""
+        if membership.contains_any(filter_values):
+            return op == EvaluationOperator.SET_CONTAINS_ANY
+        # An empty set matches like a null value, which only differs when the filter values contain '(none)'.
+        if self.contains_none(filter_values) and not membership.to_list():
+            return self.match_null(op, filter_values)
+        return op == EvaluationOperator.SET_DOES_NOT_CONTAIN_ANY
+
     def get_hash(self, key: str) -> int:
         """Generate a hash value from a key."""
         return hash32x86(key)
@@ -161,11 +227,25 @@ class EvaluationEngine:
 
         # Salt and hash the value, and compute the allocation and distribution
         # values
-        key_to_hash = f"{segment.bucket.salt}/{bucketing_value}"
-        hash_value = self.get_hash(key_to_hash)
+        hash_cache = self.hash_cache
+        hash_value = hash_cache.get(segment.bucket.salt, bucketing_value) if hash_cache is not None else None
+        if hash_value is None:
+            key_to_hash = f"{segment.bucket.salt}/{bucketing_value}"
+            hash_value = self.get_hash(key_to_hash)
+            if hash_cache is not None:
+                hash_cache.put(segment.bucket.salt, bucketing_value, hash_value)
         allocation_value = hash_value % 100
         distribution_value = hash_value // 100
 
+        allocation_ranges = self.get_allocation_ranges(segment.bucket)
+        if allocation_ranges is not None:
+            distribution_ranges = allocation_ranges.find(allocation_value)
+            if distribution_ranges is not None:
+                variant = distribution_ranges.find(distribution_value)
+                if variant is not None:
+                    return variant
+            return segment.variant
+
         for allocation in segment.bucket.allocations:
             allocation_start = allocation.range[0]
             allocation_end = allocation.range[1]
@@ -182,6 +262,26 @@ class EvaluationEngine:
 
         return segment.variant
 
+    def get_allocation_ranges(self, bucket: EvaluationBucket) -> Optional['Ranges']:
+        """
+        Allocation ranges of a bucket, mapping to the distribution ranges of each allocation, or None if any of them
+        overlap. Built once per bucket.
+        """
+        ranges = self._ranges.get(bucket, bucket)
+        if ranges is bucket:
+            try:
+                ranges = Ranges([(allocation.range[0], allocation.range[1],
+                                  Ranges([(distribution.range[0], distribution.range[1], distribution.variant)
+                                          for distribution in allocation.distributions]))
+                                 for allocation in bucket.allocations])
+                if not ranges.valid or not all(distribution_ranges.valid for distribution_ranges in ranges.values):
+                    ranges = None
+            except (IndexError, TypeError):
+                ranges = None
+            # Overlapping or malformed ranges are matched by scanning them in order, as before.
+            self._ranges.put(bucket, ranges)
+        return ranges
+
     def match_null(self, op: str, filter_values: List[str]) -> bool:
         """Match null values against filter values."""
         contains_none = self.contains_none(filter_values)
@@ -291,6 +391,12 @@ class EvaluationEngine:
 
     def matches_is(self, prop_value: str, filter_values: List[str]) -> bool:
         """Match exact string values."""
+        if isinstance(filter_values, FilterValues):
+            if filter_values.contains_booleans:
+                lower = prop_value.lower()
+                if lower in ('true', 'false'):
+                    return lower in filter_values.lower_set
+            return prop_value in filter_values.value_set
         if self.contains_booleans(filter_values):
             lower = prop_value.lower()
             if lower in ('true', 'false'):
@@ -300,6 +406,8 @@ class EvaluationEngine:
     def matches_contains(self, prop_value: str, filter_values: List[str]) -> bool:
         """Match substring values."""
         prop_value_lower = prop_value.lower()
+        if isinstance(filter_values, FilterValues):
+            return any(filter_value in prop_value_lower for filter_value in filter_values.lower_values)
         return any(filter_value.lower() in prop_value_lower for filter_value in filter_values)
 
     def matches_comparable(
@@ -366,10 +474,14 @@ class EvaluationEngine:
 
     def contains_none(self, filter_values: List[str]) -> bool:
         """Check if filter values contain '(none)'."""
+        if isinstance(filter_values, FilterValues):
+            return filter_values.contains_none
         return any(filter_value == "(none)" for filter_value in filter_values)
 
     def contains_booleans(self, filter_values: List[str]) -> bool:
         """Check if filter values contain boolean strings."""
+        if isinstance(filter_values, FilterValues):
+            return filter_values.contains_booleans
         return any(filter_value.lower() in ('true', 'false') for filter_value in filter_values)
 
     def parse_number(self, value: str) -> Optional[float]:
@@ -383,6 +495,9 @@ class EvaluationEngine:
         """Coerce value to string, handling special cases."""
         if value is None:
             return None
+        if isinstance(value, MappingProxyType):
+            # Metadata of earlier results, selected through 'result'.
+            value = dict(value)
         if isinstance(value, (dict, list)):
             return json.dumps(value)
         return str(value)
@@ -418,15 +533,102 @@ class EvaluationEngine:
     def set_equals(self, xa: List[str], ya: List[str]) -> bool:
         """Check if two string lists are equal as sets."""
         xs: Set[str] = set(xa)
-        ys: Set[str] = set(ya)
+        ys: Set[str] = ya.value_set if isinstance(ya, FilterValues) else set(ya)
         return len(xs) == len(ys) and all(y in xs for y in ys)
 
     def matches_set_contains_all(self, prop_values: List[str], filter_values: List[str]) -> bool:
         """Check if prop values contain all filter values."""
         if len(prop_values) < len(filter_values):
             return False
+        if isinstance(filter_values, FilterValues):
+            # Like matches_is with the prop values as filter values: boolean strings match case-insensitively if
+            # any prop value is a boolean string.
+            prop_set = set(prop_values)
+            prop_booleans = {value.lower() for value in prop_values if value.lower() in ('true', 'false')}
+            for filter_value, filter_value_lower in zip(filter_values, filter_values.lower_values):
+                if filter_value not in prop_set and \
+                        not (prop_booleans and filter_value_lower in prop_booleans):
+                    return False
+            return True
         return all(self.matches_is(filter_value, prop_values) for filter_value in filter_values)
 
     def matches_set_contains_any(self, prop_values: List[str], filter_values: List[str]) -> bool:
         """Check if prop values contain any filter values."""
+        if isinstance(filter_values, FilterValues):
+            # A boolean string prop value matching a boolean filter value case-insensitively is the only match
+            # which is not exact.
+            value_set = filter_values.value_set
+            boolean_set = filter_values.boolean_set
+            return any(prop_value in value_set or (boolean_set and prop_value.lower() in boolean_set)
+                       for prop_value in prop_values)
         return any(self.matches_is(filter_value, prop_values) for filter_value in filter_values)
+
+
+class IdentityMemo:
+    """
+    Values computed from objects, kept for as long as the objects live, like a WeakKeyDictionary keyed by identity.
+    Flag config types are dataclasses compared by value, which leaves them unhashable.
+    """
+
+    def __init__(self):
+        self._entries: Dict[int, Tuple[weakref.ref, Any]] = {}
+
+    def get(self, obj: Any, default: Any = None) -> Any:
+        entry = self._entries.get(id(obj))
+        if entry is not None and entry[0]() is obj:
+            return entry[1]
+        return default
+
+    def put(self, obj: Any, value: Any) -> Any:
+        """Keep value for obj, and return it."""
+        key = id(obj)
+        entries = self._entries
+
+        def remove(ref: weakref.ref):
+            # Only the callback's own entry; the id may have been reused for a newer object since.
+            if entries.get(key, (None,))[0] is ref:
+                del entries[key]
+
+        entries[key] = (weakref.ref(obj, remove), value)
+        return value
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class Ranges:
+    """
+    Half-open [start, end) ranges sorted by start, for finding the value of the range containing a number by binary
+    search. Empty ranges never contain a number and are left out. Valid only if no two ranges overlap.
+    """
+
+    def __init__(self, ranges: List[Tuple[int, int, Any]]):
+        ranges = sorted((r for r in ranges if r[0] < r[1]), key=lambda r: r[0])
+        self.starts = [r[0] for r in ranges]
+        self.ends = [r[1] for r in ranges]
+        self.values = [r[2] for r in ranges]
+        self.valid = all(self.ends[i - 1] <= self.starts[i] for i in range(1, len(ranges)))
+
+    def find(self, number: int) -> Any:
+        """Value of the range containing the number, or None."""
+        i = bisect_right(self.starts, number) - 1
+        if i >= 0 and number < self.ends[i]:
+            return self.values[i]
+        return None
+
+
+class FilterValues(tuple):
+    """
+    Filter values of a condition, with the sets its operators look values up in built once, so matching a value
+    against thousands of filter values does not scan them.
+    """
+
+    def __new__(cls, values: List[str]):
+        self = super().__new__(cls, values)
+        self.value_set = frozenset(self)
+        self.contains_none = '(none)' in self.value_set
+        self.lower_values = tuple(value.lower() if isinstance(value, str) else value for value in self)
+        self.lower_set = frozenset(self.lower_values)
+        self.boolean_set = self.lower_set.intersection(('true', 'false'))
+        self.contains_booleans = bool(self.boolean_set)
+        return self
@@ -0,0 +1,75 @@
+import math
+from dataclasses import dataclass
+from typing import Optional
+
+from ..util.cache import Cache
+
+
+@dataclass
+class BucketingHashCacheStats:
+    """Point-in-time counters of a BucketingHashCache."""
+    size: int
+    capacity: int
+    hits: int
+    misses: int
+    evictions: int
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class BucketingHashCache:
+    """
+    Thread-safe LRU cache of the murmur3 hashes of bucketing values, by bucket salt and bucketing value. Flags often
+    share salts and the same users are evaluated repeatedly, so most bucketing skips hashing. Memory is bounded by
+    the capacity, in entries.
+    """
+
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError("Bucketing hash cache capacity must be positive")
+        self.capacity = capacity
+        self.cache = _CountingCache(capacity)
+
+    def get(self, salt: str, bucketing_value: str) -> Optional[int]:
+        return self.cache.get((salt, bucketing_value))
+
+    def put(self, salt: str, bucketing_value: str, hash_value: int):
+        self.cache.put((salt, bucketing_value), hash_value)
+
+    def stats(self) -> BucketingHashCacheStats:
+        cache = self.cache
+        with cache.lock:
+            return BucketingHashCacheStats(
+                size=len(cache.cache),
+                capacity=self.capacity,
+                hits=cache.hits,
+                misses=cache.misses,
+                evictions=cache.evictions,
+            )
+
+
+class _CountingCache(Cache):
+    """Cache whose entries never expire, counting hits, misses and evictions under the cache's lock."""
+
+    def __init__(self, capacity: int):
+        # Hashes never change, so entries only leave the cache when evicted.
+        super().__init__(capacity, math.inf)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _get(self, key, now):
+        value = super()._get(key, now)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def _put(self, key, value, now):
+        if key not in self.cache and len(self.cache) >= self.capacity:
+            self.evictions += 1
+        super()._put(key, value, now)
@@ -1,3 +1,11 @@
+from struct import unpack_from
+
+try:
+    # Optional native implementation, installed with the mmh3 extra.
+    import mmh3
+except ImportError:
+    mmh3 = None
+
 C1_32 = 0xcc9e2d51
 C2_32 = 0x1b873593
 R1_32 = 15
@@ -6,43 +14,34 @@ M_32 = 5
 N_32 = 0xe6546b64
 
 
-def hash32x86(input_str: str, seed: int = 0) -> int:
-    """Calculate 32-bit Murmur3 hash of a string."""
+def hash32x86_python(input_str: str, seed: int = 0) -> int:
+    """Calculate 32-bit Murmur3 hash of a string, in pure Python."""
     data = input_str.encode('utf-8')
     length = len(data)
-    n_blocks = length // 4
+    n_blocks = length >> 2
     hash_val = seed
 
-    # body
-    for i in range(n_blocks):
-        index = i * 4
-        k = read_int_le(data, index)
-        hash_val = mix32(k, hash_val)
+    # body, with the block mix and its rotations inlined
+    if n_blocks:
+        for k in unpack_from(f'<{n_blocks}I', data):
+            k = (k * C1_32) & 0xffffffff
+            k = ((k << R1_32) | (k >> 17)) & 0xffffffff
+            k = (k * C2_32) & 0xffffffff
+            hash_val = (hash_val ^ k) & 0xffffffff
+            hash_val = ((hash_val << R2_32) | (hash_val >> 19)) & 0xffffffff
+            hash_val = (hash_val * M_32 + N_32) & 0xffffffff
 
     # tail
-    index = n_blocks * 4
-    k1 = 0
-    remaining = length - index
-
-    if remaining == 3:
-        k1 ^= data[index + 2] << 16
-        k1 ^= data[index + 1] << 8
-        k1 ^= data[index]
-        k1 = (k1 * C1_32) & 0xffffffff
-        k1 = rotate_left(k1, R1_32)
-        k1 = (k1 * C2_32) & 0xffffffff
-        hash_val ^= k1
-    elif remaining == 2:
-        k1 ^= data[index + 1] << 8
-        k1 ^= data[index]
-        k1 = (k1 * C1_32) & 0xffffffff
-        k1 = rotate_left(k1, R1_32)
-        k1 = (k1 * C2_32) & 0xffffffff
-        hash_val ^= k1
-    elif remaining == 1:
-        k1 ^= data[index]
+    remaining = length & 3
+    if remaining:
+        index = n_blocks << 2
+        k1 = data[index]
+        if remaining > 1:
+            k1 ^= data[index + 1] << 8
+        if remaining > 2:
+            k1 ^= data[index + 2] << 16
         k1 = (k1 * C1_32) & 0xffffffff
-        k1 = rotate_left(k1, R1_32)
+        k1 = ((k1 << R1_32) | (k1 >> 17)) & 0xffffffff
         k1 = (k1 * C2_32) & 0xffffffff
         hash_val ^= k1
 
@@ -50,15 +49,12 @@ def hash32x86(input_str: str, seed: int = 0) -> int:
     return fmix32(hash_val)
 
 
-def mix32(k: int, hash_val: int) -> int:
-    """Mix function for Murmur3."""
-    k = (k * C1_32) & 0xffffffff
-    k = rotate_left(k, R1_32)
-    k = (k * C2_32) & 0xffffffff
-    hash_val ^= k
-    hash_val = rotate_left(hash_val, R2_32)
-    hash_val = (hash_val * M_32 + N_32) & 0xffffffff
-    return hash_val
+if mmh3 is not None:
+    def hash32x86(input_str: str, seed: int = 0) -> int:
+        """Calculate 32-bit Murmur3 hash of a string."""
+        return mmh3.hash(input_str, seed, signed=False)
+else:
+    hash32x86 = hash32x86_python
 
 
 def fmix32(hash_val: int) -> int:
@@ -69,24 +65,3 @@ def fmix32(hash_val: int) -> int:
     hash_val = (hash_val * 0xc2b2ae35) & 0xffffffff
     hash_val ^= hash_val >> 16
     return hash_val
-
-
-def rotate_left(x: int, n: int, width: int = 32) -> int:
-    """Rotate a number left by n bits."""
-    n = n % width if n > width else n
-    mask = (0xffffffff << (width - n)) & 0xffffffff
-    r = ((x & mask) >> (width - n)) & 0xffffffff
-    return ((x << n) | r) & 0xffffffff
-
-def read_int_le(data: bytes, index: int = 0) -> int:
-    """Read a little-endian 32-bit integer from bytes."""
-    n = (data[index] << 24) | (data[index + 1] << 16) | \
-        (data[index + 2] << 8) | data[index + 3]
-    return reverse_bytes(n)
-
-def reverse_bytes(n: int) -> int:
-    """Reverse the bytes of a 32-bit integer."""
-    return (((n & 0xff000000) >> 24) |
-            ((n & 0x00ff0000) >> 8) |
-            ((n & 0x0000ff00) << 8) |
-            ((n & 0x000000ff) << 24)) & 0xffffffff
@@ -1,5 +1,5 @@
 from dataclasses import is_dataclass
-from typing import Any, List, Optional
+from typing import Any, Dict, List, Optional
 from typing_extensions import Protocol, runtime_checkable
 
 
@@ -13,6 +13,42 @@ class Selectable(Protocol):
         ...
 
 
+class ContextView:
+    """
+    Read-only part of an evaluation context which reads its values from another object on demand rather than being
+    copied into a dict. get returns None for keys the equivalent dict would not contain. A selector ending at a view
+    selects the equivalent dict, from to_dict.
+    """
+
+    __slots__ = ()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        raise NotImplementedError
+
+    def __getitem__(self, key: str) -> Any:
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def to_dict(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+
+class MembershipView:
+    """
+    Set of strings in an evaluation context which is resolved lazily. The engine matches `set contains any` and
+    `set does not contain any` conditions on it through contains_any, so only the values of conditions actually
+    reached are resolved; other operators match against the fully resolved set from to_list.
+    """
+
+    def contains_any(self, values: List[str]) -> bool:
+        raise NotImplementedError
+
+    def to_list(self) -> List[str]:
+        raise NotImplementedError
+
+
 def selectable(cls):
     """
     Decorator to make dataclasses selectable using dict-like access.
@@ -43,18 +79,20 @@ def select(selectable: Any, selector: Optional[List[str]]) -> Optional[Any]:
         return None
 
     for selector_element in selector:
-        if (not selector_element or
-                selectable is None or
-                not (isinstance(selectable, dict) or
-                     isinstance(selectable, Selectable))):
+        if not selector_element or selectable is None:
             return None
 
-        if isinstance(selectable, dict):
+        # Checked before the Selectable protocol, whose isinstance check is comparatively slow.
+        if isinstance(selectable, (dict, ContextView)):
             selectable = selectable.get(selector_element)
-        else:
+        elif isinstance(selectable, Selectable):
             try:
                 selectable = selectable.get(selector_element)
             except (AttributeError, KeyError):
                 return None
+        else:
+            return None
 
+    if isinstance(selectable, ContextView):
+        return selectable.to_dict()
     return None if selectable is None else selectable
@@ -1,5 +1,7 @@
 from .exposure import Exposure, DAY_MILLIS
-from .exposure_filter import ExposureFilter
+from .exposure_dedupe import (ExposureDedupeBackend, InMemoryExposureDedupeBackend, BloomFilterExposureDedupeBackend,
+                              SharedMemoryExposureDedupeBackend)
+from .exposure_filter import ExposureFilter, ProbabilisticExposureFilter
 from .exposure_service import ExposureService, to_exposure_events
-from .exposure_config import ExposureConfig
-
+from .exposure_config import ExposureConfig, ExposureQueueOverflowPolicy
+from .exposure_queue import AsyncExposureService, ExposureQueueMetrics
@@ -1,8 +1,11 @@
+import hashlib
+import struct
 import time
-from typing import Dict
+from typing import Dict, Optional
 
 from .. import Variant
 from ..user import User
+from ..util.hash_code import hash64
 
 DAY_MILLIS = 24 * 60 * 60 * 1000
 
@@ -16,6 +19,8 @@ class Exposure:
         self.user = user
         self.results = results
         self.timestamp = time.time() * 1000
+        self._flag_fingerprints: Optional[Dict[str, int]] = None
+        self._fingerprint: Optional[int] = None
 
     def canonicalize(self) -> str:
         user = self.user.user_id.strip() if self.user.user_id else 'None'
@@ -29,3 +34,36 @@ class Exposure:
             canonical += flag_key.strip() + ' ' + value + ' '
         return canonical
 
+    def flag_fingerprints(self) -> Dict[str, int]:
+        """
+        Stable 64-bit digest of (user id, device id, flag key, variant key) for each flag in the results, computed
+        once per exposure. Used for the event insert id and the exposure fingerprint.
+        """
+        if self._flag_fingerprints is None:
+            prefix = self._user_prefix()
+            self._flag_fingerprints = {
+                flag_key: hash64(prefix + flag_key.strip() + ' ' + (variant.key.strip() if variant.key else 'None'))
+                for flag_key, variant in self.results.items()
+            }
+        return self._flag_fingerprints
+
+    def fingerprint(self) -> int:
+        """
+        64-bit digest of the whole exposure: a single blake2b over the user and device ids and the sorted per-flag
+        digests of flag_fingerprints(), skipping flags without a variant key as canonicalize() does. Used as the dedupe
+        key, so unlike a combination of the per-flag digests, different exposures only collide as often as any two
+        64-bit hashes, and the exposure is never canonicalized on the evaluation path.
+        """
+        if self._fingerprint is None:
+            flag_fingerprints = self.flag_fingerprints()
+            digests = sorted(flag_fingerprints[flag_key] for flag_key, variant in self.results.items()
+                             if variant.key is not None)
+            digest = hashlib.blake2b(self._user_prefix().encode('utf-8'), digest_size=8)
+            digest.update(struct.pack(f'<{len(digests)}Q', *digests))
+            self._fingerprint = int.from_bytes(digest.digest(), 'little')
+        return self._fingerprint
+
+    def _user_prefix(self) -> str:
+        user = self.user.user_id.strip() if self.user.user_id else 'None'
+        device = self.user.device_id.strip() if self.user.device_id else 'None'
+        return user + ' ' + device + ' '
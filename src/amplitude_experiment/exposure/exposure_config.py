@@ -1,8 +1,60 @@
+from enum import Enum
+
 import amplitude
 
+from .exposure_dedupe import ExposureDedupeBackend
+
+
+class ExposureQueueOverflowPolicy(Enum):
+    """Behavior of the asynchronous exposure queue when it is full."""
+    DROP_NEWEST = "drop_newest"
+    DROP_OLDEST = "drop_oldest"
+    BLOCK = "block"
+
 
 class ExposureConfig(amplitude.Config):
-    def __init__(self, cache_capacity: int = 65536, **kw):
+    def __init__(self, cache_capacity: int = 65536,
+                 async_tracking: bool = False,
+                 queue_capacity: int = 10000,
+                 queue_overflow_policy: ExposureQueueOverflowPolicy = ExposureQueueOverflowPolicy.DROP_NEWEST,
+                 probabilistic_dedupe: bool = False,
+                 probabilistic_dedupe_capacity: int = 1000000,
+                 probabilistic_dedupe_false_positive_rate: float = 0.001,
+                 dedupe_backend: ExposureDedupeBackend = None,
+                 batch_window_millis: int = 0,
+                 **kw):
+        """
+        Initialize an exposure config
+            Parameters:
+                cache_capacity (int): The maximum number of exposures kept in the dedupe filter.
+                async_tracking (bool): When True, exposures are handed to a bounded queue and deduplicated, converted
+                  to events and tracked on a background worker thread instead of the evaluating thread.
+                queue_capacity (int): The maximum number of exposures waiting in the asynchronous queue.
+                queue_overflow_policy (ExposureQueueOverflowPolicy): What to do when the asynchronous queue is full:
+                  drop the new exposure, drop the oldest queued exposure, or block the evaluating thread until
+                  space is available.
+                probabilistic_dedupe (bool): When True, exposures are deduplicated with a fixed-size rotating Bloom
+                  filter instead of an LRU cache of cache_capacity entries. Memory is bounded regardless of the number
+                  of distinct users, at the cost of occasionally dropping an exposure that was not a duplicate.
+                probabilistic_dedupe_capacity (int): Expected number of distinct exposures per day. Sizes the Bloom
+                  filter; exceeding it raises the effective false positive rate.
+                probabilistic_dedupe_false_positive_rate (float): Target probability of dropping a new exposure as a
+                  duplicate when probabilistic_dedupe_capacity exposures have been seen.
+                dedupe_backend (ExposureDedupeBackend): Custom dedupe storage, for example a
+                  SharedMemoryExposureDedupeBackend to dedupe exposures across all worker processes on a host. Takes
+                  precedence over cache_capacity and probabilistic_dedupe.
+                batch_window_millis (int): With async_tracking, how long the worker waits to accumulate exposures
+                  before tracking them as one batch. Repeated exposures of a user to the same flag variant within the
+                  batch are sent as a single event. 0 tracks whatever is queued immediately.
+                **kw: Amplitude analytics configuration, see amplitude.Config.
+        """
         super(ExposureConfig, self).__init__(**kw)
         self.cache_capacity = cache_capacity
-
+        self.async_tracking = async_tracking
+        self.queue_capacity = queue_capacity
+        self.queue_overflow_policy = queue_overflow_policy
+        self.probabilistic_dedupe = probabilistic_dedupe
+        self.probabilistic_dedupe_capacity = probabilistic_dedupe_capacity
+        self.probabilistic_dedupe_false_positive_rate = probabilistic_dedupe_false_positive_rate
+        self.dedupe_backend = dedupe_backend
+        self.batch_window_millis = batch_window_millis
@@ -0,0 +1,106 @@
+import time
+
+from .exposure import DAY_MILLIS
+from ..util.bloom_filter import RotatingBloomFilter
+from ..util.cache import ShardedCache
+from ..util.shared_memory import open_shared_memory, unlink_shared_memory
+
+SHARED_MEMORY_SLOT_BYTES = 16
+SHARED_MEMORY_PROBE_LIMIT = 8
+
+
+class ExposureDedupeBackend:
+    """
+    Storage consulted by ExposureFilter to decide whether an exposure fingerprint was already tracked.
+    """
+
+    def put_if_absent(self, fingerprint: int) -> bool:
+        """
+        Record the 64-bit exposure fingerprint and return True if it was not already recorded within the TTL.
+        """
+        raise NotImplementedError
+
+
+class InMemoryExposureDedupeBackend(ExposureDedupeBackend):
+    """Per-process LRU dedupe backend."""
+
+    def __init__(self, capacity: int, ttl_millis: int = DAY_MILLIS):
+        self.cache = ShardedCache(capacity, ttl_millis)
+
+    def put_if_absent(self, fingerprint: int) -> bool:
+        return self.cache.put_if_absent(fingerprint, True)
+
+
+class BloomFilterExposureDedupeBackend(ExposureDedupeBackend):
+    """Per-process, fixed memory dedupe backend with a bounded false positive rate."""
+
+    def __init__(self, capacity: int, false_positive_rate: float, ttl_millis: int = DAY_MILLIS):
+        self.bloom_filter = RotatingBloomFilter(capacity, false_positive_rate, ttl_millis)
+
+    def put_if_absent(self, fingerprint: int) -> bool:
+        return self.bloom_filter.put_if_absent(fingerprint)
+
+
+class SharedMemoryExposureDedupeBackend(ExposureDedupeBackend):
+    """
+    Dedupe backend shared by every process on a host which opens it with the same name, e.g. all workers of a
+    pre-fork server. The first process creates a fixed-size open addressing hash table of (fingerprint, last seen)
+    slots in a multiprocessing.shared_memory segment; others attach to it.
+
+    Access is lock free. Concurrent processes may occasionally both track the same exposure, which is harmless
+    since exposure events carry deterministic insert ids. When every probed slot is live, the least recently
+    seen one is evicted.
+
+    The segment outlives the processes using it; call unlink() once it is no longer needed by any process.
+    """
+
+    def __init__(self, name: str, capacity: int, ttl_millis: int = DAY_MILLIS):
+        """
+            Parameters:
+                name (str): Name of the shared memory segment. Processes using the same name share dedupe state.
+                capacity (int): Number of hash table slots. Must be the same in every process.
+                ttl_millis (int): Time after which a fingerprint that has not been seen again expires.
+        """
+        if capacity <= 0:
+            raise ValueError("Shared exposure dedupe capacity must be positive")
+        self.name = name
+        self.capacity = capacity
+        self.ttl_millis = ttl_millis
+        size = capacity * SHARED_MEMORY_SLOT_BYTES
+        self._shm = open_shared_memory(name, size)
+        self._slots = self._shm.buf[:size].cast('Q')
+
+    def put_if_absent(self, fingerprint: int) -> bool:
+        # Zero marks an empty slot.
+        fingerprint = fingerprint or 1
+        slots = self._slots
+        now = int(time.time() * 1000)
+        expired_before = now - self.ttl_millis
+        start = fingerprint % self.capacity
+        victim = -1
+        victim_time = now + 1
+        for probe in range(min(SHARED_MEMORY_PROBE_LIMIT, self.capacity)):
+            slot = (start + probe) % self.capacity
+            index = slot * 2
+            slot_fingerprint = slots[index]
+            last_seen = slots[index + 1]
+            if slot_fingerprint == fingerprint and last_seen >= expired_before:
+                slots[index + 1] = now
+                return False
+            if slot_fingerprint == 0 or last_seen < expired_before:
+                last_seen = -1
+            if last_seen < victim_time:
+                victim = index
+                victim_time = last_seen
+        slots[victim + 1] = now
+        slots[victim] = fingerprint
+        return True
+
+    def close(self):
+        """Detach this process from the segment."""
+        self._slots.release()
+        self._shm.close()
+
+    def unlink(self):
+        """Destroy the segment. Call once, from a single process, when no process needs it anymore."""
+        unlink_shared_memory(self._shm)
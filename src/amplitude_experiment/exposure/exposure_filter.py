@@ -1,11 +1,19 @@
 from .exposure import Exposure
 from .exposure import DAY_MILLIS
-from ..util.cache import Cache
+from .exposure_dedupe import (BloomFilterExposureDedupeBackend, ExposureDedupeBackend,
+                              InMemoryExposureDedupeBackend)
 
 
 class ExposureFilter:
-    def __init__(self, size: int, ttl_millis: int = DAY_MILLIS):
-        self.cache = Cache(size, ttl_millis)
+    def __init__(self, size: int, ttl_millis: int = DAY_MILLIS, backend: ExposureDedupeBackend = None):
+        """
+            Parameters:
+                size (int): Capacity of the default in-memory LRU backend.
+                ttl_millis (int): Time window within which duplicate exposures are filtered.
+                backend (ExposureDedupeBackend): Optional dedupe storage, e.g. shared across processes. Defaults to
+                  an in-memory LRU cache of the given size.
+        """
+        self.backend = backend or InMemoryExposureDedupeBackend(size, ttl_millis)
         self.ttl_millis = ttl_millis
 
     def should_track(self, exposure: Exposure) -> bool:
@@ -15,9 +23,16 @@ class ExposureFilter:
         if not exposure.results:
             # Don't track empty exposures.
             return False
-        canonical_exposure = exposure.canonicalize()
-        track = self.cache.get(canonical_exposure) is None
-        if track:
-            self.cache.put(canonical_exposure, object())
-        return track
+        return self.backend.put_if_absent(exposure.fingerprint())
+
+
+class ProbabilisticExposureFilter(ExposureFilter):
+    """
+    Exposure filter backed by a fixed-size rotating Bloom filter instead of an LRU of exposure fingerprints.
+    Memory use is bounded by capacity and false_positive_rate regardless of the number of distinct users. A false
+    positive suppresses an exposure that should have been tracked, with probability about false_positive_rate.
+    """
 
+    def __init__(self, capacity: int, false_positive_rate: float, ttl_millis: int = DAY_MILLIS):
+        super().__init__(capacity, ttl_millis,
+                         BloomFilterExposureDedupeBackend(capacity, false_positive_rate, ttl_millis))
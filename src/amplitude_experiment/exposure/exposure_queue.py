@@ -0,0 +1,172 @@
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Optional
+
+from amplitude import Amplitude
+
+from .exposure import Exposure
+from .exposure_config import ExposureQueueOverflowPolicy
+from .exposure_filter import ExposureFilter
+from .exposure_service import ExposureService
+from ..util.fork import register_after_fork
+
+
+@dataclass
+class ExposureQueueMetrics:
+    """Point-in-time counters for an AsyncExposureService queue."""
+    size: int
+    capacity: int
+    enqueued: int
+    dropped: int
+    processed: int
+    failed: int
+
+
+class AsyncExposureService(ExposureService):
+    """
+    Exposure service which tracks exposures on a background worker thread.
+
+    track() only appends the exposure to a bounded queue, so dedupe, event building and handing events to the
+    Amplitude client happen off the evaluating thread. The worker thread is started lazily on the first tracked
+    exposure.
+
+    The worker drains everything queued as one batch. With a positive batch_window_millis it first waits that long
+    for more exposures to arrive, so repeated exposures of the same user to the same flag variant are coalesced
+    into a single event.
+    """
+
+    def __init__(self, amplitude: Amplitude, exposure_filter: ExposureFilter, capacity: int,
+                 overflow_policy: ExposureQueueOverflowPolicy = ExposureQueueOverflowPolicy.DROP_NEWEST,
+                 logger: logging.Logger = None, batch_window_millis: int = 0):
+        super().__init__(amplitude, exposure_filter, logger)
+        if capacity <= 0:
+            raise ValueError("Exposure queue capacity must be positive")
+        self.capacity = capacity
+        self.overflow_policy = overflow_policy
+        self.batch_window_millis = batch_window_millis
+        self._queue: Deque[Exposure] = deque()
+        self._lock = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+        self._unfinished = 0
+        self._enqueued = 0
+        self._dropped = 0
+        self._processed = 0
+        self._failed = 0
+        register_after_fork(self._reinit_after_fork)
+
+    def _reinit_after_fork(self):
+        # Exposures queued at fork time are tracked by the parent process; the child starts with an empty queue and
+        # its own worker, started lazily like in the parent.
+        self._lock = threading.Condition()
+        self._queue.clear()
+        self._unfinished = 0
+        self._thread = None
+
+    def track(self, exposure: Exposure):
+        with self._lock:
+            if self._stopped:
+                self._dropped += 1
+                return
+            if len(self._queue) >= self.capacity:
+                if self.overflow_policy == ExposureQueueOverflowPolicy.DROP_NEWEST:
+                    self._dropped += 1
+                    return
+                elif self.overflow_policy == ExposureQueueOverflowPolicy.DROP_OLDEST:
+                    self._queue.popleft()
+                    self._unfinished -= 1
+                    self._dropped += 1
+                else:
+                    while len(self._queue) >= self.capacity and not self._stopped:
+                        self._lock.wait()
+                    if self._stopped:
+                        self._dropped += 1
+                        return
+            self._queue.append(exposure)
+            self._unfinished += 1
+            self._enqueued += 1
+            self._ensure_started()
+            self._lock.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every queued exposure has been processed by the worker.
+            Parameters:
+                timeout (float | None): Maximum time, in seconds, to wait. None waits indefinitely.
+
+            Returns:
+                True if the queue was drained, False if the timeout elapsed first.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            while self._unfinished > 0:
+                if deadline is None:
+                    self._lock.wait()
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._lock.wait(remaining)
+            return True
+
+    def stop(self, timeout: Optional[float] = None) -> bool:
+        """
+        Drain the queue and stop the worker thread. Exposures tracked after stop are dropped.
+            Parameters:
+                timeout (float | None): Maximum time, in seconds, to wait for the queue to drain.
+
+            Returns:
+                True if the queue was drained, False if the timeout elapsed first.
+        """
+        drained = self.flush(timeout)
+        with self._lock:
+            self._stopped = True
+            self._lock.notify_all()
+        return drained
+
+    def get_metrics(self) -> ExposureQueueMetrics:
+        with self._lock:
+            return ExposureQueueMetrics(
+                size=len(self._queue),
+                capacity=self.capacity,
+                enqueued=self._enqueued,
+                dropped=self._dropped,
+                processed=self._processed,
+                failed=self._failed,
+            )
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='ExposureTrackingWorker', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._queue and not self._stopped:
+                    self._lock.wait()
+                if not self._queue:
+                    return
+                if self.batch_window_millis > 0:
+                    deadline = time.monotonic() + self.batch_window_millis / 1000
+                    while len(self._queue) < self.capacity and not self._stopped:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._lock.wait(remaining)
+                batch = list(self._queue)
+                self._queue.clear()
+                self._lock.notify_all()
+            try:
+                failed = self.track_batch(batch)
+            except Exception as e:
+                failed = len(batch)
+                self.logger.warning(f"[Experiment] Failed to track {len(batch)} exposure(s): {e}")
+            with self._lock:
+                self._failed += failed
+                self._processed += len(batch) - failed
+                self._unfinished -= len(batch)
+                self._lock.notify_all()
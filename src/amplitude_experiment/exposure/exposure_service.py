@@ -1,18 +1,22 @@
+import logging
+
 from amplitude import Amplitude, BaseEvent
-from typing import List
+from typing import List, Optional, Set
 from .exposure import Exposure
 from .exposure_filter import ExposureFilter
-from ..util import hash_code
 
 FLAG_TYPE_MUTUAL_EXCLUSION_GROUP = "mutual-exclusion-group"
 
 
-def to_exposure_events(exposure: Exposure, ttl_millis: int) -> List[BaseEvent]:
+def to_exposure_events(exposure: Exposure, ttl_millis: int,
+                       seen_insert_ids: Optional[Set[str]] = None) -> List[BaseEvent]:
     """
-    Convert an Exposure to a list of Amplitude events (one per flag).
+    Convert an Exposure to a list of Amplitude events (one per flag). If seen_insert_ids is given, flags whose
+    event insert id is already in the set are skipped and the insert ids of the returned events are added to it.
     """
     events = []
-    canonicalized = exposure.canonicalize()
+    flag_fingerprints = exposure.flag_fingerprints()
+    time_bucket = int(exposure.timestamp / ttl_millis)
     for flag_key in exposure.results:
         variant = exposure.results[flag_key]
 
@@ -24,6 +28,12 @@ def to_exposure_events(exposure: Exposure, ttl_millis: int) -> List[BaseEvent]:
         if is_default:
             continue
 
+        insert_id = f'{exposure.user.user_id} {exposure.user.device_id} {flag_fingerprints[flag_key]} {time_bucket}'
+        if seen_insert_ids is not None:
+            if insert_id in seen_insert_ids:
+                continue
+            seen_insert_ids.add(insert_id)
+
         # Determine user properties to set and unset.
         set_props = {}
         unset_props = {}
@@ -45,7 +55,8 @@ def to_exposure_events(exposure: Exposure, ttl_millis: int) -> List[BaseEvent]:
         if experiment_key:
             event_properties['[Experiment] Experiment Key'] = experiment_key
         if variant.metadata:
-            event_properties['metadata'] = variant.metadata
+            # Copied, since variants from local evaluation share a read-only mapping.
+            event_properties['metadata'] = dict(variant.metadata)
 
         # Build event.
         event = BaseEvent(
@@ -57,7 +68,7 @@ def to_exposure_events(exposure: Exposure, ttl_millis: int) -> List[BaseEvent]:
                 '$set': set_props,
                 '$unset': unset_props,
             },
-            insert_id=f'{exposure.user.user_id} {exposure.user.device_id} {hash_code(flag_key + " " + canonicalized)} {int(exposure.timestamp / ttl_millis)}'
+            insert_id=insert_id
         )
         if exposure.user.groups:
             event.groups = exposure.user.groups
@@ -68,9 +79,10 @@ def to_exposure_events(exposure: Exposure, ttl_millis: int) -> List[BaseEvent]:
 
 
 class ExposureService:
-    def __init__(self, amplitude: Amplitude, exposure_filter: ExposureFilter):
+    def __init__(self, amplitude: Amplitude, exposure_filter: ExposureFilter, logger: logging.Logger = None):
         self.amplitude = amplitude
         self.exposure_filter = exposure_filter
+        self.logger = logger or logging.getLogger("Amplitude")
 
     def track(self, exposure: Exposure):
         if self.exposure_filter.should_track(exposure):
@@ -78,3 +90,26 @@ class ExposureService:
             for event in events:
                 self.amplitude.track(event)
 
+    def track_batch(self, exposures: List[Exposure]) -> int:
+        """
+        Track several exposures at once, coalescing duplicate flag exposures of the same user into one event. An
+        event which fails to be tracked is logged and does not keep the other events from being tracked.
+
+            Returns:
+                The number of exposures with at least one event which failed to be tracked.
+        """
+        failed = 0
+        seen_insert_ids = set()
+        for exposure in exposures:
+            if not self.exposure_filter.should_track(exposure):
+                continue
+            exposure_failed = False
+            for event in to_exposure_events(exposure, self.exposure_filter.ttl_millis, seen_insert_ids):
+                try:
+                    self.amplitude.track(event)
+                except Exception as e:
+                    exposure_failed = True
+                    self.logger.warning(f"[Experiment] Failed to track exposure event: {e}")
+            failed += exposure_failed
+        return failed
+
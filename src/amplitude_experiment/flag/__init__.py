@@ -1,2 +1,3 @@
 from .flag_config_api import FlagConfigStreamApi
+from .flag_config_async_stream_api import AsyncFlagConfigStreamApi
 from .flag_config_updater import FlagConfigStreamer
\ No newline at end of file
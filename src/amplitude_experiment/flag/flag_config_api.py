@@ -1,11 +1,14 @@
 import json
 import threading
+import time
+from dataclasses import dataclass
 from http.client import HTTPResponse, HTTPConnection, HTTPSConnection
 from typing import List, Optional, Callable, Mapping, Union, Tuple
 
 import sseclient
 
 from ..connection_pool import HTTPConnectionPool
+from ..util.fork import register_after_fork
 from ..util.updater import get_duration_with_jitter
 from ..evaluation.types import EvaluationFlag
 from ..version import __version__
@@ -56,12 +59,67 @@ DEFAULT_STREAM_MAX_CONN_DURATION_MILLIS = 15 * 60 * 1000
 DEFAULT_STREAM_MAX_JITTER_MILLIS = 5000
 
 
+class StreamResyncRequired(Exception):
+    """Raised while handling a stream message to reconnect, and so receive a full flag config snapshot."""
+    pass
+
+
+@dataclass
+class FlagConfigPatch:
+    """Incremental flag config update: flags to insert or replace, and keys of flags to delete."""
+    version: int
+    upserts: List[EvaluationFlag]
+    deletes: List[str]
+
+
+class FlagConfigStreamDecoder:
+    """
+    Decodes flag config stream messages, tracking the version of the flag set they apply to.
+
+    A message is either a full snapshot, sent as a bare list of flags or as
+    {"type": "full", "version": n, "flags": [...]}, or a patch,
+    {"type": "patch", "version": n, "upserts": [...], "deletes": ["flag-key", ...]}. A patch only decodes the flags
+    it changes and only applies on top of version n - 1; otherwise StreamResyncRequired is raised.
+    """
+
+    def __init__(self):
+        self.version: Optional[int] = None
+
+    def reset(self):
+        self.version = None
+
+    def decode(self, data: str) -> Union[List[EvaluationFlag], FlagConfigPatch]:
+        message = json.loads(data)
+        if isinstance(message, list):
+            self.version = None
+            return EvaluationFlag.schema().load(message, many=True)
+        version = message.get('version')
+        if message.get('type') == 'patch':
+            if self.version is None or version != self.version + 1:
+                expected = None if self.version is None else self.version + 1
+                self.version = None
+                raise StreamResyncRequired(f"[Experiment] Stream flagConfigs - expected patch version {expected}, "
+                                           f"received {version}")
+            patch = FlagConfigPatch(version, EvaluationFlag.schema().load(message.get('upserts', []), many=True),
+                                    message.get('deletes', []))
+            self.version = version
+            return patch
+        flags = EvaluationFlag.schema().load(message.get('flags', []), many=True)
+        self.version = version
+        return flags
+
+
 class EventSource:
+    """
+    Server-sent events reader running on a dedicated thread. Keep-alive is tracked as the monotonic time the last
+    event was received, checked by one watchdog thread which lives as long as the stream (across reconnects), so
+    receiving an event costs a timestamp write rather than a new timer thread.
+    """
+
     def __init__(self, server_url: str, path: str, headers: Mapping[str, str], conn_timeout_millis: int,
                  max_conn_duration_millis: int = DEFAULT_STREAM_MAX_CONN_DURATION_MILLIS,
                  max_jitter_millis: int = DEFAULT_STREAM_MAX_JITTER_MILLIS,
                  keep_alive_timeout_millis: int = DEFAULT_STREAM_API_KEEP_ALIVE_TIMEOUT_MILLIS):
-        self.keep_alive_timer: Optional[threading.Timer] = None
         self.server_url = server_url
         self.path = path
         self.headers = headers
@@ -75,6 +133,24 @@ class EventSource:
         self.thread: Optional[threading.Thread] = None
         self._stopped = False
         self.lock = threading.RLock()
+        self._keep_alive_condition = threading.Condition(self.lock)
+        self._keep_alive_watchdog: Optional[threading.Thread] = None
+        self._on_keep_alive_timeout: Optional[Callable[[str], None]] = None
+        self.last_event_time = time.monotonic()
+        self._inherited_connection = None
+        register_after_fork(self._reinit_after_fork)
+
+    def _reinit_after_fork(self):
+        # The reader thread does not exist in the child, but may have been holding the response's buffer lock, so
+        # closing the inherited connection could block forever. It is kept referenced, and never closed, instead.
+        self._inherited_connection = (self.sse, self.conn)
+        self.sse = None
+        self.conn = None
+        self.thread = None
+        self._stopped = True
+        self.lock = threading.RLock()
+        self._keep_alive_condition = threading.Condition(self.lock)
+        self._keep_alive_watchdog = None
 
     def start(self, on_update: Callable[[str], None], on_error: Callable[[str], None]):
         with self.lock:
@@ -92,7 +168,7 @@ class EventSource:
             self._stopped = False
             self.thread = threading.Thread(target=self._run, args=[on_update, on_error])
             self.thread.start()
-            self.reset_keep_alive_timer(on_error)
+            self.reset_keep_alive(on_error)
 
     def stop(self):
         with self.lock:
@@ -101,20 +177,34 @@ class EventSource:
                 self.sse.close()
             if self.conn:
                 self.conn.close()
-            if self.keep_alive_timer:
-                self.keep_alive_timer.cancel()
+            self._keep_alive_condition.notify_all()
             self.sse = None
             self.conn = None
             # No way to stop self.thread, on self.conn.close(),
             # the loop in thread will raise exception, which will terminate the thread.
 
-    def reset_keep_alive_timer(self, on_error: Callable[[str], None]):
+    def reset_keep_alive(self, on_error: Callable[[str], None]):
         with self.lock:
-            if self.keep_alive_timer:
-                self.keep_alive_timer.cancel()
-            self.keep_alive_timer = threading.Timer(self.keep_alive_timeout_millis / 1000, self.keep_alive_timed_out,
-                                                    args=[on_error])
-            self.keep_alive_timer.start()
+            self.last_event_time = time.monotonic()
+            self._on_keep_alive_timeout = on_error
+            # A watchdog still running from before a reconnect keeps watching the new connection.
+            if self._keep_alive_watchdog is None:
+                self._keep_alive_watchdog = threading.Thread(target=self._watch_keep_alive, daemon=True)
+                self._keep_alive_watchdog.start()
+
+    def _watch_keep_alive(self):
+        timeout = self.keep_alive_timeout_millis / 1000
+        with self._keep_alive_condition:
+            try:
+                while not self._stopped:
+                    remaining = self.last_event_time + timeout - time.monotonic()
+                    if remaining <= 0:
+                        # Stops the stream, unless on_error restarts it, in which case watching continues.
+                        self.keep_alive_timed_out(self._on_keep_alive_timeout)
+                        continue
+                    self._keep_alive_condition.wait(remaining)
+            finally:
+                self._keep_alive_watchdog = None
 
     def keep_alive_timed_out(self, on_error: Callable[[str], None]):
         with self.lock:
@@ -125,15 +215,16 @@ class EventSource:
     def _run(self, on_update: Callable[[str], None], on_error: Callable[[str], None]):
         try:
             for event in self.sse.events():
+                # Taking the lock also holds back dispatch until start() has returned.
                 with self.lock:
                     if self._stopped:
                         return
-                    self.reset_keep_alive_timer(on_error)
+                self.last_event_time = time.monotonic()
                 if event.data == ' ':
                     continue
                 on_update(event.data)
-        except TimeoutError:
-            # Due to connection max time reached, open another one.
+        except (TimeoutError, StreamResyncRequired):
+            # Due to connection max time reached or a missed update, open another one.
             with self.lock:
                 if self._stopped:
                     return
@@ -185,16 +276,33 @@ class FlagConfigStreamApi:
         }
 
         self.eventsource = EventSource(self.server_url, "/sdk/stream/v1/flags", headers, conn_timeout_millis)
+        self.decoder = FlagConfigStreamDecoder()
+        register_after_fork(self._reinit_after_fork)
 
-    def start(self, on_update: Callable[[List[EvaluationFlag]], None], on_error: Callable[[str], None]):
+    def _reinit_after_fork(self):
+        self.lock = threading.RLock()
+
+    def start(self, on_update: Callable[[List[EvaluationFlag]], None], on_error: Callable[[str], None],
+              on_patch: Callable[[FlagConfigPatch], None] = None):
+        """
+        Stream flag configs. on_update receives full flag sets; on_patch receives incremental updates. Without
+        on_patch, a patch makes the stream reconnect to receive a full flag set instead.
+        """
         with self.lock:
             init_finished_event = threading.Event()
             init_error_event = threading.Event()
             init_updated_event = threading.Event()
+            self.decoder.reset()
 
             def _on_update(data):
-                response_json = json.loads(data)
-                flags = EvaluationFlag.schema().load(response_json, many=True)
+                message = self.decoder.decode(data)
+                if isinstance(message, FlagConfigPatch):
+                    if on_patch is None:
+                        self.decoder.reset()
+                        raise StreamResyncRequired("[Experiment] Stream flagConfigs - patches not supported")
+                    on_patch(message)
+                    return
+                flags = message
                 if init_finished_event.is_set():
                     on_update(flags)
                 else:
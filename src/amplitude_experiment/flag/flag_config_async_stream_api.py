@@ -0,0 +1,309 @@
+import asyncio
+import concurrent.futures
+import contextlib
+import re
+import ssl
+import threading
+from typing import AsyncIterator, Awaitable, Callable, List, Mapping, Optional
+from urllib.parse import urlsplit
+
+from .flag_config_api import (DEFAULT_STREAM_API_KEEP_ALIVE_TIMEOUT_MILLIS, DEFAULT_STREAM_MAX_CONN_DURATION_MILLIS,
+                              DEFAULT_STREAM_MAX_JITTER_MILLIS, FlagConfigPatch, FlagConfigStreamDecoder,
+                              StreamResyncRequired)
+from ..evaluation.types import EvaluationFlag
+from ..util.fork import register_after_fork
+from ..util.updater import get_duration_with_jitter
+from ..version import __version__
+
+_CHUNK_SIZE = re.compile(rb'[0-9A-Fa-f]+')
+# Only the start of an error response body is included in the error.
+_ERROR_BODY_LIMIT_BYTES = 4096
+
+
+class AsyncEventSource:
+    """
+    asyncio counterpart of EventSource. A stream is read by a single task on the event loop; keep-alive is checked by
+    one loop timer per timeout window against the time the last line was received, rather than a timer per event.
+    """
+
+    def __init__(self, server_url: str, path: str, headers: Mapping[str, str], conn_timeout_millis: int,
+                 max_conn_duration_millis: int = DEFAULT_STREAM_MAX_CONN_DURATION_MILLIS,
+                 max_jitter_millis: int = DEFAULT_STREAM_MAX_JITTER_MILLIS,
+                 keep_alive_timeout_millis: int = DEFAULT_STREAM_API_KEEP_ALIVE_TIMEOUT_MILLIS):
+        self.server_url = server_url
+        self.path = path
+        self.headers = headers
+        self.conn_timeout_millis = conn_timeout_millis
+        self.max_conn_duration_millis = max_conn_duration_millis
+        self.max_jitter_millis = max_jitter_millis
+        self.keep_alive_timeout_millis = keep_alive_timeout_millis
+
+    async def run(self, on_update: Callable[[str], Awaitable[None]], on_error: Callable[[str], Awaitable[None]]):
+        """
+        Stream events until the stream fails or the task is cancelled. Connections are reopened when they reach the
+        max connection duration or on_update raises StreamResyncRequired; any other end of the stream is reported
+        through on_error.
+        """
+        loop = asyncio.get_running_loop()
+        keep_alive_timeout = self.keep_alive_timeout_millis / 1000
+        while True:
+            reader, writer = await asyncio.wait_for(self._connect(), self.conn_timeout_millis / 1000)
+            state = {'last_seen': loop.time(), 'reconnect': False, 'timed_out': False}
+
+            def expire():
+                state['reconnect'] = True
+                writer.close()
+
+            def check_keep_alive():
+                idle = loop.time() - state['last_seen']
+                if idle >= keep_alive_timeout:
+                    state['timed_out'] = True
+                    writer.close()
+                else:
+                    handles[1] = loop.call_later(keep_alive_timeout - idle, check_keep_alive)
+
+            duration = get_duration_with_jitter(self.max_conn_duration_millis, self.max_jitter_millis) / 1000
+            handles = [loop.call_later(duration, expire), loop.call_later(keep_alive_timeout, check_keep_alive)]
+            try:
+                response_status, headers = await self._read_response_head(reader)
+                if response_status != 200:
+                    body = await self._read_error_body(reader, headers)
+                    await on_error(f"[Experiment] Stream flagConfigs - received error response: "
+                                   f"{response_status}: {body.decode('utf-8', 'replace')}")
+                    return
+                async for data in self._events(reader, headers, state):
+                    if data == ' ':
+                        continue
+                    await on_update(data)
+                    # Time spent applying the update does not count against the server's keep-alive.
+                    state['last_seen'] = loop.time()
+            except StreamResyncRequired:
+                state['reconnect'] = True
+            except (ConnectionError, asyncio.IncompleteReadError, ssl.SSLError) as e:
+                if not state['reconnect'] and not state['timed_out']:
+                    await on_error("[Experiment] Stream flagConfigs - Unexpected exception" + str(e))
+                    return
+            finally:
+                for handle in handles:
+                    handle.cancel()
+                # A task abandoned on a stopped loop is only finalized once the loop is closed.
+                if not loop.is_closed():
+                    writer.close()
+                    # Let the transport finish closing before the next connection or the loop's shutdown. Closing
+                    # a TLS transport waits for the peer, so it is bounded by the connection timeout.
+                    with contextlib.suppress(Exception):
+                        await asyncio.wait_for(writer.wait_closed(), self.conn_timeout_millis / 1000)
+            if state['timed_out']:
+                await on_error("[Experiment] Stream flagConfigs - Keep alive timed out")
+                return
+            if not state['reconnect']:
+                await on_error("[Experiment] Stream flagConfigs - Unexpected exception: stream closed")
+                return
+            # Max connection duration reached or an update was missed, open another one.
+
+    async def _connect(self):
+        url = urlsplit(self.server_url)
+        context = ssl.create_default_context() if url.scheme == 'https' else None
+        port = url.port or (443 if context is not None else 80)
+        reader, writer = await asyncio.open_connection(url.hostname, port, ssl=context)
+        request_headers = {'Host': url.netloc, 'Accept': 'text/event-stream', **self.headers}
+        head = f"GET {self.path} HTTP/1.1\r\n" + ''.join(f"{k}: {v}\r\n" for k, v in request_headers.items())
+        writer.write((head + "\r\n").encode('latin-1'))
+        return reader, writer
+
+    @staticmethod
+    async def _read_response_head(reader: asyncio.StreamReader):
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError("connection closed before response")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                return status, headers
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+    async def _read_error_body(self, reader: asyncio.StreamReader, headers: Mapping[str, str]) -> bytes:
+        # The server may keep the connection open after the response, so the body is read by its framing, up to a
+        # limit, and reading is bounded by the connection timeout. Whatever was read by then is returned.
+        body = bytearray()
+
+        async def read():
+            if 'transfer-encoding' not in headers and 'content-length' in headers:
+                body.extend(await reader.readexactly(min(int(headers['content-length']), _ERROR_BODY_LIMIT_BYTES)))
+                return
+            chunks = self._body(reader, headers)
+            async for chunk in chunks:
+                body.extend(chunk)
+                if len(body) >= _ERROR_BODY_LIMIT_BYTES:
+                    break
+            await chunks.aclose()
+
+        with contextlib.suppress(asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError, ValueError):
+            await asyncio.wait_for(read(), self.conn_timeout_millis / 1000)
+        return bytes(body[:_ERROR_BODY_LIMIT_BYTES])
+
+    @staticmethod
+    async def _body(reader: asyncio.StreamReader, headers: Mapping[str, str]) -> AsyncIterator[bytes]:
+        # Chunked must be the final transfer coding. No Accept-Encoding is sent, so no other coding is expected.
+        codings = [c.strip() for c in headers.get('transfer-encoding', '').lower().split(',') if c.strip()]
+        if any(c not in ('chunked', 'identity') for c in codings):
+            raise ConnectionError(f"unsupported transfer-encoding: {headers['transfer-encoding']}")
+        if not codings or codings[-1] != 'chunked':
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    return
+                yield data
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            size_field = line.split(b';', 1)[0].strip()
+            if not line.endswith(b'\n') or not _CHUNK_SIZE.fullmatch(size_field):
+                raise ConnectionError(f"malformed chunk size line: {line!r}")
+            size = int(size_field, 16)
+            if size == 0:
+                return
+            yield await reader.readexactly(size)
+            if await reader.readexactly(2) != b'\r\n':
+                raise ConnectionError("malformed chunk: missing CRLF after chunk data")
+
+    async def _events(self, reader: asyncio.StreamReader, headers: Mapping[str, str],
+                      state: dict) -> AsyncIterator[str]:
+        # Same dispatch rules as sseclient: data lines are joined with newlines, blank lines end an event, and
+        # events without data are dropped.
+        loop = asyncio.get_running_loop()
+        buffer = b''
+        data = ''
+        async for chunk in self._body(reader, headers):
+            state['last_seen'] = loop.time()
+            buffer += chunk
+            *lines, buffer = buffer.split(b'\n')
+            for line in lines:
+                line = line.rstrip(b'\r').decode('utf-8')
+                if not line:
+                    if data:
+                        yield data[:-1] if data.endswith('\n') else data
+                    data = ''
+                    continue
+                field, _, value = line.partition(':')
+                if field == 'data':
+                    data += (value[1:] if value.startswith(' ') else value) + '\n'
+
+
+class AsyncFlagConfigStreamApi:
+    """
+    Flag config stream API for applications already running an asyncio event loop. The stream is read by one task
+    on the given loop instead of dedicated threads; flag updates and errors are handed to the default executor so
+    downloading cohorts or falling back to polling never blocks the loop.
+
+    start() and stop() are called from DeploymentRunner like FlagConfigStreamApi's. When start() is called from a
+    thread other than the loop's, it waits for the initial flag configs and raises if they do not arrive within the
+    connection timeout. Called on the loop itself it cannot wait, so it returns immediately and reports a failed
+    initial connection through on_error.
+    """
+
+    def __init__(self,
+                 deployment_key: str,
+                 server_url: str,
+                 conn_timeout_millis: int,
+                 loop: asyncio.AbstractEventLoop,
+                 max_conn_duration_millis: int = DEFAULT_STREAM_MAX_CONN_DURATION_MILLIS,
+                 max_jitter_millis: int = DEFAULT_STREAM_MAX_JITTER_MILLIS):
+        self.deployment_key = deployment_key
+        self.server_url = server_url
+        self.conn_timeout_millis = conn_timeout_millis
+        self.loop = loop
+        self.max_conn_duration_millis = max_conn_duration_millis
+        self.max_jitter_millis = max_jitter_millis
+
+        self.lock = threading.RLock()
+        self._future: Optional[concurrent.futures.Future] = None
+
+        headers = {
+            'Authorization': f"Api-Key {self.deployment_key}",
+            'Content-Type': 'application/json;charset=utf-8',
+            'X-Amp-Exp-Library': f"experiment-python-server/{__version__}"
+        }
+
+        self.eventsource = AsyncEventSource(self.server_url, "/sdk/stream/v1/flags", headers, conn_timeout_millis,
+                                            max_conn_duration_millis, max_jitter_millis)
+        self.decoder = FlagConfigStreamDecoder()
+        register_after_fork(self._reinit_after_fork)
+
+    def _reinit_after_fork(self):
+        # The stream task belongs to the parent's event loop. A child can only stream if it runs the loop itself.
+        self.lock = threading.RLock()
+        self._future = None
+
+    def start(self, on_update: Callable[[List[EvaluationFlag]], None], on_error: Callable[[str], None],
+              on_patch: Callable[[FlagConfigPatch], None] = None):
+        with self.lock:
+            self._cancel()
+            self.decoder.reset()
+            connected = concurrent.futures.Future()
+            updated = concurrent.futures.Future()
+            on_loop = self._on_loop_thread()
+
+            async def _on_update(data):
+                message = self.decoder.decode(data)
+                if isinstance(message, FlagConfigPatch):
+                    if on_patch is None:
+                        self.decoder.reset()
+                        raise StreamResyncRequired("[Experiment] Stream flagConfigs - patches not supported")
+                    await self.loop.run_in_executor(None, on_patch, message)
+                    return
+                flags = message
+                if not connected.done():
+                    connected.set_result(None)
+                await self.loop.run_in_executor(None, on_update, flags)
+                if not updated.done():
+                    updated.set_result(None)
+
+            async def _on_error(err):
+                # Until the initial update completes, a blocking start() raises the error instead.
+                if updated.done() or on_loop:
+                    self.loop.run_in_executor(None, on_error, err)
+                elif not connected.done():
+                    connected.set_exception(Exception(err))
+                else:
+                    updated.set_exception(Exception(err))
+
+            async def _run():
+                try:
+                    await self.eventsource.run(_on_update, _on_error)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    await _on_error("[Experiment] Stream flagConfigs - Unexpected exception" + str(e))
+
+            self._future = asyncio.run_coroutine_threadsafe(_run(), self.loop)
+            if on_loop:
+                return
+            try:
+                connected.result(self.conn_timeout_millis / 1000)
+            except Exception as e:
+                self._cancel()
+                if isinstance(e, concurrent.futures.TimeoutError):
+                    raise Exception("stream connection timeout error")
+                raise e
+            # Wait for first update callback to finish before returning.
+            updated.result()
+
+    def stop(self):
+        with self.lock:
+            self._cancel()
+
+    def _cancel(self):
+        if self._future is not None:
+            self._future.cancel()
+            self._future = None
+
+    def _on_loop_thread(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            return False
@@ -1,7 +1,39 @@
-from typing import Dict, Callable
+from typing import Callable, Collection, Dict, Iterable, Set
 from threading import Lock
 
 from ..evaluation.types import EvaluationFlag
+from ..util.flag_config import get_grouped_cohort_ids_from_flag
+from ..util.fork import register_after_fork
+
+
+class FlagConfigSnapshot:
+    """
+    Flag configs at one point in time, with the cohort ids each flag targets computed once when the snapshot is
+    taken rather than on every evaluation. Neither the snapshot nor its dicts may be mutated.
+    """
+
+    def __init__(self, flag_configs: Dict[str, EvaluationFlag]):
+        self.flag_configs = flag_configs
+        # Cohort ids targeted by each flag, by group type.
+        self.grouped_cohort_ids_by_flag: Dict[str, Dict[str, Set[str]]] = {}
+        # All cohort ids targeted by each flag.
+        self.cohort_ids_by_flag: Dict[str, Set[str]] = {}
+        # Cohort ids targeted by any flag, by group type.
+        self.grouped_cohort_ids: Dict[str, Set[str]] = {}
+        for key, flag_config in flag_configs.items():
+            grouped = get_grouped_cohort_ids_from_flag(flag_config)
+            self.grouped_cohort_ids_by_flag[key] = grouped
+            self.cohort_ids_by_flag[key] = {cohort_id for values in grouped.values() for cohort_id in values}
+            for group_type, values in grouped.items():
+                self.grouped_cohort_ids.setdefault(group_type, set()).update(values)
+
+    def get_grouped_cohort_ids(self, flag_keys: Iterable[str]) -> Dict[str, Set[str]]:
+        """Cohort ids targeted by the given flags, by group type."""
+        cohort_ids = {}
+        for key in flag_keys:
+            for group_type, values in self.grouped_cohort_ids_by_flag.get(key, {}).items():
+                cohort_ids.setdefault(group_type, set()).update(values)
+        return cohort_ids
 
 
 class FlagConfigStorage:
@@ -11,17 +43,36 @@ class FlagConfigStorage:
     def get_flag_configs(self) -> Dict[str, EvaluationFlag]:
         raise NotImplementedError
 
+    def get_snapshot(self) -> FlagConfigSnapshot:
+        return FlagConfigSnapshot(self.get_flag_configs())
+
     def put_flag_config(self, flag_config: EvaluationFlag):
         raise NotImplementedError
 
     def remove_if(self, condition: Callable[[EvaluationFlag], bool]):
         raise NotImplementedError
 
+    def remove_flag_configs(self, keys: Collection[str]):
+        self.remove_if(lambda flag_config: flag_config.key in keys)
+
+    def commit(self):
+        """Called after a full update or a patch has been applied to the storage."""
+        pass
+
 
 class InMemoryFlagConfigStorage(FlagConfigStorage):
     def __init__(self):
         self.flag_configs = {}
         self.flag_configs_lock = Lock()
+        # Incremented on every change, but not when an update leaves the flags as they were; the snapshot is
+        # rebuilt when it was taken at an older revision.
+        self._revision = 0
+        self._snapshot = FlagConfigSnapshot({})
+        self._snapshot_revision = 0
+        register_after_fork(self._reinit_after_fork)
+
+    def _reinit_after_fork(self):
+        self.flag_configs_lock = Lock()
 
     def get_flag_config(self, key: str) -> EvaluationFlag:
         with self.flag_configs_lock:
@@ -31,10 +82,41 @@ class InMemoryFlagConfigStorage(FlagConfigStorage):
         with self.flag_configs_lock:
             return self.flag_configs.copy()
 
+    def get_snapshot(self) -> FlagConfigSnapshot:
+        with self.flag_configs_lock:
+            if self._snapshot_revision == self._revision:
+                return self._snapshot
+            revision = self._revision
+            flag_configs = self.flag_configs.copy()
+        # Computed outside the lock so evaluations are not blocked on it.
+        snapshot = FlagConfigSnapshot(flag_configs)
+        with self.flag_configs_lock:
+            if revision > self._snapshot_revision:
+                self._snapshot = snapshot
+                self._snapshot_revision = revision
+        return snapshot
+
     def put_flag_config(self, flag_config: EvaluationFlag):
         with self.flag_configs_lock:
+            if self.flag_configs.get(flag_config.key) == flag_config:
+                return
             self.flag_configs[flag_config.key] = flag_config
+            self._revision += 1
 
     def remove_if(self, condition: Callable[[EvaluationFlag], bool]):
         with self.flag_configs_lock:
-            self.flag_configs = {key: value for key, value in self.flag_configs.items() if not condition(value)}
+            flag_configs = {key: value for key, value in self.flag_configs.items() if not condition(value)}
+            if len(flag_configs) == len(self.flag_configs):
+                return
+            self.flag_configs = flag_configs
+            self._revision += 1
+
+    def remove_flag_configs(self, keys: Collection[str]):
+        with self.flag_configs_lock:
+            removed = [self.flag_configs.pop(key) for key in keys if key in self.flag_configs]
+            if removed:
+                self._revision += 1
+
+    def commit(self):
+        # Take the snapshot at update time, so evaluations do not pay for it.
+        self.get_snapshot()
@@ -1,16 +1,18 @@
 import logging
 import threading
 import time
-from typing import List, Callable, Optional
+from typing import List, Callable, Optional, Union
 
 from ..evaluation.types import EvaluationFlag
 from ..local.config import LocalEvaluationConfig
 from ..cohort.cohort_storage import CohortStorage
-from ..flag.flag_config_api import FlagConfigApi, FlagConfigStreamApi
+from ..flag.flag_config_api import FlagConfigApi, FlagConfigPatch, FlagConfigStreamApi
+from ..flag.flag_config_async_stream_api import AsyncFlagConfigStreamApi
 from ..flag.flag_config_storage import FlagConfigStorage
 from ..local.poller import Poller
 from ..cohort.cohort_loader import CohortLoader
 from ..util.flag_config import get_all_cohort_ids_from_flag
+from ..util.fork import register_after_fork
 from ..util.updater import get_duration_with_jitter
 
 
@@ -36,7 +38,20 @@ class FlagConfigUpdaterBase:
     def update(self, flag_configs: List[EvaluationFlag]):
         flag_keys = {flag.key for flag in flag_configs}
         self.flag_config_storage.remove_if(lambda f: f.key not in flag_keys)
+        self._put_flag_configs(flag_configs)
+        self.flag_config_storage.commit()
+        self.logger.debug(f"Refreshed {len(flag_configs)} flag configs.")
+
+    def apply_patch(self, patch: FlagConfigPatch):
+        """Apply an incremental update, touching only the upserted and deleted flags in storage."""
+        if patch.deletes:
+            self.flag_config_storage.remove_flag_configs(set(patch.deletes))
+        self._put_flag_configs(patch.upserts)
+        self.flag_config_storage.commit()
+        self.logger.debug(f"Patched flag configs to version {patch.version}: {len(patch.upserts)} upserted, "
+                          f"{len(patch.deletes)} deleted.")
 
+    def _put_flag_configs(self, flag_configs: List[EvaluationFlag]):
         if not self.cohort_loader:
             for flag_config in flag_configs:
                 self.logger.debug(f"Putting non-cohort flag {flag_config.key}")
@@ -68,12 +83,10 @@ class FlagConfigUpdaterBase:
 
         # delete unused cohorts
         self._delete_unused_cohorts()
-        self.logger.debug(f"Refreshed {len(flag_configs)} flag configs.")
 
     def _delete_unused_cohorts(self):
-        flag_cohort_ids = set()
-        for flag in self.flag_config_storage.get_flag_configs().values():
-            flag_cohort_ids.update(get_all_cohort_ids_from_flag(flag))
+        # The snapshot taken here is reused by the commit following this update.
+        flag_cohort_ids = set().union(*self.flag_config_storage.get_snapshot().cohort_ids_by_flag.values())
 
         storage_cohorts = self.cohort_storage.get_cohorts()
         deleted_cohort_ids = set(storage_cohorts.keys()) - flag_cohort_ids
@@ -130,7 +143,8 @@ class FlagConfigPoller(FlagConfigUpdaterBase, FlagConfigUpdater):
 
 
 class FlagConfigStreamer(FlagConfigUpdaterBase, FlagConfigUpdater):
-    def __init__(self, flag_config_stream_api: FlagConfigStreamApi, flag_config_storage: FlagConfigStorage,
+    def __init__(self, flag_config_stream_api: Union[FlagConfigStreamApi, AsyncFlagConfigStreamApi],
+                 flag_config_storage: FlagConfigStorage,
                  cohort_loader: CohortLoader,
                  cohort_storage: CohortStorage,
                  logger: logging.Logger):
@@ -145,7 +159,7 @@ class FlagConfigStreamer(FlagConfigUpdaterBase, FlagConfigUpdater):
             if on_error:
                 on_error(err)
 
-        self.flag_config_stream_api.start(super().update, _on_error)
+        self.flag_config_stream_api.start(super().update, _on_error, super().apply_patch)
 
     def stop(self):
         self.flag_config_stream_api.stop()
@@ -170,6 +184,13 @@ class FlagConfigUpdaterFallbackRetryWrapper(FlagConfigUpdater):
         self.fallback_retry_stopper = threading.Event()
 
         self.lock = threading.RLock()
+        register_after_fork(self._reinit_after_fork)
+
+    def _reinit_after_fork(self):
+        # Retry threads do not exist in the child; start() schedules new ones if needed.
+        self.main_retry_stopper = threading.Event()
+        self.fallback_retry_stopper = threading.Event()
+        self.lock = threading.RLock()
 
     def start(self, on_error: Optional[Callable[[str], None]]):
         with self.lock:
@@ -0,0 +1,182 @@
+import hashlib
+import logging
+import threading
+import time
+from typing import Callable, Collection, Dict, List, Optional
+
+from .flag_config_storage import FlagConfigSnapshot, FlagConfigStorage, InMemoryFlagConfigStorage
+from ..evaluation.types import EvaluationFlag
+from ..util.fork import register_after_fork
+from ..util.shared_memory import attach_shared_memory, open_shared_memory, unlink_shared_memory
+
+# Segment layout: a header of two unsigned 64-bit words, the sequence number and the payload length, followed by
+# the JSON list of flags, in the format of the flag config API. Any process of the same user can write the segment,
+# so it holds data only, never anything deserialized into arbitrary objects. The sequence number is odd while a
+# snapshot is being written; each published snapshot advances it by two, so it doubles as the snapshot version.
+HEADER_BYTES = 16
+READ_RETRIES = 100
+ATTACH_INTERVAL_SECONDS = 1.0
+
+
+def _dumps_flags(flags: List[EvaluationFlag]) -> bytes:
+    return EvaluationFlag.schema().dumps(flags, many=True).encode('utf-8')
+
+
+def _loads_flags(payload: bytes) -> List[EvaluationFlag]:
+    return EvaluationFlag.schema().loads(payload.decode('utf-8'), many=True)
+
+
+class SharedFlagConfigPublisher(InMemoryFlagConfigStorage):
+    """
+    Flag config storage of the process which fetches flag configs for a host. Behaves like InMemoryFlagConfigStorage
+    and, on every commit which changed the flags, publishes all flags as a new snapshot version to a shared memory
+    segment read by SharedFlagConfigStorage instances in other processes. There must be one publisher per segment.
+    """
+
+    def __init__(self, name: str, max_size_bytes: int, logger: logging.Logger = None):
+        super().__init__()
+        self.name = name
+        self.logger = logger or logging.getLogger("Amplitude")
+        self._shm = open_shared_memory(name, max_size_bytes)
+        self._header = self._shm.buf[:HEADER_BYTES].cast('Q')
+        self._publish_lock = threading.Lock()
+        # Digest of the last published payload, so polls which changed nothing do not make readers reload.
+        self._published_digest: Optional[bytes] = None
+
+    def _reinit_after_fork(self):
+        super()._reinit_after_fork()
+        self._publish_lock = threading.Lock()
+
+    def commit(self):
+        flags = sorted(self.get_snapshot().flag_configs.values(), key=lambda flag: flag.key)
+        payload = _dumps_flags(flags)
+        digest = hashlib.blake2b(payload, digest_size=16).digest()
+        with self._publish_lock:
+            if digest == self._published_digest:
+                return
+            if HEADER_BYTES + len(payload) > self._shm.size:
+                self.logger.warning(f"[Experiment] Flag snapshot of {len(payload)} bytes does not fit in shared "
+                                    f"memory segment {self.name} of {self._shm.size} bytes, not published")
+                return
+            header = self._header
+            sequence = header[0]
+            # Readers retry while the sequence number is odd or has changed under them.
+            header[0] = sequence + 1
+            self._shm.buf[HEADER_BYTES:HEADER_BYTES + len(payload)] = payload
+            header[1] = len(payload)
+            header[0] = sequence + 2
+            self._published_digest = digest
+
+    def version(self) -> int:
+        return self._header[0] // 2
+
+    def close(self):
+        """Detach this process from the segment."""
+        self._header.release()
+        self._shm.close()
+
+    def unlink(self):
+        """Destroy the segment. Call once no process needs it anymore."""
+        unlink_shared_memory(self._shm)
+
+
+class SharedFlagConfigStorage(FlagConfigStorage):
+    """
+    Read-only flag config storage backed by the snapshot of a SharedFlagConfigPublisher in another process. Each
+    read checks the snapshot's version, a single shared memory load, and deserializes the flags, and takes a new
+    FlagConfigSnapshot of them, only when the version changed. Until the publisher has created the segment, the
+    storage is empty.
+    """
+
+    def __init__(self, name: str, logger: logging.Logger = None):
+        self.name = name
+        self.logger = logger or logging.getLogger("Amplitude")
+        self._snapshot = FlagConfigSnapshot({})
+        self._sequence = 0
+        self._shm = None
+        self._header = None
+        self._next_attach = 0.0
+        self._lock = threading.Lock()
+        register_after_fork(self._reinit_after_fork)
+
+    def _reinit_after_fork(self):
+        self._lock = threading.Lock()
+
+    def get_flag_config(self, key: str) -> EvaluationFlag:
+        self._refresh()
+        return self._snapshot.flag_configs.get(key)
+
+    def get_flag_configs(self) -> Dict[str, EvaluationFlag]:
+        self._refresh()
+        return self._snapshot.flag_configs.copy()
+
+    def get_snapshot(self) -> FlagConfigSnapshot:
+        self._refresh()
+        return self._snapshot
+
+    def put_flag_config(self, flag_config: EvaluationFlag):
+        raise NotImplementedError("Shared flag config storage is read-only")
+
+    def remove_if(self, condition: Callable[[EvaluationFlag], bool]):
+        raise NotImplementedError("Shared flag config storage is read-only")
+
+    def remove_flag_configs(self, keys: Collection[str]):
+        raise NotImplementedError("Shared flag config storage is read-only")
+
+    def version(self) -> int:
+        return self._sequence // 2
+
+    def close(self):
+        """Detach this process from the segment."""
+        with self._lock:
+            if self._header is not None:
+                self._header.release()
+                self._shm.close()
+            self._header = None
+            self._shm = None
+
+    def _refresh(self):
+        header = self._header
+        if header is None:
+            header = self._attach()
+            if header is None:
+                return
+        sequence = header[0]
+        if sequence == self._sequence or sequence & 1:
+            # Unchanged, or a new version is being written; keep serving the current snapshot meanwhile.
+            return
+        with self._lock:
+            if self._header is None or self._sequence == self._header[0]:
+                return
+            flags = self._read_snapshot()
+            if flags is not None:
+                self._snapshot = FlagConfigSnapshot(flags)
+
+    def _read_snapshot(self) -> Optional[Dict[str, EvaluationFlag]]:
+        header = self._header
+        for _ in range(READ_RETRIES):
+            sequence = header[0]
+            if sequence & 1:
+                time.sleep(0)
+                continue
+            length = header[1]
+            payload = bytes(self._shm.buf[HEADER_BYTES:HEADER_BYTES + length])
+            if header[0] != sequence:
+                continue
+            self._sequence = sequence
+            return {flag.key: flag for flag in _loads_flags(payload)}
+        return None
+
+    def _attach(self) -> Optional[memoryview]:
+        now = time.monotonic()
+        if now < self._next_attach:
+            return None
+        with self._lock:
+            if self._header is None:
+                self._next_attach = now + ATTACH_INTERVAL_SECONDS
+                shm = attach_shared_memory(self.name)
+                if shm is None:
+                    return None
+                self._shm = shm
+                self._header = shm.buf[:HEADER_BYTES].cast('Q')
+            return self._header
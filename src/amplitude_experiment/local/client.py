@@ -1,29 +1,41 @@
+import threading
+import time
 from concurrent.futures import wait
 from threading import Lock
-from typing import Any, List, Dict, Set, Optional
+from typing import Any, List, Dict, Set, Optional, FrozenSet, Tuple
 
 from amplitude import Amplitude
 
 from .config import LocalEvaluationConfig
 from .evaluate_options import EvaluateOptions
+from .evaluation_cache import EvaluationResultCache, get_evaluation_cache_key
 from ..assignment import Assignment, AssignmentFilter, AssignmentService
-from ..exposure import Exposure, ExposureFilter, ExposureService
+from ..exposure import AsyncExposureService, Exposure, ExposureFilter, ExposureService, ProbabilisticExposureFilter
 from ..cohort.cohort import USER_GROUP_TYPE
 from ..cohort.cohort_download_api import DirectCohortDownloadApi
 from ..cohort.cohort_loader import CohortLoader
+from ..cohort.cohort_membership import CohortMembership
 from ..cohort.cohort_storage import InMemoryCohortStorage
 from ..deployment.deployment_runner import DeploymentRunner
 from ..flag.flag_config_api import FlagConfigApiV2, FlagConfigStreamApi
-from ..flag.flag_config_storage import InMemoryFlagConfigStorage
+from ..flag.flag_config_async_stream_api import AsyncFlagConfigStreamApi
+from ..flag.flag_config_storage import FlagConfigSnapshot, InMemoryFlagConfigStorage
+from ..flag.shared_flag_config_storage import SharedFlagConfigPublisher, SharedFlagConfigStorage
 from ..user import User
 from ..connection_pool import HTTPConnectionPool
 from ..evaluation.engine import EvaluationEngine
+from ..evaluation.hash_cache import BucketingHashCache, BucketingHashCacheStats
+from ..evaluation.types import EvaluationVariant
 from ..evaluation.topological_sort import topological_sort
 from ..util import deprecated
-from ..util.flag_config import get_grouped_cohort_ids_from_flags, get_all_cohort_ids_from_flag
-from ..util.user import user_to_evaluation_context
+from ..util.fork import register_after_fork
+from ..util.user import UserEvaluationContext
 from ..variant import Variant
 
+# A flag evaluated without some of its cohorts in storage is reported at most once per interval, unless the set of
+# missing cohorts changes.
+MISSING_COHORTS_WARNING_INTERVAL_SECONDS = 60
+
 
 class LocalEvaluationClient:
     """Experiment client for evaluating variants for a user locally."""
@@ -41,9 +53,12 @@ class LocalEvaluationClient:
 
         if not api_key:
             raise ValueError("Experiment API key is empty")
-        self.engine = EvaluationEngine()
         self.api_key = api_key
         self.config = config or LocalEvaluationConfig()
+        hash_cache = None
+        if self.config.bucketing_hash_cache_capacity > 0:
+            hash_cache = BucketingHashCache(self.config.bucketing_hash_cache_capacity)
+        self.engine = EvaluationEngine(hash_cache)
         self.assignment_service = None
         if config and config.assignment_config:
             instance = Amplitude(config.assignment_config.api_key, config.assignment_config)
@@ -54,12 +69,35 @@ class LocalEvaluationClient:
         if config and config.exposure_config:
             exposure_config = config.exposure_config
             exposure_instance = Amplitude(exposure_config.api_key, exposure_config)
-            self.exposure_service = ExposureService(exposure_instance, ExposureFilter(exposure_config.cache_capacity))
+            if exposure_config.dedupe_backend is not None:
+                exposure_filter = ExposureFilter(exposure_config.cache_capacity,
+                                                 backend=exposure_config.dedupe_backend)
+            elif exposure_config.probabilistic_dedupe:
+                exposure_filter = ProbabilisticExposureFilter(exposure_config.probabilistic_dedupe_capacity,
+                                                              exposure_config.probabilistic_dedupe_false_positive_rate)
+            else:
+                exposure_filter = ExposureFilter(exposure_config.cache_capacity)
+            if exposure_config.async_tracking:
+                self.exposure_service = AsyncExposureService(exposure_instance, exposure_filter,
+                                                             exposure_config.queue_capacity,
+                                                             exposure_config.queue_overflow_policy,
+                                                             self.config.logger,
+                                                             exposure_config.batch_window_millis)
+            else:
+                self.exposure_service = ExposureService(exposure_instance, exposure_filter, self.config.logger)
         self.logger = self.config.logger
         self.__setup_connection_pool()
         self.lock = Lock()
+        self._missing_cohorts_warnings: Dict[str, Tuple[FrozenSet[str], float]] = {}
         self.cohort_storage = InMemoryCohortStorage()
-        self.flag_config_storage = InMemoryFlagConfigStorage()
+        snapshot_config = self.config.flag_snapshot_config
+        if snapshot_config is None:
+            self.flag_config_storage = InMemoryFlagConfigStorage()
+        elif snapshot_config.publisher:
+            self.flag_config_storage = SharedFlagConfigPublisher(snapshot_config.name, snapshot_config.max_size_bytes,
+                                                                 self.logger)
+        else:
+            self.flag_config_storage = SharedFlagConfigStorage(snapshot_config.name, self.logger)
         cohort_loader = None
         if self.config.cohort_sync_config:
             cohort_download_api = DirectCohortDownloadApi(self.config.cohort_sync_config.api_key,
@@ -72,19 +110,37 @@ class LocalEvaluationClient:
         flag_config_api = FlagConfigApiV2(api_key, self.config.server_url,
                                           self.config.flag_config_poller_request_timeout_millis)
         flag_config_stream_api = None
-        if self.config.stream_updates:
+        if self.config.stream_updates and self.config.stream_event_loop is not None:
+            flag_config_stream_api = AsyncFlagConfigStreamApi(api_key, self.config.stream_server_url,
+                                                              self.config.stream_flag_conn_timeout,
+                                                              self.config.stream_event_loop)
+        elif self.config.stream_updates:
             flag_config_stream_api = FlagConfigStreamApi(api_key, self.config.stream_server_url, self.config.stream_flag_conn_timeout)
 
         self.deployment_runner = DeploymentRunner(self.config, flag_config_api, flag_config_stream_api,
                                                   self.flag_config_storage, self.cohort_storage, self.logger,
-                                                  cohort_loader)
+                                                  cohort_loader,
+                                                  snapshot_config is None or snapshot_config.publisher)
+        self.evaluation_cache = None
+        if self.config.evaluation_cache_config:
+            self.evaluation_cache = EvaluationResultCache(self.config.evaluation_cache_config)
+        self._started = False
+        self._restart_pending = False
+        register_after_fork(self._reinit_after_fork)
 
     def start(self):
         """
         Fetch initial flag configurations and start polling for updates. You must call this function to begin
         polling for flag config updates.
+
+        A client started before os.fork() (e.g. preloaded by a pre-fork server) keeps working in the child process:
+        the child evaluates against the flag configs and cohorts loaded so far while polling or streaming restarts
+        in the background, from their first evaluation. Children of a flag snapshot publisher read the parent's
+        snapshot instead of publishing.
         """
+        self._restart_pending = False
         self.deployment_runner.start()
+        self._started = True
 
     def evaluate_v2(self, user: User, flag_keys: Set[str] = None, options: EvaluateOptions = None) -> Dict[str, Variant]:
         """
@@ -100,39 +156,52 @@ class LocalEvaluationClient:
                 options (EvaluateOptions): Optional evaluation options.
 
             Returns:
-                The evaluated variants.
+                The evaluated variants. Their metadata is a read-only mapping shared between evaluations.
         """
-        
-        flag_configs = self.flag_config_storage.get_flag_configs()
+        if self._restart_pending:
+            self.__start_pending_restart()
+        snapshot = self.flag_config_storage.get_snapshot()
+        flag_configs = snapshot.flag_configs
         if flag_configs is None or len(flag_configs) == 0:
             return {}
+        cache_key = cohort_revision = None
+        if self.evaluation_cache is not None:
+            cohort_revision = self.cohort_storage.get_revision()
+            if cohort_revision is not None:
+                cache_key = get_evaluation_cache_key(user, flag_keys)
+        if cache_key is not None:
+            variants = self.evaluation_cache.get(snapshot, cohort_revision, cache_key)
+            if variants is not None:
+                self.logger.debug(f"[Experiment] Evaluate Cached Result: {variants}")
+                self.__track(user, variants, options)
+                return variants
         self.logger.debug(f"[Experiment] Evaluate: user={user} - Flags: {flag_configs}")
         sorted_flags = topological_sort(flag_configs, flag_keys and list(flag_keys))
         if not sorted_flags:
             return {}
 
         # Check if all required cohorts are in storage, if not log a warning
-        self._required_cohorts_in_storage(sorted_flags)
+        self._required_cohorts_in_storage(sorted_flags, snapshot)
+        context = UserEvaluationContext(user)
         if self.config.cohort_sync_config:
-            user = self._enrich_user_with_cohorts(user, flag_configs)
-
-        context = user_to_evaluation_context(user)
+            # Only the cohorts targeted by the flags being evaluated, including their dependencies, are looked up.
+            grouped_cohort_ids = snapshot.grouped_cohort_ids if not flag_keys else \
+                snapshot.get_grouped_cohort_ids(flag.key for flag in sorted_flags)
+            self._add_cohort_memberships(context, user, grouped_cohort_ids)
         result = self.engine.evaluate(context, sorted_flags)
-        variants = {
-            k: Variant(
-                key=v.key,
-                value=v.value,
-                payload=v.payload,
-                metadata=v.metadata
-            ) for k, v in result.items()
-        }
+        variants = {k: self.__to_variant(v) for k, v in result.items()}
         self.logger.debug(f"[Experiment] Evaluate Result: {variants}")
+        if cache_key is not None:
+            self.evaluation_cache.put(snapshot, cohort_revision, cache_key, variants)
+        self.__track(user, variants, options)
+        return variants
+
+    def __track(self, user: User, variants: Dict[str, Variant], options: Optional[EvaluateOptions]):
         if self.exposure_service is not None and options and options.tracks_exposure is True:
             self.exposure_service.track(Exposure(user, variants))
         if self.assignment_service is not None:
             # @deprecated Assignment tracking is deprecated. Use ExposureService with Exposure tracking instead.
             self.assignment_service.track(Assignment(user, variants))
-        return variants
 
     @deprecated("Use evaluate_v2")
     def evaluate(self, user: User, flag_keys: List[str] = None) -> Dict[str, Variant]:
@@ -153,6 +222,15 @@ class LocalEvaluationClient:
         variants = self.evaluate_v2(user, flag_keys)
         return self.__filter_default_variants(variants)
 
+    def bucketing_hash_cache_stats(self) -> Optional[BucketingHashCacheStats]:
+        """
+        Snapshot of the bucketing hash cache's size, hits, misses and evictions, or None if the cache is disabled.
+        Useful for sizing bucketing_hash_cache_capacity.
+        """
+        if self.engine.hash_cache is None:
+            return None
+        return self.engine.hash_cache.stats()
+
     def __setup_connection_pool(self):
         scheme, _, host = self.config.server_url.split('/', 3)
         timeout = self.config.flag_config_poller_request_timeout_millis / 1000
@@ -172,11 +250,21 @@ class LocalEvaluationClient:
                   events to finish sending before returning. Defaults to 10 seconds. Pass None to wait
                   indefinitely.
         """
+        self._started = False
+        self._restart_pending = False
         self.deployment_runner.stop()
         self._connection_pool.close()
         self.__flush_event_services(timeout)
 
     def __flush_event_services(self, timeout: Optional[float]) -> None:
+        if isinstance(self.exposure_service, AsyncExposureService):
+            # Drain queued exposures into the Amplitude client before flushing it.
+            start = time.monotonic()
+            if not self.exposure_service.stop(timeout):
+                self.logger.warning(f"[Experiment] Stop timed out after {timeout}s waiting for "
+                                    f"queued exposures to be tracked")
+            if timeout is not None:
+                timeout = max(0.0, timeout - (time.monotonic() - start))
         instances = [service.amplitude for service in (self.assignment_service, self.exposure_service)
                      if service is not None]
         futures = []
@@ -188,12 +276,51 @@ class LocalEvaluationClient:
                 self.logger.warning(f"[Experiment] Stop timed out after {timeout}s waiting for "
                                     f"{len(not_done)} pending event batch(es) to flush")
 
+    def _reinit_after_fork(self):
+        # Registered last, so the components below have already rebuilt their locks and stopped their threads.
+        self.lock = Lock()
+        if isinstance(self.flag_config_storage, SharedFlagConfigPublisher):
+            # One publisher per segment: the parent keeps publishing and the child reads its snapshots.
+            runner = self.deployment_runner
+            self.flag_config_storage = SharedFlagConfigStorage(self.flag_config_storage.name, self.logger)
+            self.deployment_runner = DeploymentRunner(self.config, runner.flag_config_api, None,
+                                                      self.flag_config_storage, self.cohort_storage, self.logger,
+                                                      runner.cohort_loader, False)
+        # Restarted on first use in the child rather than here, so forking starts no threads.
+        self._restart_pending = self._started
+
+    def __start_pending_restart(self):
+        with self.lock:
+            if not self._restart_pending:
+                return
+            self._restart_pending = False
+        # Fetching blocks on the network, which must not hold up the evaluating caller.
+        threading.Thread(target=self.__restart_after_fork, name='ExperimentRestartAfterFork',
+                         daemon=True).start()
+
+    def __restart_after_fork(self):
+        try:
+            self.deployment_runner.start()
+        except Exception as e:
+            self.logger.warning(f"[Experiment] Failed to restart flag config updates after fork: {e}")
+
     def __enter__(self) -> 'LocalEvaluationClient':
         return self
 
     def __exit__(self, *exit_info: Any) -> None:
         self.stop()
 
+    @staticmethod
+    def __to_variant(result: EvaluationVariant) -> Variant:
+        # The metadata is the engine's read-only mapping, shared by every result for the same flag, segment and
+        # variant.
+        return Variant(
+            key=result.key,
+            value=result.value,
+            payload=result.payload,
+            metadata=result.metadata
+        )
+
     @staticmethod
     def __filter_default_variants(variants: Dict[str, Variant]) -> Dict[str, Variant]:
         def is_default_variant(variant: Variant) -> bool:
@@ -203,12 +330,16 @@ class LocalEvaluationClient:
 
         return {key: variant for key, variant in variants.items() if not is_default_variant(variant)}
 
-    def _required_cohorts_in_storage(self, flag_configs: List) -> None:
-        stored_cohort_ids = self.cohort_storage.get_cohort_ids()
+    def _required_cohorts_in_storage(self, flag_configs: List, snapshot: FlagConfigSnapshot) -> None:
+        stored_cohort_ids = None
         for flag in flag_configs:
-            flag_cohort_ids = get_all_cohort_ids_from_flag(flag)
+            flag_cohort_ids = snapshot.cohort_ids_by_flag.get(flag.key)
+            if not flag_cohort_ids:
+                continue
+            if stored_cohort_ids is None:
+                stored_cohort_ids = self.cohort_storage.get_cohort_ids()
             missing_cohorts = flag_cohort_ids - stored_cohort_ids
-            if missing_cohorts:
+            if missing_cohorts and self.__should_warn_missing_cohorts(flag.key, missing_cohorts):
                 message = (
                     f"Evaluating flag {flag.key} dependent on cohorts {flag_cohort_ids} "
                     f"without {missing_cohorts} in storage"
@@ -218,25 +349,27 @@ class LocalEvaluationClient:
                 )
                 self.logger.warning(message)
 
-    def _enrich_user_with_cohorts(self, user: User, flag_configs: Dict) -> User:
-        grouped_cohort_ids = get_grouped_cohort_ids_from_flags(list(flag_configs.values()))
-
-        if USER_GROUP_TYPE in grouped_cohort_ids:
-            user_cohort_ids = grouped_cohort_ids[USER_GROUP_TYPE]
-            if user_cohort_ids and user.user_id:
-                user.cohort_ids = list(self.cohort_storage.get_cohorts_for_user(user.user_id, user_cohort_ids))
+    def __should_warn_missing_cohorts(self, flag_key: str, missing_cohorts: Set[str]) -> bool:
+        missing_cohorts = frozenset(missing_cohorts)
+        now = time.monotonic()
+        with self.lock:
+            last = self._missing_cohorts_warnings.get(flag_key)
+            if last is not None and last[0] == missing_cohorts and \
+                    now - last[1] < MISSING_COHORTS_WARNING_INTERVAL_SECONDS:
+                return False
+            self._missing_cohorts_warnings[flag_key] = (missing_cohorts, now)
+            return True
+
+    def _add_cohort_memberships(self, context: UserEvaluationContext, user: User,
+                                grouped_cohort_ids: Dict[str, Set[str]]) -> None:
+        user_cohort_ids = grouped_cohort_ids.get(USER_GROUP_TYPE)
+        if user_cohort_ids and user.user_id:
+            context.set_cohort_ids(CohortMembership(self.cohort_storage, USER_GROUP_TYPE, user.user_id,
+                                                    user_cohort_ids))
 
         if user.groups:
             for group_type, group_names in user.groups.items():
-                group_name = group_names[0] if group_names else None
-                if not group_name:
-                    continue
-                cohort_ids = grouped_cohort_ids.get(group_type, [])
-                if not cohort_ids:
-                    continue
-                user.add_group_cohort_ids(
-                    group_type,
-                    group_name,
-                    list(self.cohort_storage.get_cohorts_for_group(group_type, group_name, cohort_ids))
-                )
-        return user
+                cohort_ids = grouped_cohort_ids.get(group_type)
+                if cohort_ids and isinstance(group_names, list) and group_names:
+                    context.set_group_cohort_ids(group_type, CohortMembership(self.cohort_storage, group_type,
+                                                                              group_names[0], cohort_ids))
@@ -1,9 +1,12 @@
+import asyncio
 import logging
 import sys
 
 from ..assignment import AssignmentConfig
 from ..exposure import ExposureConfig
 from ..cohort.cohort_sync_config import CohortSyncConfig, DEFAULT_COHORT_SYNC_URL, EU_COHORT_SYNC_URL
+from .evaluation_cache_config import EvaluationCacheConfig
+from .flag_snapshot_config import FlagSnapshotConfig
 from ..server_zone import ServerZone
 
 DEFAULT_SERVER_URL = 'https://api.lab.amplitude.com'
@@ -24,9 +27,13 @@ class LocalEvaluationConfig:
                  stream_updates: bool = False,
                  stream_server_url: str = DEFAULT_STREAM_URL,
                  stream_flag_conn_timeout: int = 1500,
+                 stream_event_loop: asyncio.AbstractEventLoop = None,
                  assignment_config: AssignmentConfig = None,
                  exposure_config: ExposureConfig = None,
                  cohort_sync_config: CohortSyncConfig = None,
+                 flag_snapshot_config: FlagSnapshotConfig = None,
+                 evaluation_cache_config: EvaluationCacheConfig = None,
+                 bucketing_hash_cache_capacity: int = 0,
                  logger: logging.Logger = None):
         """
         Initialize a config
@@ -38,9 +45,25 @@ class LocalEvaluationConfig:
                   configurations.
                 flag_config_poller_request_timeout_millis (int): The request timeout, in milliseconds, used when
                   fetching flag configurations.
+                stream_updates (bool): Stream flag config updates instead of polling for them. Polling is used as a
+                  fallback while the stream is unavailable.
+                stream_server_url (str): The server endpoint from which to stream flag configs.
+                stream_flag_conn_timeout (int): The timeout, in milliseconds, to connect to the stream and receive the
+                  initial flag configs.
+                stream_event_loop (asyncio.AbstractEventLoop): Optional running event loop to read the flag config
+                  stream on, for applications already running asyncio. The stream is then read by a single task on
+                  this loop instead of dedicated threads. Only used when stream_updates is enabled.
                 assignment_config (AssignmentConfig): The assignment configuration. @deprecated use exposure_config instead.
                 exposure_config (ExposureConfig): The exposure configuration.
                 cohort_sync_config (CohortSyncConfig): The cohort sync configuration.
+                flag_snapshot_config (FlagSnapshotConfig): Optional configuration to share flag configs between the
+                  processes of a host through shared memory. Only the publisher process fetches flag configs; the
+                  others read its snapshot and only keep their cohorts up to date.
+                evaluation_cache_config (EvaluationCacheConfig): Optional configuration to cache evaluation results,
+                  so repeated evaluations of the same user return the previous variants without evaluating flags.
+                bucketing_hash_cache_capacity (int): Number of bucketing hashes, by bucket salt and bucketing value
+                  (e.g. device id), to keep so users evaluated repeatedly are bucketed without hashing. Disabled when
+                  0, the default.
                 logger (logging.Logger): Optional logger instance. If provided, this logger will be used instead of
                   creating a new one. The debug flag only applies when no logger is provided.
 
@@ -65,8 +88,12 @@ class LocalEvaluationConfig:
         self.flag_config_poller_request_timeout_millis = flag_config_poller_request_timeout_millis
         self.stream_updates = stream_updates
         self.stream_flag_conn_timeout = stream_flag_conn_timeout
+        self.stream_event_loop = stream_event_loop
         self.assignment_config = assignment_config
         self.exposure_config = exposure_config
+        self.flag_snapshot_config = flag_snapshot_config
+        self.evaluation_cache_config = evaluation_cache_config
+        self.bucketing_hash_cache_capacity = bucketing_hash_cache_capacity
         # Set up logger: use provided logger or create default one
         if logger is None:
             self.logger = logging.getLogger("Amplitude")
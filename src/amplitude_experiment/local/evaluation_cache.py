@@ -0,0 +1,66 @@
+import copy
+import weakref
+from typing import Any, Dict, Hashable, Optional, Set
+
+from .evaluation_cache_config import EvaluationCacheConfig
+from ..flag.flag_config_storage import FlagConfigSnapshot
+from ..user import FIELDS, User
+from ..util.cache import Cache
+from ..variant import Variant
+
+
+class EvaluationResultCache:
+    """
+    Variants evaluated for a user, by the flag keys and the user's attributes. Each entry records the flag config
+    snapshot and the cohort storage revision it was evaluated with, and is only returned for the same snapshot and
+    revision. Threads still evaluating against an older snapshot miss without clearing entries of the newer one.
+    """
+
+    def __init__(self, config: EvaluationCacheConfig):
+        self.config = config
+        self.cache = Cache(config.capacity, config.ttl_millis)
+
+    def get(self, snapshot: FlagConfigSnapshot, cohort_revision: int, key: Hashable) -> Optional[Dict[str, Variant]]:
+        entry = self.cache.get(key)
+        # The snapshot is held weakly, so an entry does not keep replaced flag configs alive. A collected snapshot
+        # dereferences to None, so its id being reused by a newer snapshot cannot match.
+        if entry is None or entry[0]() is not snapshot or entry[1] != cohort_revision:
+            return None
+        return _copy_variants(entry[2])
+
+    def put(self, snapshot: FlagConfigSnapshot, cohort_revision: int, key: Hashable, variants: Dict[str, Variant]):
+        self.cache.put(key, (weakref.ref(snapshot), cohort_revision, _copy_variants(variants)))
+
+
+def _copy_variants(variants: Dict[str, Variant]) -> Dict[str, Variant]:
+    # Copied on the way in and out, so changes to variants returned by evaluations never reach the cache. Variant
+    # metadata is a read-only mapping and is shared.
+    return {flag_key: copy.copy(variant) for flag_key, variant in variants.items()}
+
+
+def get_evaluation_cache_key(user: User, flag_keys: Optional[Set[str]]) -> Optional[Hashable]:
+    """
+    Key of the result of evaluating the flag keys for the user, or None if some user attribute cannot be hashed.
+    Attributes other than the predefined fields are part of the key too. Cohort membership is covered by the user
+    and group names together with the cohort storage revision.
+    """
+    try:
+        return (frozenset(flag_keys) if flag_keys else None,
+                tuple(_freeze(getattr(user, field)) for field in FIELDS),
+                _freeze(getattr(user, '__dict__', {})))
+    except TypeError:
+        return None
+
+
+def _freeze(value: Any) -> Hashable:
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, dict):
+        return dict, frozenset((key, _freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return list, tuple(_freeze(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return set, frozenset(_freeze(item) for item in value)
+    # Typed, because equal values of different types (True, 1, 1.0) evaluate differently.
+    hash(value)
+    return type(value), value
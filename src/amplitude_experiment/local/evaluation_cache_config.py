@@ -0,0 +1,18 @@
+DEFAULT_EVALUATION_CACHE_CAPACITY = 10000
+DEFAULT_EVALUATION_CACHE_TTL_MILLIS = 60000
+
+
+class EvaluationCacheConfig:
+    """Experiment Local Evaluation Result Cache Configuration
+    Caches the variants evaluated for a user, so evaluating the same user with identical attributes for the same
+    flag keys returns the previous result without running the evaluation engine. The cache is cleared whenever
+    flag configs or cohorts are updated. Exposures and assignments are tracked on every evaluation, cached or not.
+        Parameters:
+            capacity (int): Maximum number of cached results; the least recently used result is evicted first.
+            ttl_millis (int): Time, in milliseconds, after which a result that has not been used expires.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_EVALUATION_CACHE_CAPACITY,
+                 ttl_millis: int = DEFAULT_EVALUATION_CACHE_TTL_MILLIS):
+        self.capacity = capacity
+        self.ttl_millis = ttl_millis
@@ -0,0 +1,22 @@
+DEFAULT_FLAG_SNAPSHOT_MAX_SIZE_BYTES = 16 * 1024 * 1024
+
+
+class FlagSnapshotConfig:
+    """Experiment Shared Flag Snapshot Configuration
+    Shares one flag config snapshot between the processes of a host, e.g. the workers of a pre-fork server, through
+    a named shared memory segment. A single publisher process fetches flag configs (by polling or streaming) and
+    writes a versioned snapshot after every update; every other process reads the snapshot, reloading it only when
+    its version changes, and makes no flag config requests of its own.
+        Parameters:
+            name (str): Name of the shared memory segment. Processes using the same name share flag configs.
+            publisher (bool): Whether this process fetches flag configs and publishes the snapshot. Exactly one
+            process per name should be the publisher.
+            max_size_bytes (int): Size of the shared memory segment. Must be the same in every process and large
+            enough for the serialized flag configs.
+    """
+
+    def __init__(self, name: str, publisher: bool = False,
+                 max_size_bytes: int = DEFAULT_FLAG_SNAPSHOT_MAX_SIZE_BYTES):
+        self.name = name
+        self.publisher = publisher
+        self.max_size_bytes = max_size_bytes
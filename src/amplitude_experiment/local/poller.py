@@ -1,6 +1,8 @@
 import threading
 import time
 
+from ..util.fork import register_after_fork
+
 
 class Poller:
     """
@@ -14,6 +16,13 @@ class Poller:
         self.kwargs = kwargs
         self.is_running = False
         self.next_call = 0
+        register_after_fork(self._reinit_after_fork)
+
+    def _reinit_after_fork(self):
+        # The timer thread does not exist in the child, so the poller is stopped there until started again.
+        self._timer = None
+        self.is_running = False
+        self.next_call = 0
 
     def _run(self):
         self.is_running = False
@@ -7,7 +7,7 @@ from typing import Any, Dict
 
 from .config import RemoteEvaluationConfig
 from .fetch_options import FetchOptions
-from ..connection_pool import EmptyPoolError, HTTPConnectionPool
+from ..connection_pool import ConnectionPoolStats, EmptyPoolError, HTTPConnectionPool
 from ..exception import FetchException
 from ..user import User
 from ..util.deprecated import deprecated
@@ -180,7 +180,16 @@ class RemoteEvaluationClient:
         scheme, _, host = self.config.server_url.split('/', 3)
         timeout = self.config.fetch_timeout_millis / 1000
         self._connection_pool = HTTPConnectionPool(host, max_size=self.config.connection_pool_max_size,
-                                                   idle_timeout=30, read_timeout=timeout, scheme=scheme)
+                                                   idle_timeout=30, read_timeout=timeout, scheme=scheme,
+                                                   listener=self.config.connection_pool_listener,
+                                                   min_idle=self.config.connection_pool_min_idle)
+
+    def connection_pool_stats(self) -> ConnectionPoolStats:
+        """
+        Snapshot of the fetch connection pool's counters: connections in use and idle, connection churn, acquire
+        wait times and exhaustion, and request latency. Useful for sizing connection_pool_max_size.
+        """
+        return self._connection_pool.stats()
 
     def close(self) -> None:
         """
@@ -20,6 +20,8 @@ class RemoteEvaluationConfig:
                  fetch_pool_acquire_timeout_millis=None,
                  server_zone: ServerZone = ServerZone.US,
                  connection_pool_max_size=1,
+                 connection_pool_listener=None,
+                 connection_pool_min_idle=0,
                  logger=None):
         """
         Initialize a config
@@ -44,6 +46,13 @@ class RemoteEvaluationConfig:
                   pool, and therefore the maximum number of concurrent fetch requests. Additional concurrent fetches
                   beyond this limit block waiting for a connection to be released. Defaults to 1 (all fetches in the
                   process share a single keep-alive connection).
+                connection_pool_listener (ConnectionPoolListener): Optional callbacks notified of fetch connection pool
+                  activity (acquire waits, connection churn, request latency), e.g. to export metrics. Counters are
+                  also available from RemoteEvaluationClient.connection_pool_stats().
+                connection_pool_min_idle (int): The number of fetch connections to keep established ahead of time.
+                  They are opened in the background as soon as the client is constructed, and reopened after idle
+                  connections are closed, so fetches do not pay for connection and TLS handshakes. Capped at
+                  connection_pool_max_size. Defaults to 0 (connections are opened on first use).
                 logger (logging.Logger): Optional logger instance. If provided, this logger will be used instead of
                   creating a new one. The debug flag only applies when no logger is provided.
 
@@ -61,6 +70,8 @@ class RemoteEvaluationConfig:
         self.fetch_pool_acquire_timeout_millis = fetch_pool_acquire_timeout_millis
         self.server_zone = server_zone
         self.connection_pool_max_size = connection_pool_max_size
+        self.connection_pool_listener = connection_pool_listener
+        self.connection_pool_min_idle = connection_pool_min_idle
         if server_url == DEFAULT_SERVER_URL and server_zone == ServerZone.EU:
             self.server_url = EU_SERVER_URL
 
@@ -2,6 +2,11 @@ import json
 
 from typing import Dict, Any, Set, List
 
+# Predefined fields of a User, in to_json order.
+FIELDS = ('device_id', 'user_id', 'country', 'city', 'region', 'dma', 'language', 'platform', 'version', 'os',
+          'device_manufacturer', 'device_brand', 'device_model', 'carrier', 'library', 'ip_address',
+          'user_properties', 'groups', 'group_properties', 'group_cohort_ids', 'cohort_ids')
+
 
 class User:
     """
@@ -9,6 +14,10 @@ class User:
     All other predefined fields and user properties are used for rule based user targeting.
     """
 
+    # Slots make the predefined fields fast to read. Any other attribute can still be set, as on any object; the
+    # instance __dict__ is only allocated once one is.
+    __slots__ = FIELDS + ('__dict__',)
+
     def __init__(
             self,
             device_id: str = None,
@@ -83,7 +92,7 @@ class User:
 
     def to_json(self):
         """Return user information as JSON string."""
-        return json.dumps(self, default=lambda o: o.__dict__)
+        return json.dumps(self, default=_to_json_dict)
 
     def __str__(self):
         """Return user as string"""
@@ -102,3 +111,10 @@ class User:
 
         group_names = self.group_cohort_ids.setdefault(group_type, {})
         group_names[group_name] = cohort_ids
+
+
+def _to_json_dict(o: Any) -> Dict[str, Any]:
+    if isinstance(o, User):
+        # Other attributes follow the predefined fields.
+        return {**{field: getattr(o, field) for field in FIELDS}, **o.__dict__}
+    return o.__dict__
@@ -1,3 +1,3 @@
-from .cache import Cache
-from .hash_code import hash_code
+from .cache import Cache, ShardedCache
+from .hash_code import hash_code, hash64
 from .deprecated import deprecated
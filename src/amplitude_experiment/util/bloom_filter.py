@@ -0,0 +1,108 @@
+import hashlib
+import math
+import threading
+import time
+from typing import Union
+
+from .fork import register_after_fork
+
+
+class RotatingBloomFilter:
+    """
+    Fixed-size, thread-safe Bloom filter with time based expiry.
+
+    Two generations of bits are kept. Items are inserted into the current generation and looked up in both; every
+    ttl_millis the previous generation is discarded and the current one takes its place. An item is therefore
+    remembered for at least ttl_millis after it was last seen and forgotten at most 2 * ttl_millis after. Memory
+    use is fixed at construction and does not depend on how many distinct items are inserted.
+
+    Keys are strings, or ints holding an already computed uniformly distributed 64-bit fingerprint.
+    """
+
+    def __init__(self, capacity: int, false_positive_rate: float, ttl_millis: int):
+        """
+            Parameters:
+                capacity (int): Expected number of distinct items inserted per ttl_millis window.
+                false_positive_rate (float): Target probability that an unseen item is reported as seen when the
+                  filter holds capacity items.
+                ttl_millis (int): Rotation interval of the generations.
+        """
+        if capacity <= 0:
+            raise ValueError("Bloom filter capacity must be positive")
+        if not 0 < false_positive_rate < 1:
+            raise ValueError("Bloom filter false positive rate must be between 0 and 1")
+        self.capacity = capacity
+        self.false_positive_rate = false_positive_rate
+        self.ttl_millis = ttl_millis
+        # A lookup consults both generations, so each gets half of the false positive budget.
+        generation_rate = false_positive_rate / 2
+        self.num_bits = max(8, int(math.ceil(-capacity * math.log(generation_rate) / (math.log(2) ** 2))))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self._current = bytearray((self.num_bits + 7) // 8)
+        self._previous = bytearray((self.num_bits + 7) // 8)
+        self._rotated_at = time.monotonic()
+        self._lock = threading.Lock()
+        register_after_fork(self._reinit_after_fork)
+
+    def _reinit_after_fork(self):
+        self._lock = threading.Lock()
+
+    @property
+    def memory_bytes(self) -> int:
+        return len(self._current) + len(self._previous)
+
+    def _indexes(self, key: Union[str, int]):
+        if isinstance(key, int):
+            # Precomputed 64-bit fingerprint, split into two 32-bit hashes.
+            h1 = key & 0xFFFFFFFF
+            h2 = (key >> 32) | 1
+        else:
+            digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+            h1 = int.from_bytes(digest[:8], 'little')
+            h2 = int.from_bytes(digest[8:], 'little') | 1
+        num_bits = self.num_bits
+        return [(h1 + i * h2) % num_bits for i in range(self.num_hashes)]
+
+    def _rotate_if_expired(self):
+        now = time.monotonic()
+        elapsed_millis = (now - self._rotated_at) * 1000
+        if elapsed_millis < self.ttl_millis:
+            return
+        if elapsed_millis >= 2 * self.ttl_millis:
+            self._previous = bytearray(len(self._current))
+        else:
+            self._previous = self._current
+        self._current = bytearray(len(self._previous))
+        self._rotated_at = now
+
+    @staticmethod
+    def _contains(bits: bytearray, indexes) -> bool:
+        for index in indexes:
+            if not bits[index >> 3] & (1 << (index & 7)):
+                return False
+        return True
+
+    def contains(self, key: Union[str, int]) -> bool:
+        """
+        Return True if the key was (probably) seen within the retention window, without recording it.
+        """
+        indexes = self._indexes(key)
+        with self._lock:
+            self._rotate_if_expired()
+            return self._contains(self._current, indexes) or self._contains(self._previous, indexes)
+
+    def put_if_absent(self, key: Union[str, int]) -> bool:
+        """
+        Record the key and return True if it was not already (probably) present.
+        """
+        indexes = self._indexes(key)
+        with self._lock:
+            self._rotate_if_expired()
+            current = self._current
+            if self._contains(current, indexes):
+                return False
+            seen = self._contains(self._previous, indexes)
+            # Insert into the current generation, refreshing keys only found in the previous one.
+            for index in indexes:
+                current[index >> 3] |= 1 << (index & 7)
+            return not seen
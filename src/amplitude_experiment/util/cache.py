@@ -1,67 +1,99 @@
+import threading
 import time
+from collections import OrderedDict
+
+from .fork import register_after_fork
+
+DEFAULT_SHARD_COUNT = 16
+MIN_SHARD_CAPACITY = 1024
 
 
 class Cache:
-    class Node:
-        def __init__(self, key, value):
-            self.key = key
-            self.value = value
-            self.prev = None
-            self.next = None
-            self.last_accessed_time = time.time()
+    """
+    Thread-safe LRU cache with a sliding TTL. Entries expire ttl_millis after they were last accessed.
+    """
 
     def __init__(self, capacity, ttl_millis):
         self.capacity = capacity
         self.ttl_millis = ttl_millis
-        self.cache = {}
-        self.head = self.Node(None, None)
-        self.tail = self.Node(None, None)
-        self.head.next = self.tail
-        self.tail.prev = self.head
-
-    def _add_node(self, node):
-        node.prev = self.head
-        node.next = self.head.next
-        self.head.next.prev = node
-        self.head.next = node
-
-    def _remove_node(self, node):
-        prev = node.prev
-        next_node = node.next
-        prev.next = next_node
-        next_node.prev = prev
-
-    def _move_to_head(self, node):
-        self._remove_node(node)
-        self._add_node(node)
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        register_after_fork(self._reinit_after_fork)
+
+    def _reinit_after_fork(self):
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        with self.lock:
+            return len(self.cache)
 
     def get(self, key):
-        if key in self.cache:
-            node = self.cache[key]
-            current_time = time.time()
-            if (current_time - node.last_accessed_time) * 1000 <= self.ttl_millis:
-                node.last_accessed_time = current_time  # Update last accessed time
-                self._move_to_head(node)
-                return node.value
-            else:
-                # Node has expired, remove it from the cache
-                self._remove_node(node)
-                del self.cache[key]
-        return None
+        with self.lock:
+            return self._get(key, time.monotonic())
 
     def put(self, key, value):
+        with self.lock:
+            self._put(key, value, time.monotonic())
+
+    def put_if_absent(self, key, value) -> bool:
+        """
+        Atomically insert the value if the key is missing or expired, otherwise refresh the existing entry.
+        Returns True if the value was inserted.
+        """
+        with self.lock:
+            now = time.monotonic()
+            if self._get(key, now) is not None:
+                return False
+            self._put(key, value, now)
+            return True
+
+    def _get(self, key, now):
+        entry = self.cache.get(key)
+        if entry is None:
+            return None
+        value, last_accessed_time = entry
+        if (now - last_accessed_time) * 1000 <= self.ttl_millis:
+            self.cache[key] = (value, now)
+            self.cache.move_to_end(key)
+            return value
+        # Entry has expired, remove it from the cache
+        del self.cache[key]
+        return None
+
+    def _put(self, key, value, now):
         if key in self.cache:
-            node = self.cache[key]
-            node.value = value
-            node.last_accessed_time = time.time()  # Update last accessed time
-            self._move_to_head(node)
-        else:
-            if len(self.cache) >= self.capacity:
-                # Evict the least recently used node (tail's prev)
-                tail_prev = self.tail.prev
-                self._remove_node(tail_prev)
-                del self.cache[tail_prev.key]
-
-            new_node = self.Node(key, value)
-            self._add_node(new_node)
-            self.cache[key] = new_node
+            self.cache.move_to_end(key)
+        elif len(self.cache) >= self.capacity:
+            # Evict the least recently used entry
+            self.cache.popitem(last=False)
+        self.cache[key] = (value, now)
+
+
+class ShardedCache:
+    """
+    Lock-striped LRU cache with a sliding TTL. Keys are spread across independent Cache shards by hash so
+    concurrent callers rarely contend on the same lock. LRU order and capacity are enforced per shard; small
+    capacities use a single shard so eviction stays exact.
+    """
+
+    def __init__(self, capacity, ttl_millis, shard_count: int = DEFAULT_SHARD_COUNT):
+        shard_count = max(1, min(shard_count, capacity // MIN_SHARD_CAPACITY))
+        self.capacity = capacity
+        self.ttl_millis = ttl_millis
+        shard_capacity = -(-capacity // shard_count)
+        self.shards = [Cache(shard_capacity, ttl_millis) for _ in range(shard_count)]
+
+    def __len__(self):
+        return sum(len(shard) for shard in self.shards)
+
+    def _shard(self, key) -> Cache:
+        return self.shards[hash(key) % len(self.shards)]
+
+    def get(self, key):
+        return self._shard(key).get(key)
+
+    def put(self, key, value):
+        self._shard(key).put(key, value)
+
+    def put_if_absent(self, key, value) -> bool:
+        return self._shard(key).put_if_absent(key, value)
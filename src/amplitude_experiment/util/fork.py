@@ -0,0 +1,46 @@
+import logging
+import os
+import threading
+import weakref
+from typing import Callable, List, Tuple
+
+# Instances and the names of their methods to call, in registration order. Entries of collected instances are
+# pruned as the list grows rather than by weakref callbacks, which may run during interpreter shutdown.
+_callbacks: List[Tuple[weakref.ref, str]] = []
+_callbacks_lock = threading.Lock()
+_prune_at = 64
+
+
+def register_after_fork(callback: Callable[[], None]) -> None:
+    """
+    Call the bound method callback in the child process after os.fork(). Only the forking thread survives a fork,
+    so objects owning background threads, or locks those threads may have held, use this to rebuild that state in
+    the child. The method's instance is referenced weakly. Callbacks run in registration order, so an object
+    registered after its dependencies sees them already rebuilt.
+    """
+    global _callbacks, _prune_at
+    entry = (weakref.ref(callback.__self__), callback.__func__.__name__)
+    with _callbacks_lock:
+        if len(_callbacks) >= _prune_at:
+            _callbacks = [e for e in _callbacks if e[0]() is not None]
+            _prune_at = max(64, 2 * len(_callbacks))
+        _callbacks.append(entry)
+
+
+def _after_fork_in_child() -> None:
+    global _callbacks, _callbacks_lock
+    # The lock may have been held by another thread at fork time.
+    _callbacks_lock = threading.Lock()
+    _callbacks = [e for e in _callbacks if e[0]() is not None]
+    for ref, name in list(_callbacks):
+        instance = ref()
+        if instance is None:
+            continue
+        try:
+            getattr(instance, name)()
+        except Exception as e:
+            logging.getLogger("Amplitude").warning(f"[Experiment] Failed to reinitialize after fork: {e}")
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -1,3 +1,6 @@
+import hashlib
+
+
 def hash_code(string) -> int:
     hash_value = 0
     if len(string) == 0:
@@ -7,3 +10,8 @@ def hash_code(string) -> int:
         hash_value = ((hash_value << 5) - hash_value) + chr_code
         hash_value &= 0xFFFFFFFF
     return hash_value
+
+
+def hash64(string: str) -> int:
+    """Stable (process and platform independent) unsigned 64-bit digest of a string."""
+    return int.from_bytes(hashlib.blake2b(string.encode('utf-8'), digest_size=8).digest(), 'little')
@@ -0,0 +1,68 @@
+import os
+import time
+from typing import TYPE_CHECKING, Optional
+
+# multiprocessing.shared_memory requires Python 3.8. It is imported when a segment is first opened, so the SDK still
+# imports on older versions as long as shared memory is not used.
+if TYPE_CHECKING:
+    from multiprocessing import shared_memory
+
+ATTACH_RETRIES = 50
+ATTACH_RETRY_DELAY_MILLIS = 10
+
+
+def open_shared_memory(name: str, size: int) -> 'shared_memory.SharedMemory':
+    """
+    Create the named segment, or attach to it if another process already created it. Raises ValueError if the
+    existing segment is smaller than size.
+    """
+    from multiprocessing import shared_memory
+    try:
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+    except FileExistsError:
+        shm = None
+        for _ in range(ATTACH_RETRIES):
+            try:
+                shm = shared_memory.SharedMemory(name=name)
+            except ValueError:
+                # The creating process has not sized the segment yet.
+                shm = None
+            if shm is not None and shm.size >= size:
+                break
+            time.sleep(ATTACH_RETRY_DELAY_MILLIS / 1000)
+        if shm is None or shm.size < size:
+            raise ValueError(f"Shared memory segment {name} is smaller than the configured capacity")
+    _untrack(shm)
+    return shm
+
+
+def attach_shared_memory(name: str) -> Optional['shared_memory.SharedMemory']:
+    """Attach to an existing named segment, or return None if it does not exist (or is not sized) yet."""
+    from multiprocessing import shared_memory
+    try:
+        shm = shared_memory.SharedMemory(name=name)
+    except (FileNotFoundError, ValueError):
+        return None
+    _untrack(shm)
+    return shm
+
+
+def unlink_shared_memory(shm: 'shared_memory.SharedMemory'):
+    """Destroy a segment opened or attached by this module. Does nothing if the segment was already destroyed."""
+    if os.name == 'posix':
+        # unlink() unregisters the segment from the resource tracker, which reports an error for segments it does
+        # not track.
+        from multiprocessing import resource_tracker
+        resource_tracker.register(shm._name, 'shared_memory')
+    try:
+        shm.unlink()
+    except FileNotFoundError:
+        _untrack(shm)
+
+
+def _untrack(shm: 'shared_memory.SharedMemory'):
+    if os.name == 'posix':
+        # The segment is shared with unrelated processes, so it must not be unlinked by this process's
+        # resource tracker on exit.
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, 'shared_memory')
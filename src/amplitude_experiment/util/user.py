@@ -1,45 +1,161 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
-from ..user import User
+from ..evaluation.select import ContextView, MembershipView
+from ..user import FIELDS, User
+
+GROUP_FIELDS = ('groups', 'group_properties', 'group_cohort_ids')
+USER_FIELDS = tuple(field for field in FIELDS if field not in GROUP_FIELDS)
+_USER_FIELDS = frozenset(USER_FIELDS)
 
 
 def user_to_evaluation_context(user: User) -> Dict[str, Any]:
-    user_groups = user.groups
-    user_group_properties = user.group_properties
-    user_group_cohort_ids = user.group_cohort_ids
-    user_dict = {key: value for key, value in user.__dict__.copy().items() if value is not None}
-    user_dict.pop('groups', None)
-    user_dict.pop('group_properties', None)
-    user_dict.pop('group_cohort_ids', None)
-    context = {'user': user_dict} if len(user_dict) > 0 else {}
-
-    if user_groups is None:
+    return UserEvaluationContext(user).to_dict()
+
+
+class UserEvaluationContext(ContextView):
+    """
+    Evaluation context of a User, reading the user's attributes when the engine selects them instead of copying
+    them into dicts. Selects exactly the values of the dict built by user_to_evaluation_context: fields which are
+    None, and groups without a name, are absent.
+
+    Cohort ids resolved during evaluation are set on the context, not on the user.
+    """
+
+    __slots__ = ('user', '_user_context', '_groups_context')
+
+    def __init__(self, user: User):
+        self.user = user
+        self._user_context = _UserContext(user)
+        self._groups_context: Optional[_GroupsContext] = None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key == 'user':
+            return self._user_context if self._user_context.has_values() else default
+        if key == 'groups':
+            if self.user.groups is None:
+                return default
+            if self._groups_context is None:
+                self._groups_context = _GroupsContext(self.user)
+            return self._groups_context
+        return default
+
+    def set_cohort_ids(self, cohort_ids: MembershipView):
+        self._user_context.cohort_ids = cohort_ids
+
+    def set_group_cohort_ids(self, group_type: str, cohort_ids: MembershipView):
+        groups_context = self.get('groups')
+        if groups_context is not None:
+            groups_context.cohort_ids[group_type] = cohort_ids
+            groups_context._groups.pop(group_type, None)
+
+    def to_dict(self) -> Dict[str, Any]:
+        context = {}
+        user_context = self.get('user')
+        if user_context is not None:
+            context['user'] = user_context.to_dict()
+        groups_context = self.get('groups')
+        if groups_context is not None:
+            context['groups'] = groups_context.to_dict()
         return context
 
-    groups: Dict[str, Dict[str, Any]] = {}
-    for group_type, group_names in user_groups.items():
-        if isinstance(group_names, list) and len(group_names) > 0:
-            group_name = group_names[0]
+
+class _UserContext(ContextView):
+    __slots__ = ('user', 'cohort_ids', '_has_values')
+
+    def __init__(self, user: User):
+        self.user = user
+        self.cohort_ids: Optional[MembershipView] = None
+        self._has_values: Optional[bool] = None
+
+    def has_values(self) -> bool:
+        if self.cohort_ids is not None:
+            return True
+        if self._has_values is None:
+            user = self.user
+            self._has_values = any(getattr(user, field) is not None for field in USER_FIELDS) or \
+                any(value is not None for value in user.__dict__.values())
+        return self._has_values
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key not in _USER_FIELDS:
+            # Other attributes set on the user are part of the context too.
+            value = self.user.__dict__.get(key)
+        elif key == 'cohort_ids' and self.cohort_ids is not None:
+            return self.cohort_ids
         else:
-            continue
+            value = getattr(self.user, key)
+        return default if value is None else value
+
+    def to_dict(self) -> Dict[str, Any]:
+        values = {field: self.get(field) for field in USER_FIELDS}
+        if isinstance(values['cohort_ids'], MembershipView):
+            values['cohort_ids'] = values['cohort_ids'].to_list()
+        values.update(self.user.__dict__)
+        return {field: value for field, value in values.items() if value is not None}
 
-        group_name_map = {'group_name': group_name}
 
-        if user_group_properties:
-            group_properties_type = user_group_properties.get(group_type)
-            if group_properties_type:
-                group_properties_name = group_properties_type.get(group_name)
-                if group_properties_name:
-                    group_name_map['group_properties'] = group_properties_name
+class _GroupsContext(ContextView):
+    __slots__ = ('user', 'cohort_ids', '_groups')
+
+    def __init__(self, user: User):
+        self.user = user
+        self.cohort_ids: Dict[str, MembershipView] = {}
+        self._groups: Dict[str, Optional[_GroupContext]] = {}
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in self._groups:
+            group_context = self._groups[key]
+        else:
+            group_names = self.user.groups.get(key)
+            if isinstance(group_names, list) and len(group_names) > 0:
+                group_context = _GroupContext(self.user, key, group_names[0], self.cohort_ids.get(key))
+            else:
+                group_context = None
+            self._groups[key] = group_context
+        return default if group_context is None else group_context
 
-        if user_group_cohort_ids:
-            group_cohort_ids_type = user_group_cohort_ids.get(group_type)
-            if group_cohort_ids_type:
-                group_cohort_ids_name = group_cohort_ids_type.get(group_name)
-                if group_cohort_ids_name:
-                    group_name_map['cohort_ids'] = group_cohort_ids_name
+    def to_dict(self) -> Dict[str, Any]:
+        groups = {}
+        for group_type in self.user.groups:
+            group_context = self.get(group_type)
+            if group_context is not None:
+                groups[group_type] = group_context.to_dict()
+        return groups
+
+
+class _GroupContext(ContextView):
+    __slots__ = ('user', 'group_type', 'group_name', 'cohort_ids')
+
+    def __init__(self, user: User, group_type: str, group_name: str, cohort_ids: Optional[MembershipView]):
+        self.user = user
+        self.group_type = group_type
+        self.group_name = group_name
+        self.cohort_ids = cohort_ids
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key == 'group_name':
+            return self.group_name
+        if key == 'group_properties':
+            value = self._get_group_value(self.user.group_properties)
+        elif key == 'cohort_ids':
+            value = self.cohort_ids if self.cohort_ids is not None else \
+                self._get_group_value(self.user.group_cohort_ids)
+        else:
+            return default
+        return value if value else default
 
-        groups[group_type] = group_name_map
+    def _get_group_value(self, values_by_group: Optional[Dict[str, Dict[str, Any]]]) -> Any:
+        if not values_by_group:
+            return None
+        values_by_name = values_by_group.get(self.group_type)
+        if not values_by_name:
+            return None
+        return values_by_name.get(self.group_name)
 
-    context['groups'] = groups
-    return context
+    def to_dict(self) -> Dict[str, Any]:
+        group = {'group_name': self.group_name}
+        for key in ('group_properties', 'cohort_ids'):
+            value = self.get(key)
+            if value is not None:
+                group[key] = value.to_list() if isinstance(value, MembershipView) else value
+        return group
@@ -0,0 +1,290 @@
+import os
+import shutil
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+import unittest
+from http.client import HTTPConnection
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from unittest.mock import MagicMock
+
+from src.amplitude_experiment.connection_pool import (ConnectionPoolListener, EmptyPoolError, HTTPConnectionPool,
+                                                      LATENCY_BUCKETS_MILLIS, PREWARM_CONNECT_TIMEOUT_SECONDS)
+
+
+class OkHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = b'ok'
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class LocalServerTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), OkHandler)
+        cls.server_thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.server_thread.start()
+        cls.host = f'127.0.0.1:{cls.server.server_address[1]}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def _request(self, pool: HTTPConnectionPool):
+        conn = pool.acquire()
+        try:
+            response = conn.request('GET', '/')
+            response.read()
+        finally:
+            pool.release(conn)
+
+
+class HTTPConnectionPoolStatsTestCase(LocalServerTestCase):
+
+    def test_request_and_connection_counters(self):
+        with HTTPConnectionPool(self.host, max_size=2, scheme='http:') as pool:
+            self._request(pool)
+            self._request(pool)
+            stats = pool.stats()
+            self.assertEqual(1, stats.created)
+            self.assertEqual(0, stats.in_use)
+            self.assertEqual(1, stats.idle)
+            self.assertEqual(2, stats.acquired)
+            self.assertEqual(2, stats.requests)
+            self.assertEqual(0, stats.request_errors)
+            self.assertEqual(2, sum(stats.request_latency_histogram))
+            self.assertEqual(len(LATENCY_BUCKETS_MILLIS) + 1, len(stats.request_latency_histogram))
+        self.assertEqual(1, pool.stats().closed)
+
+    def test_in_use_gauge_and_acquire_timeout(self):
+        with HTTPConnectionPool(self.host, max_size=1, scheme='http:') as pool:
+            held = pool.acquire()
+            stats = pool.stats()
+            self.assertEqual(1, stats.in_use)
+            self.assertEqual(0, stats.idle)
+            with self.assertRaises(EmptyPoolError):
+                pool.acquire(timeout=0.05)
+            self.assertEqual(1, pool.stats().acquire_timeouts)
+            pool.release(held)
+
+    def test_acquire_wait_is_recorded(self):
+        with HTTPConnectionPool(self.host, max_size=1, scheme='http:') as pool:
+            held = pool.acquire()
+            threading.Timer(0.05, pool.release, args=[held]).start()
+            pool.release(pool.acquire(timeout=2))
+            stats = pool.stats()
+            self.assertEqual(1, stats.acquire_waits)
+            self.assertGreater(stats.acquire_wait_seconds, 0.03)
+
+    def test_recreate_is_counted(self):
+        with HTTPConnectionPool(self.host, max_size=1, scheme='http:') as pool:
+            conn = pool.acquire()
+            conn.close()
+            pool.release(conn)
+            stats = pool.stats()
+            self.assertEqual(1, stats.recreated)
+            self.assertEqual(2, stats.created)
+            self.assertEqual(1, stats.closed)
+
+    def test_listener_callbacks(self):
+        listener = MagicMock(spec=ConnectionPoolListener)
+        with HTTPConnectionPool(self.host, max_size=1, scheme='http:', listener=listener) as pool:
+            self._request(pool)
+        listener.on_connection_created.assert_called_once()
+        listener.on_acquire.assert_called_once()
+        wait_seconds, in_use, idle = listener.on_acquire.call_args.args
+        self.assertEqual((1, 0), (in_use, idle))
+        listener.on_request.assert_called_once()
+        self.assertIsNone(listener.on_request.call_args.args[1])
+        listener.on_connection_closed.assert_called_once_with(1)
+
+    def test_raising_listener_does_not_leak_connection(self):
+        listener = MagicMock(spec=ConnectionPoolListener)
+        listener.on_acquire.side_effect = RuntimeError('listener failure')
+        with HTTPConnectionPool(self.host, max_size=1, scheme='http:', listener=listener) as pool:
+            with self.assertLogs('Amplitude', level='WARNING'):
+                conn = pool.acquire(timeout=1)
+            self.assertEqual(1, pool.stats().in_use)
+            pool.release(conn)
+            self.assertEqual(0, pool.stats().in_use)
+            self.assertEqual(1, pool.stats().idle)
+
+    def test_listener_runs_outside_pool_lock(self):
+        lock_held = []
+        listener = MagicMock(spec=ConnectionPoolListener)
+
+        def record_lock_state(*args):
+            # The pool lock is reentrant, so probe it from another thread.
+            def probe():
+                acquired = pool._lock.acquire(blocking=False)
+                if acquired:
+                    pool._lock.release()
+                lock_held.append(not acquired)
+            thread = threading.Thread(target=probe)
+            thread.start()
+            thread.join()
+
+        listener.on_connection_created.side_effect = record_lock_state
+        listener.on_acquire.side_effect = record_lock_state
+        with HTTPConnectionPool(self.host, max_size=1, scheme='http:', listener=listener) as pool:
+            self._request(pool)
+        self.assertEqual([False, False], lock_held)
+
+
+class HTTPConnectionPoolIdleTestCase(LocalServerTestCase):
+
+    def test_reaper_closes_idle_connections(self):
+        with HTTPConnectionPool(self.host, max_size=2, idle_timeout=0.1, scheme='http:') as pool:
+            self._request(pool)
+            self.assertEqual(1, pool.stats().idle)
+            time.sleep(0.35)
+            stats = pool.stats()
+            self.assertEqual(0, stats.idle)
+            self.assertEqual(1, stats.closed)
+
+    def test_acquire_evicts_idle_connections(self):
+        with HTTPConnectionPool(self.host, max_size=2, idle_timeout=60, scheme='http:') as pool:
+            self._request(pool)
+            pool._pool[0].last_time -= 120
+            self._request(pool)
+            stats = pool.stats()
+            self.assertEqual(2, stats.created)
+            self.assertEqual(1, stats.closed)
+
+    def test_single_reaper_thread_for_all_pools(self):
+        pools = [HTTPConnectionPool(self.host, max_size=1, idle_timeout=0.05, scheme='http:') for _ in range(5)]
+        try:
+            time.sleep(0.2)
+            reapers = [t for t in threading.enumerate() if t.name == 'HTTPConnectionPoolReaper']
+            self.assertEqual(1, len(reapers))
+        finally:
+            for pool in pools:
+                pool.close()
+
+
+def wait_until(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+class HTTPConnectionPoolPrewarmTestCase(LocalServerTestCase):
+
+    def test_prewarms_min_idle_connections_in_background(self):
+        with HTTPConnectionPool(self.host, max_size=3, scheme='http:', min_idle=2) as pool:
+            self.assertTrue(wait_until(lambda: pool.stats().idle == 2))
+            self.assertIsNotNone(pool._pool[0].conn.sock)
+            self._request(pool)
+            stats = pool.stats()
+            self.assertEqual(2, stats.created)
+            self.assertEqual(2, stats.prewarmed)
+
+    def test_min_idle_is_capped_at_max_size(self):
+        with HTTPConnectionPool(self.host, max_size=1, scheme='http:', min_idle=3) as pool:
+            self.assertTrue(wait_until(lambda: pool.stats().prewarmed == 1))
+            self.assertEqual(0, pool.prewarm())
+            self.assertEqual(1, pool.stats().created)
+
+    def test_min_idle_connections_are_not_evicted(self):
+        with HTTPConnectionPool(self.host, max_size=3, idle_timeout=0.1, scheme='http:', min_idle=1) as pool:
+            self.assertTrue(wait_until(lambda: pool.stats().idle == 1))
+            held = [pool.acquire(), pool.acquire()]
+            for conn in held:
+                pool.release(conn)
+            self.assertEqual(2, pool.stats().idle)
+            # Only the connection beyond min_idle is closed, and the one kept is not reopened.
+            self.assertTrue(wait_until(lambda: pool.stats().closed == 1))
+            time.sleep(0.3)
+            stats = pool.stats()
+            self.assertEqual((1, 1, 1), (stats.idle, stats.closed, stats.prewarmed))
+
+    def test_prewarm_runs_off_the_reaper_thread_with_connect_timeout(self):
+        connects = []
+        original_connect = HTTPConnection.connect
+
+        def connect(conn):
+            connects.append((threading.current_thread().name, conn.timeout))
+            original_connect(conn)
+
+        with mock.patch.object(HTTPConnection, 'connect', connect):
+            with HTTPConnectionPool(self.host, max_size=1, scheme='http:', min_idle=1) as pool:
+                self.assertTrue(wait_until(lambda: pool.stats().prewarmed == 1))
+                self.assertEqual([('HTTPConnectionPoolPrewarm', PREWARM_CONNECT_TIMEOUT_SECONDS)], connects)
+                self.assertIsNone(pool._pool[0].conn.sock.gettimeout())
+
+    def test_failed_prewarm_releases_slot(self):
+        with HTTPConnectionPool('127.0.0.1:1', max_size=1, scheme='http:') as pool:
+            pool.min_idle = 1
+            self.assertEqual(0, pool.prewarm())
+            stats = pool.stats()
+            self.assertEqual(0, stats.in_use + stats.idle)
+            self.assertEqual(0, pool.conn_num)
+
+
+@unittest.skipUnless(shutil.which('openssl'), 'requires openssl')
+class HTTPConnectionPoolTLSTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.mkdtemp()
+        cls.cert = os.path.join(cls.tmp, 'cert.pem')
+        key = os.path.join(cls.tmp, 'key.pem')
+        subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+                        '-subj', '/CN=localhost', '-addext', 'subjectAltName=DNS:localhost',
+                        '-keyout', key, '-out', cls.cert], check=True, capture_output=True)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cls.cert, key)
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), OkHandler)
+        cls.server.socket = context.wrap_socket(cls.server.socket, server_side=True)
+        cls.server_thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.server_thread.start()
+        cls.host = f'localhost:{cls.server.server_address[1]}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        shutil.rmtree(cls.tmp)
+
+    def test_tls_session_is_resumed_across_connections(self):
+        with HTTPConnectionPool(self.host, max_size=2) as pool:
+            pool._ssl_context.load_verify_locations(self.cert)
+            first = pool.acquire()
+            first.request('GET', '/').read()
+            pool.release(first)
+            self.assertIsNotNone(pool._tls_session)
+            held = pool.acquire()
+            second = pool.acquire()
+            second.request('GET', '/').read()
+            self.assertTrue(second.conn.sock.session_reused)
+            pool.release(second)
+            pool.release(held)
+            self.assertEqual(1, pool.stats().tls_sessions_reused)
+
+    def test_context_follows_http_client_default(self):
+        unverified = ssl._create_unverified_context()
+        with mock.patch('ssl._create_default_https_context', return_value=unverified):
+            pool = HTTPConnectionPool(self.host, max_size=1)
+        with pool:
+            self.assertIs(unverified, pool._ssl_context._context)
+            conn = pool.acquire()
+            conn.request('GET', '/').read()
+            pool.release(conn)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,12 @@
+import gc
+import random
 import unittest
 from typing import Any, Dict, List, Optional
 
-from src.amplitude_experiment.evaluation.engine import EvaluationEngine
+from src.amplitude_experiment.evaluation.engine import EvaluationEngine, FilterValues, Ranges
+from src.amplitude_experiment.evaluation.select import MembershipView
 from src.amplitude_experiment.evaluation.types import (
+    EvaluationBucket,
     EvaluationCondition,
     EvaluationFlag,
     EvaluationOperator,
@@ -11,6 +15,21 @@ from src.amplitude_experiment.evaluation.types import (
 )
 
 
+class ListMembership(MembershipView):
+
+    def __init__(self, members: List[str]):
+        self.members = members
+        self.resolved: List[str] = []
+
+    def contains_any(self, values: List[str]) -> bool:
+        self.resolved.extend(values)
+        return any(value in self.members for value in values)
+
+    def to_list(self) -> List[str]:
+        self.resolved.append('*')
+        return list(self.members)
+
+
 class EvaluationEngineTestCase(unittest.TestCase):
     """Unit tests for EvaluationEngine covering non-set array matching."""
 
@@ -104,6 +123,141 @@ class EvaluationEngineTestCase(unittest.TestCase):
     def test_leading_whitespace_not_parsed_set(self):
         self.assert_no_match(' ["a"]', EvaluationOperator.SET_CONTAINS, ["a"])
 
+    def test_membership_matches_like_list(self):
+        ops = [EvaluationOperator.SET_IS, EvaluationOperator.SET_IS_NOT, EvaluationOperator.SET_CONTAINS,
+               EvaluationOperator.SET_DOES_NOT_CONTAIN, EvaluationOperator.SET_CONTAINS_ANY,
+               EvaluationOperator.SET_DOES_NOT_CONTAIN_ANY]
+        for members in ([], ['a'], ['a', 'b']):
+            for op in ops:
+                for values in (['a'], ['c'], ['a', 'c'], ['(none)'], ['a', '(none)']):
+                    with self.subTest(members=members, op=op, values=values):
+                        expected = self.evaluate(members, op, values)
+                        actual = self.evaluate(ListMembership(members), op, values)
+                        self.assertEqual(expected, actual)
+
+    def test_contains_any_resolves_only_condition_values(self):
+        membership = ListMembership(['a'])
+        self.assert_match(membership, EvaluationOperator.SET_CONTAINS_ANY, ['a', 'c'])
+        self.assertEqual(['a', 'c'], membership.resolved)
+        membership = ListMembership(['a'])
+        self.assert_match(membership, EvaluationOperator.SET_DOES_NOT_CONTAIN_ANY, ['c'])
+        self.assertEqual(['c'], membership.resolved)
+
+    def test_result_metadata_is_merged_once_per_segment_variant(self):
+        flag = EvaluationFlag.schema().load({
+            'key': 'flag',
+            'metadata': {'flag': 1, 'shared': 'flag'},
+            'variants': {'on': {'key': 'on', 'value': 'on', 'metadata': {'variant': 3, 'shared': 'variant'}},
+                         'off': {'key': 'off'}},
+            'segments': [
+                {'conditions': [[{'selector': ['context', 'user', 'user_id'], 'op': 'is', 'values': ['a']}]],
+                 'variant': 'on', 'metadata': {'segment': 2, 'shared': 'segment'}},
+                {'variant': 'off'},
+            ],
+        })
+        first = self.engine.evaluate({'user': {'user_id': 'a'}}, [flag])['flag']
+        self.assertEqual({'flag': 1, 'segment': 2, 'variant': 3, 'shared': 'variant'}, first.metadata)
+        self.assertIs(first.metadata, self.engine.evaluate({'user': {'user_id': 'a'}}, [flag])['flag'].metadata)
+        with self.assertRaises(TypeError):
+            first.metadata['flag'] = 2
+        other = self.engine.evaluate({'user': {'user_id': 'b'}}, [flag])['flag']
+        self.assertEqual('off', other.key)
+        self.assertEqual({'flag': 1, 'shared': 'flag'}, other.metadata)
+        self.assertEqual({'variant': 3, 'shared': 'variant'}, flag.variants['on'].metadata)
+
+    def test_memos_are_not_stored_on_flag_configs(self):
+        flag = EvaluationFlag.schema().load({
+            'key': 'flag',
+            'variants': {'on': {'key': 'on'}},
+            'segments': [{'bucket': {'selector': ['context', 'user', 'user_id'], 'salt': 'salt',
+                                     'allocations': [{'range': [0, 100], 'distributions': [
+                                         {'variant': 'on', 'range': [0, 42949673]}]}]},
+                          'conditions': [[{'selector': ['context', 'user', 'user_id'], 'op': 'is', 'values': ['a']}]],
+                          'variant': 'on'}],
+        })
+        self.assertEqual('on', self.engine.evaluate({'user': {'user_id': 'a'}}, [flag])['flag'].key)
+        segment = flag.segments[0]
+        for config in (segment, segment.bucket, segment.conditions[0][0], flag.variants['on']):
+            self.assertEqual([], [name for name in vars(config) if name.startswith('_')])
+        self.assertEqual(1, len(self.engine._filter_values))
+        del flag, segment, config
+        gc.collect()
+        self.assertEqual(0, len(self.engine._metadata) + len(self.engine._filter_values) + len(self.engine._ranges))
+
+    def assert_bucket_matches_linear_scan(self, allocations):
+        bucket = EvaluationBucket.schema().load({'selector': ['context', 'user', 'user_id'], 'salt': 'salt',
+                                                 'allocations': allocations})
+        segment = EvaluationSegment(bucket=bucket, variant='default')
+        linear = EvaluationSegment(bucket=EvaluationBucket.schema().load(bucket.to_dict()), variant='default')
+        linear.bucket._ranges = None
+        for i in range(500):
+            target = {'context': {'user': {'user_id': f'user-{i}'}}}
+            self.assertEqual(self.engine.bucket(target, linear), self.engine.bucket(target, segment))
+
+    def test_bucket_ranges_match_linear_scan(self):
+        rng = random.Random(0)
+        for _ in range(20):
+            cuts = sorted(rng.sample(range(1, 42949672), 5))
+            bounds = [0] + cuts + [42949673]
+            distributions = [{'variant': f'v{i}', 'range': [bounds[i], bounds[i + 1]]} for i in range(len(cuts) + 1)]
+            rng.shuffle(distributions)
+            split = rng.randint(1, 99)
+            self.assert_bucket_matches_linear_scan([
+                {'range': [0, split], 'distributions': distributions},
+                {'range': [split, 100], 'distributions': [{'variant': 'other', 'range': [0, 20000000]}]},
+            ])
+
+    def test_overlapping_bucket_ranges_match_first_range(self):
+        allocations = [
+            {'range': [0, 60], 'distributions': [{'variant': 'a', 'range': [0, 30000000]},
+                                                 {'variant': 'b', 'range': [20000000, 42949673]}]},
+            {'range': [50, 100], 'distributions': [{'variant': 'c', 'range': [0, 42949673]}]},
+        ]
+        self.assert_bucket_matches_linear_scan(allocations)
+        bucket = EvaluationBucket.schema().load({'selector': [], 'salt': '', 'allocations': allocations})
+        self.assertIsNone(self.engine.get_allocation_ranges(bucket))
+
+    def test_ranges(self):
+        ranges = Ranges([(10, 20, 'b'), (0, 10, 'a'), (5, 5, 'empty'), (30, 40, 'c')])
+        self.assertTrue(ranges.valid)
+        self.assertEqual(['a', 'a', 'b', None, 'c', None, None],
+                         [ranges.find(n) for n in (0, 9, 10, 20, 39, 40, -1)])
+        self.assertFalse(Ranges([(0, 10, 'a'), (9, 20, 'b')]).valid)
+
+    def test_filter_values_match_like_lists(self):
+        prop_values = [[], ['a'], ['A'], ['true'], ['TRUE', 'a'], ['False', 'b', 'a'], ['(none)'], ['a', 'a', 'b']]
+        filter_values = [['a'], ['A', 'b'], ['true'], ['True', 'a'], ['FALSE'], ['(none)', 'c'], ['a', 'a'],
+                         ['b', 'a', 'false'], ['x', 'True ']]
+        set_ops = [EvaluationOperator.SET_IS, EvaluationOperator.SET_IS_NOT, EvaluationOperator.SET_CONTAINS,
+                   EvaluationOperator.SET_DOES_NOT_CONTAIN, EvaluationOperator.SET_CONTAINS_ANY,
+                   EvaluationOperator.SET_DOES_NOT_CONTAIN_ANY]
+        string_ops = [EvaluationOperator.IS, EvaluationOperator.IS_NOT, EvaluationOperator.CONTAINS,
+                      EvaluationOperator.DOES_NOT_CONTAIN]
+        for values in filter_values:
+            frozen = FilterValues(values)
+            self.assertEqual(self.engine.contains_none(values), self.engine.contains_none(frozen))
+            for props in prop_values:
+                for op in set_ops:
+                    with self.subTest(props=props, op=op, values=values):
+                        self.assertEqual(self.engine.match_set(props, op, values),
+                                         self.engine.match_set(props, op, frozen))
+                for prop in props:
+                    for op in string_ops:
+                        with self.subTest(prop=prop, op=op, values=values):
+                            self.assertEqual(self.engine.match_string(prop, op, values),
+                                             self.engine.match_string(prop, op, frozen))
+                for op in set_ops + string_ops:
+                    with self.subTest(op=op, values=values):
+                        self.assertEqual(self.engine.match_null(op, values), self.engine.match_null(op, frozen))
+
+    def test_filter_values_are_built_once_per_condition(self):
+        condition = EvaluationCondition(selector=['context', 'user', 'user_id'], op=EvaluationOperator.IS,
+                                        values=[f'user-{i}' for i in range(1000)])
+        filter_values = self.engine.get_filter_values(condition)
+        self.assertIs(filter_values, self.engine.get_filter_values(condition))
+        self.assertTrue(self.engine.match_condition({'context': {'user': {'user_id': 'user-999'}}}, condition))
+        self.assertFalse(self.engine.match_condition({'context': {'user': {'user_id': 'user'}}}, condition))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+
+from src.amplitude_experiment.evaluation.engine import EvaluationEngine
+from src.amplitude_experiment.evaluation.hash_cache import BucketingHashCache
+from src.amplitude_experiment.evaluation.types import EvaluationBucket, EvaluationSegment
+
+
+class BucketingHashCacheTestCase(unittest.TestCase):
+
+    def test_evicts_least_recently_used(self):
+        cache = BucketingHashCache(2)
+        cache.put('salt', 'a', 1)
+        cache.put('salt', 'b', 2)
+        self.assertEqual(1, cache.get('salt', 'a'))
+        cache.put('salt', 'c', 3)
+        self.assertIsNone(cache.get('salt', 'b'))
+        self.assertEqual(1, cache.get('salt', 'a'))
+        self.assertIsNone(cache.get('other', 'a'))
+        stats = cache.stats()
+        self.assertEqual((2, 2, 2, 2, 1), (stats.size, stats.capacity, stats.hits, stats.misses, stats.evictions))
+        self.assertEqual(0.5, stats.hit_rate)
+
+    def test_capacity_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            BucketingHashCache(0)
+
+    def test_engine_buckets_with_cached_hashes(self):
+        bucket = EvaluationBucket.schema().load({
+            'selector': ['context', 'user', 'user_id'], 'salt': 'salt',
+            'allocations': [{'range': [0, 50], 'distributions': [
+                {'variant': 'a', 'range': [0, 21474837]}, {'variant': 'b', 'range': [21474837, 42949673]}]}],
+        })
+        segment = EvaluationSegment(bucket=bucket, variant='off')
+        cache = BucketingHashCache(100)
+        engine = EvaluationEngine(cache)
+        for _ in range(2):
+            for i in range(50):
+                target = {'context': {'user': {'user_id': f'user-{i}'}}}
+                self.assertEqual(EvaluationEngine().bucket(target, segment), engine.bucket(target, segment))
+        stats = cache.stats()
+        self.assertEqual((50, 50), (stats.hits, stats.misses))
+
+
+if __name__ == '__main__':
+    unittest.main()
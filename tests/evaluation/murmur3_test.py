@@ -0,0 +1,137 @@
+import random
+import time
+import unittest
+
+from src.amplitude_experiment.evaluation import murmur3
+from src.amplitude_experiment.evaluation.murmur3 import hash32x86, hash32x86_python, fmix32
+
+
+def reference_hash32x86(input_str: str, seed: int = 0) -> int:
+    """hash32x86_python as it was before reading all blocks at once, for comparison."""
+    data = input_str.encode('utf-8')
+    length = len(data)
+    n_blocks = length // 4
+    hash_val = seed
+
+    # body
+    for i in range(n_blocks):
+        index = i * 4
+        k = read_int_le(data, index)
+        hash_val = mix32(k, hash_val)
+
+    # tail
+    index = n_blocks * 4
+    k1 = 0
+    remaining = length - index
+
+    if remaining == 3:
+        k1 ^= data[index + 2] << 16
+        k1 ^= data[index + 1] << 8
+        k1 ^= data[index]
+        k1 = (k1 * murmur3.C1_32) & 0xffffffff
+        k1 = rotate_left(k1, murmur3.R1_32)
+        k1 = (k1 * murmur3.C2_32) & 0xffffffff
+        hash_val ^= k1
+    elif remaining == 2:
+        k1 ^= data[index + 1] << 8
+        k1 ^= data[index]
+        k1 = (k1 * murmur3.C1_32) & 0xffffffff
+        k1 = rotate_left(k1, murmur3.R1_32)
+        k1 = (k1 * murmur3.C2_32) & 0xffffffff
+        hash_val ^= k1
+    elif remaining == 1:
+        k1 ^= data[index]
+        k1 = (k1 * murmur3.C1_32) & 0xffffffff
+        k1 = rotate_left(k1, murmur3.R1_32)
+        k1 = (k1 * murmur3.C2_32) & 0xffffffff
+        hash_val ^= k1
+
+    hash_val ^= length
+    return fmix32(hash_val)
+
+
+def read_int_le(data: bytes, index: int = 0) -> int:
+    """Read a little-endian 32-bit integer from bytes."""
+    n = (data[index] << 24) | (data[index + 1] << 16) | \
+        (data[index + 2] << 8) | data[index + 3]
+    return reverse_bytes(n)
+
+
+def mix32(k: int, hash_val: int) -> int:
+    """Mix function for Murmur3."""
+    k = (k * murmur3.C1_32) & 0xffffffff
+    k = rotate_left(k, murmur3.R1_32)
+    k = (k * murmur3.C2_32) & 0xffffffff
+    hash_val ^= k
+    hash_val = rotate_left(hash_val, murmur3.R2_32)
+    hash_val = (hash_val * murmur3.M_32 + murmur3.N_32) & 0xffffffff
+    return hash_val
+
+
+def rotate_left(x: int, n: int, width: int = 32) -> int:
+    """Rotate a number left by n bits."""
+    n = n % width if n > width else n
+    mask = (0xffffffff << (width - n)) & 0xffffffff
+    r = ((x & mask) >> (width - n)) & 0xffffffff
+    return ((x << n) | r) & 0xffffffff
+
+
+def reverse_bytes(n: int) -> int:
+    """Reverse the bytes of a 32-bit integer."""
+    return (((n & 0xff000000) >> 24) |
+            ((n & 0x00ff0000) >> 8) |
+            ((n & 0x0000ff00) << 8) |
+            ((n & 0x000000ff) << 24)) & 0xffffffff
+
+
+def corpus():
+    rng = random.Random(0)
+    alphabet = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_/.@ ' + 'éß中文🎉'
+    keys = ['', 'a', 'ab', 'abc', 'abcd', 'hello', 'salt/user-id', 'é', '中文', '🎉🎉🎉']
+    for length in range(1, 80):
+        keys.append(''.join(rng.choice(alphabet) for _ in range(length)))
+    keys.extend(f'{rng.getrandbits(32):08x}/{rng.getrandbits(64):x}@example.com' for _ in range(200))
+    return keys
+
+
+class Murmur3TestCase(unittest.TestCase):
+
+    def test_known_values(self):
+        for hash_function in (hash32x86, hash32x86_python):
+            self.assertEqual(0, hash_function(''))
+            self.assertEqual(0x248bfa47, hash_function('hello'))
+            self.assertEqual(0x514e28b7, hash_function('', 1))
+
+    def test_python_matches_reference(self):
+        for seed in (0, 1, 0x9747b28c, 0xffffffff):
+            for key in corpus():
+                with self.subTest(key=key, seed=seed):
+                    self.assertEqual(reference_hash32x86(key, seed), hash32x86_python(key, seed))
+
+    @unittest.skipIf(murmur3.mmh3 is None, 'requires mmh3')
+    def test_native_matches_python(self):
+        for seed in (0, 1, 0x9747b28c, 0xffffffff):
+            for key in corpus():
+                with self.subTest(key=key, seed=seed):
+                    self.assertEqual(hash32x86_python(key, seed), hash32x86(key, seed))
+
+
+@unittest.skip("github actions too slow")
+class Murmur3BenchmarkTestCase(unittest.TestCase):
+
+    def test_python_faster_than_reference(self):
+        rng = random.Random(0)
+        keys = [''.join(rng.choice('abcdef0123456789') for _ in range(rng.randint(20, 60))) for _ in range(1000)]
+        durations = []
+        for hash_function in (reference_hash32x86, hash32x86_python):
+            start = time.perf_counter()
+            for _ in range(20):
+                for key in keys:
+                    hash_function(key)
+            durations.append(time.perf_counter() - start)
+        print('reference took:', durations[0], 'python took:', durations[1])
+        self.assertLess(durations[1], durations[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,11 @@
 import json
+import queue
 import threading
 import time
 import unittest
 from unittest.mock import MagicMock, patch
 
-from amplitude_experiment.flag.flag_config_api import FlagConfigStreamApi
+from amplitude_experiment.flag.flag_config_api import EventSource, FlagConfigStreamApi
 
 
 def response(code: int, body: dict = None):
@@ -86,5 +87,55 @@ class FlagConfigStreamApiTest(unittest.TestCase):
             assert self.error_count == 1
 
 
+class EventSourceKeepAliveTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.events = queue.Queue()
+        self.errors = []
+        self.event_source = EventSource("server_url", "/path", {}, 2000, keep_alive_timeout_millis=300)
+        sse = MagicMock()
+        sse.events.side_effect = lambda: (MagicMock(data=data) for data in iter(self.events.get, None))
+        self.sse_patch = patch('amplitude_experiment.flag.flag_config_api.sseclient.SSEClient', return_value=sse)
+        self.sse_patch.start()
+        self.conn_patch = patch.object(self.event_source, '_get_conn', return_value=(MagicMock(), response(200)))
+        self.conn_patch.start()
+
+    def tearDown(self) -> None:
+        self.event_source.stop()
+        self.events.put(None)
+        self.sse_patch.stop()
+        self.conn_patch.stop()
+
+    def test_events_do_not_create_threads(self):
+        updates = []
+        self.event_source.start(updates.append, self.errors.append)
+        self.events.put('data')
+        time.sleep(0.05)
+        thread_count = threading.active_count()
+        for _ in range(50):
+            self.events.put(' ')
+        self.events.put('data')
+        time.sleep(0.1)
+        assert threading.active_count() == thread_count
+        assert updates == ['data', 'data']
+        assert self.errors == []
+
+    def test_events_keep_stream_alive(self):
+        self.event_source.start(lambda data: None, self.errors.append)
+        for _ in range(4):
+            time.sleep(0.15)
+            self.events.put(' ')
+        assert self.errors == []
+        time.sleep(0.5)
+        assert self.errors == ["[Experiment] Stream flagConfigs - Keep alive timed out"]
+
+    def test_watchdog_exits_on_stop(self):
+        self.event_source.start(lambda data: None, self.errors.append)
+        watchdog = self.event_source._keep_alive_watchdog
+        self.event_source.stop()
+        watchdog.join(1)
+        assert not watchdog.is_alive()
+        assert self.errors == []
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,166 @@
+import asyncio
+import json
+import time
+import unittest
+
+from src.amplitude_experiment.flag.flag_config_async_stream_api import AsyncEventSource, AsyncFlagConfigStreamApi
+from tests.flag.stream_server import EventLoopThread, LocalStreamServer
+
+FLAGS = [{"key": "flag", "variants": {}, "segments": []}]
+
+
+class AsyncFlagConfigStreamApiTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = LocalStreamServer(lambda: json.dumps(FLAGS))
+        self.server.start()
+        self.loop_thread = EventLoopThread()
+        self.loop = self.loop_thread.loop
+        self.updates = []
+        self.errors = []
+        self.api = self._api()
+
+    def tearDown(self):
+        self.api.stop()
+        self.loop_thread.stop()
+        self.server.stop()
+
+    def _api(self, **kwargs):
+        return AsyncFlagConfigStreamApi('deployment_key', self.server.url, 2000,
+                                        self.loop, **kwargs)
+
+    def _wait_for(self, predicate, timeout=2.0):
+        deadline = time.monotonic() + timeout
+        while not predicate() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return predicate()
+
+    def test_start_waits_for_initial_flags_and_streams_updates(self):
+        self.api.start(self.updates.append, self.errors.append)
+        self.assertEqual(1, len(self.updates))
+        self.assertEqual('flag', self.updates[0][0].key)
+        self.server.send_event(" ")
+        self.server.send_event(json.dumps([{"key": "flag-2", "variants": {}, "segments": []}]))
+        self.assertTrue(self._wait_for(lambda: len(self.updates) == 2))
+        self.assertEqual('flag-2', self.updates[1][0].key)
+        self.assertEqual([], self.errors)
+
+    def test_multi_line_event_split_across_chunks(self):
+        self.api.start(self.updates.append, self.errors.append)
+        payload = json.dumps([{"key": "flag-2", "variants": {}, "segments": []}])
+        self.server.send("data: " + payload[:1] + "\ndata: ")
+        self.server.send(payload[1:] + "\n\n")
+        self.assertTrue(self._wait_for(lambda: len(self.updates) == 2))
+        self.assertEqual('flag-2', self.updates[1][0].key)
+
+    def test_error_response_raises_from_start(self):
+        self.server.status = 500
+        with self.assertRaises(Exception):
+            self.api.start(self.updates.append, self.errors.append)
+        self.assertEqual([], self.updates)
+        self.assertEqual([], self.errors)
+
+    def test_error_response_on_kept_alive_connection_reports_body(self):
+        self.server.status = 503
+        start = time.monotonic()
+        with self.assertRaisesRegex(Exception, 'received error response: 503: error$'):
+            self.api.start(self.updates.append, self.errors.append)
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_stream_closed_reports_error(self):
+        self.api.start(self.updates.append, self.errors.append)
+        self.server.close_stream()
+        self.assertTrue(self._wait_for(lambda: len(self.errors) == 1))
+
+    def test_keep_alive_timeout_reports_error(self):
+        self.api.eventsource.keep_alive_timeout_millis = 300
+        self.api.start(self.updates.append, self.errors.append)
+        for _ in range(3):
+            time.sleep(0.15)
+            self.server.send_event(" ")
+        self.assertEqual([], self.errors)
+        self.assertTrue(self._wait_for(lambda: len(self.errors) == 1))
+        self.assertIn('Keep alive timed out', self.errors[0])
+
+    def test_reconnects_after_max_connection_duration(self):
+        self.api = self._api(max_conn_duration_millis=200, max_jitter_millis=0)
+        self.api.start(self.updates.append, self.errors.append)
+        self.assertTrue(self._wait_for(lambda: self.server.connections >= 2 and len(self.updates) >= 2))
+        self.assertEqual([], self.errors)
+
+    def test_stop_cancels_stream_task(self):
+        self.api.start(self.updates.append, self.errors.append)
+        self.api.stop()
+        self.server.send_event(json.dumps(FLAGS))
+        time.sleep(0.2)
+        self.assertEqual(1, len(self.updates))
+        self.assertEqual([], self.errors)
+
+    def test_start_on_loop_thread_does_not_block(self):
+        async def start():
+            self.api.start(self.updates.append, self.errors.append)
+            return len(self.updates)
+
+        self.assertEqual(0, asyncio.run_coroutine_threadsafe(start(), self.loop).result(2))
+        self.assertTrue(self._wait_for(lambda: len(self.updates) == 1))
+
+
+
+class AsyncEventSourceBodyTest(unittest.TestCase):
+
+    def _read_body(self, raw: bytes, transfer_encoding: str = None):
+        headers = {} if transfer_encoding is None else {'transfer-encoding': transfer_encoding}
+
+        async def read():
+            reader = asyncio.StreamReader()
+            reader.feed_data(raw)
+            reader.feed_eof()
+            return b''.join([chunk async for chunk in AsyncEventSource._body(reader, headers)])
+
+        return asyncio.run(read())
+
+    def test_chunked_body(self):
+        raw = b'5\r\nhello\r\n6;ext=1\r\n world\r\n0\r\n\r\n'
+        self.assertEqual(b'hello world', self._read_body(raw, 'chunked'))
+
+    def test_chunked_must_be_final_coding(self):
+        self.assertEqual(b'hi', self._read_body(b'2\r\nhi\r\n0\r\n\r\n', 'Identity, Chunked'))
+        self.assertEqual(b'2\r\nhi\r\n', self._read_body(b'2\r\nhi\r\n', 'identity'))
+
+    def test_body_without_transfer_encoding_is_read_to_eof(self):
+        self.assertEqual(b'data: x\n\n', self._read_body(b'data: x\n\n'))
+
+    def test_unsupported_transfer_encoding_raises(self):
+        with self.assertRaises(ConnectionError):
+            self._read_body(b'2\r\nhi\r\n0\r\n\r\n', 'gzip, chunked')
+
+    def test_malformed_chunk_size_raises(self):
+        for size_line in [b'zz\r\n', b'0x2\r\n', b'-2\r\n', b'+2\r\n', b'\r\n', b'2']:
+            with self.subTest(size_line=size_line), self.assertRaises(ConnectionError):
+                self._read_body(size_line + b'hi\r\n0\r\n\r\n', 'chunked')
+
+    def test_missing_crlf_after_chunk_raises(self):
+        with self.assertRaises(ConnectionError):
+            self._read_body(b'2\r\nhixx0\r\n\r\n', 'chunked')
+
+    def test_error_body_is_read_by_framing_up_to_limit(self):
+        async def read(raw: bytes, headers):
+            # The connection stays open after the response.
+            reader = asyncio.StreamReader()
+            reader.feed_data(raw)
+            source = AsyncEventSource('http://localhost', '/', {}, 100)
+            return await source._read_error_body(reader, headers)
+
+        self.assertEqual(b'error', asyncio.run(read(b'errorxx', {'content-length': '5'})))
+        self.assertEqual(b'error', asyncio.run(read(b'5\r\nerror\r\n0\r\n\r\n', {'transfer-encoding': 'chunked'})))
+        large = b'x' * 5000
+        self.assertEqual(4096, len(asyncio.run(read(large, {'content-length': str(len(large))}))))
+        self.assertEqual(b'partial', asyncio.run(read(b'partial', {})))
+
+    def test_truncated_chunk_raises(self):
+        with self.assertRaises(asyncio.IncompleteReadError):
+            self._read_body(b'5\r\nhe', 'chunked')
+
+
+if __name__ == '__main__':
+    unittest.main()
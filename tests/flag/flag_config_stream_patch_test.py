@@ -0,0 +1,143 @@
+import json
+import logging
+import time
+import unittest
+from unittest import mock
+
+from src.amplitude_experiment.flag.flag_config_api import (FlagConfigPatch, FlagConfigStreamApi,
+                                                           FlagConfigStreamDecoder, StreamResyncRequired)
+from src.amplitude_experiment.flag.flag_config_async_stream_api import AsyncFlagConfigStreamApi
+from src.amplitude_experiment.flag.flag_config_storage import InMemoryFlagConfigStorage
+from src.amplitude_experiment.flag.flag_config_updater import FlagConfigStreamer
+from tests.flag.stream_server import EventLoopThread, LocalStreamServer
+
+
+def flag(key: str, variant: str = 'on') -> dict:
+    return {"key": key, "variants": {variant: {"key": variant}}, "segments": []}
+
+
+class FlagConfigStreamDecoderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.decoder = FlagConfigStreamDecoder()
+
+    def test_full_snapshot_sets_version(self):
+        flags = self.decoder.decode(json.dumps({"type": "full", "version": 3, "flags": [flag("a")]}))
+        self.assertEqual(["a"], [f.key for f in flags])
+        self.assertEqual(3, self.decoder.version)
+
+    def test_bare_list_is_unversioned_snapshot(self):
+        self.decoder.version = 3
+        flags = self.decoder.decode(json.dumps([flag("a")]))
+        self.assertEqual(["a"], [f.key for f in flags])
+        self.assertIsNone(self.decoder.version)
+
+    def test_consecutive_patch(self):
+        self.decoder.decode(json.dumps({"type": "full", "version": 3, "flags": []}))
+        patch = self.decoder.decode(json.dumps({"type": "patch", "version": 4, "upserts": [flag("b")],
+                                                "deletes": ["a"]}))
+        self.assertEqual(4, patch.version)
+        self.assertEqual(["b"], [f.key for f in patch.upserts])
+        self.assertEqual(["a"], patch.deletes)
+        self.assertEqual(4, self.decoder.version)
+
+    def test_version_gap_requires_resync(self):
+        self.decoder.decode(json.dumps({"type": "full", "version": 3, "flags": []}))
+        with self.assertRaises(StreamResyncRequired):
+            self.decoder.decode(json.dumps({"type": "patch", "version": 5, "upserts": []}))
+        self.assertIsNone(self.decoder.version)
+
+    def test_patch_before_snapshot_requires_resync(self):
+        with self.assertRaises(StreamResyncRequired):
+            self.decoder.decode(json.dumps({"type": "patch", "version": 1, "upserts": []}))
+
+
+class FlagConfigStreamPatchTest(unittest.TestCase):
+    """Streams against a local stand-in server which sends a versioned snapshot on every connection."""
+
+    def setUp(self):
+        self.version = 1
+        self.flags = {"a": flag("a"), "b": flag("b")}
+        self.server = LocalStreamServer(
+            lambda: json.dumps({"type": "full", "version": self.version, "flags": list(self.flags.values())}))
+        self.server.start()
+        self.storage = InMemoryFlagConfigStorage()
+        self.errors = []
+
+    def tearDown(self):
+        self.streamer.stop()
+        self.server.stop()
+
+    def _streamer(self, stream_api):
+        self.streamer = FlagConfigStreamer(stream_api, self.storage, None, mock.Mock(), logging.getLogger("test"))
+        self.streamer.start(self.errors.append)
+
+    def _patch(self, version, upserts=(), deletes=()):
+        self.version = version
+        for key in deletes:
+            self.flags.pop(key)
+        for upsert in upserts:
+            self.flags[upsert["key"]] = upsert
+        self.server.send_event(json.dumps({"type": "patch", "version": version, "upserts": list(upserts),
+                                           "deletes": list(deletes)}))
+
+    def _stored(self):
+        return {key: next(iter(f.variants)) for key, f in self.storage.get_flag_configs().items()}
+
+    def _wait_for(self, predicate, timeout=2.0):
+        deadline = time.monotonic() + timeout
+        while not predicate() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return predicate()
+
+    def _assert_patches_and_resync(self):
+        self.assertEqual({"a": "on", "b": "on"}, self._stored())
+        with mock.patch.object(self.storage, 'remove_if', wraps=self.storage.remove_if) as remove_if:
+            self._patch(2, upserts=[flag("b", "off"), flag("c")], deletes=["a"])
+            self.assertTrue(self._wait_for(lambda: self._stored() == {"b": "off", "c": "on"}))
+            remove_if.assert_not_called()
+        self.assertEqual(1, self.server.connections)
+
+        # Version 3 is lost; version 4 cannot be applied, so the stream reconnects for a full snapshot.
+        self.version = 3
+        self.flags["d"] = flag("d")
+        self._patch(4, upserts=[flag("e")])
+        self.assertTrue(self._wait_for(lambda: self._stored() == {"b": "off", "c": "on", "d": "on", "e": "on"}))
+        self.assertEqual(2, self.server.connections)
+        self.assertEqual([], self.errors)
+
+    def test_patches_and_resync(self):
+        self._streamer(FlagConfigStreamApi("deployment_key", self.server.url, 2000))
+        self._assert_patches_and_resync()
+
+    def test_patches_and_resync_async(self):
+        loop_thread = EventLoopThread()
+        try:
+            self._streamer(AsyncFlagConfigStreamApi("deployment_key", self.server.url, 2000, loop_thread.loop))
+            self._assert_patches_and_resync()
+        finally:
+            self.streamer.stop()
+            loop_thread.stop()
+
+    def test_patch_without_patch_callback_resyncs(self):
+        updates = []
+        api = FlagConfigStreamApi("deployment_key", self.server.url, 2000)
+        self.streamer = api
+        api.start(updates.append, self.errors.append)
+        self._patch(2, upserts=[flag("c")])
+        self.assertTrue(self._wait_for(lambda: len(updates) == 2))
+        self.assertEqual(["a", "b", "c"], sorted(f.key for f in updates[1]))
+        self.assertEqual(2, self.server.connections)
+
+    def test_apply_patch_updates_only_changed_flags(self):
+        self.streamer = mock.Mock()
+        updater = FlagConfigStreamer(mock.Mock(), self.storage, None, mock.Mock(), logging.getLogger("test"))
+        updater.update(FlagConfigStreamDecoder().decode(json.dumps([flag("a"), flag("b")])))
+        unchanged = self.storage.get_flag_config("b")
+        updater.apply_patch(FlagConfigPatch(2, FlagConfigStreamDecoder().decode(json.dumps([flag("c")])), ["a"]))
+        self.assertEqual({"b", "c"}, set(self.storage.get_flag_configs()))
+        self.assertIs(unchanged, self.storage.get_flag_config("b"))
+
+
+if __name__ == '__main__':
+    unittest.main()
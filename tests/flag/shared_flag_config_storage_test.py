@@ -0,0 +1,103 @@
+import json
+import multiprocessing
+import os
+import unittest
+import uuid
+from unittest import mock
+
+from src.amplitude_experiment.evaluation.types import EvaluationFlag, EvaluationVariant
+from src.amplitude_experiment.flag import shared_flag_config_storage
+from src.amplitude_experiment.flag.shared_flag_config_storage import (SharedFlagConfigPublisher,
+                                                                      SharedFlagConfigStorage)
+
+
+def flag(key: str, variant: str = 'on') -> EvaluationFlag:
+    return EvaluationFlag(key=key, variants={variant: EvaluationVariant(key=variant)}, segments=[])
+
+
+def read_in_child(name: str, result):
+    storage = SharedFlagConfigStorage(name)
+    flags = storage.get_flag_configs()
+    result.value = ','.join(f"{key}={next(iter(f.variants))}" for key, f in sorted(flags.items())).encode()
+    storage.close()
+
+
+class SharedFlagConfigStorageTest(unittest.TestCase):
+
+    def setUp(self):
+        self.name = f'amp-exp-test-{uuid.uuid4().hex[:16]}'
+        self.publisher = SharedFlagConfigPublisher(self.name, 1 << 16)
+
+    def tearDown(self):
+        self.publisher.close()
+        self.publisher.unlink()
+
+    def _publish(self, *flags):
+        self.publisher.remove_if(lambda f: True)
+        for f in flags:
+            self.publisher.put_flag_config(f)
+        self.publisher.commit()
+
+    def test_reader_sees_published_snapshot(self):
+        reader = SharedFlagConfigStorage(self.name)
+        self.assertEqual({}, reader.get_flag_configs())
+        self._publish(flag('a'), flag('b'))
+        self.assertEqual({'a', 'b'}, set(reader.get_flag_configs()))
+        self.assertEqual('on', next(iter(reader.get_flag_config('a').variants)))
+        self.assertEqual(1, reader.version())
+        reader.close()
+
+    def test_reloads_only_on_version_change(self):
+        self._publish(flag('a'))
+        reader = SharedFlagConfigStorage(self.name)
+        with mock.patch.object(shared_flag_config_storage, '_loads_flags',
+                               wraps=shared_flag_config_storage._loads_flags) as loads:
+            first = reader.get_flag_config('a')
+            self.assertIs(first, reader.get_flag_config('a'))
+            self.assertEqual(1, loads.call_count)
+            self._publish(flag('a', 'off'))
+            self.assertEqual('off', next(iter(reader.get_flag_config('a').variants)))
+            self.assertEqual(2, loads.call_count)
+        self.assertEqual(2, reader.version())
+        reader.close()
+
+    def test_unchanged_flags_are_not_republished(self):
+        self._publish(flag('a'), flag('b'))
+        self._publish(flag('b'), flag('a'))
+        self.assertEqual(1, self.publisher.version())
+        self._publish(flag('a'), flag('b', 'off'))
+        self.assertEqual(2, self.publisher.version())
+
+    def test_snapshot_is_json(self):
+        self._publish(flag('a'))
+        length = self.publisher._header[1]
+        payload = bytes(self.publisher._shm.buf[16:16 + length])
+        self.assertEqual('a', json.loads(payload)[0]['key'])
+
+    def test_reader_is_read_only(self):
+        reader = SharedFlagConfigStorage(self.name)
+        with self.assertRaises(NotImplementedError):
+            reader.put_flag_config(flag('a'))
+        reader.close()
+
+    def test_oversized_snapshot_is_not_published(self):
+        self._publish(flag('a'))
+        self._publish(*[flag(f'flag-{i}') for i in range(2000)])
+        self.assertEqual(1, self.publisher.version())
+        reader = SharedFlagConfigStorage(self.name)
+        self.assertEqual({'a'}, set(reader.get_flag_configs()))
+        reader.close()
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'requires fork')
+    def test_shared_across_processes(self):
+        self._publish(flag('a'), flag('b', 'off'))
+        context = multiprocessing.get_context('fork')
+        result = context.Array('c', 64)
+        process = context.Process(target=read_in_child, args=(self.name, result))
+        process.start()
+        process.join(10)
+        self.assertEqual(b'a=on,b=off', result.value)
+
+
+if __name__ == '__main__':
+    unittest.main()
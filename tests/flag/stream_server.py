@@ -0,0 +1,107 @@
+import asyncio
+import queue
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+
+
+class _StreamHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server: LocalStreamServer = self.server.stream_server
+        server.connections += 1
+        if server.status != 200:
+            body = b'error'
+            self.send_response(server.status)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        self._write(f"data: {server.snapshot()}\n\n")
+        while True:
+            try:
+                event = server.events.get(timeout=0.05)
+            except queue.Empty:
+                if server.closing:
+                    self.close_connection = True
+                    return
+                continue
+            if event is None:
+                self.close_connection = True
+                return
+            try:
+                self._write(event)
+            except OSError:
+                return
+
+    def _write(self, data: str):
+        encoded = data.encode()
+        self.wfile.write(f"{len(encoded):x}\r\n".encode() + encoded + b"\r\n")
+        self.wfile.flush()
+
+    def log_message(self, *args):
+        pass
+
+
+class LocalStreamServer:
+    """
+    Local stand-in for the flag config stream server. Every connection first receives the message returned by
+    snapshot, then each raw chunk passed to send(), until close_stream() ends the current connection.
+    """
+
+    def __init__(self, snapshot: Callable[[], str]):
+        self.snapshot = snapshot
+        self.status = 200
+        self.connections = 0
+        self.closing = False
+        self.events = queue.Queue()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self._server.server_address[1]}'
+
+    def start(self):
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), _StreamHandler)
+        self._server.daemon_threads = True
+        self._server.stream_server = self
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.closing = True
+        self._server.shutdown()
+        self._server.server_close()
+
+    def send(self, data: str):
+        self.events.put(data)
+
+    def send_event(self, data: str):
+        self.send(f"data: {data}\n\n")
+
+    def close_stream(self):
+        self.events.put(None)
+
+
+class EventLoopThread:
+    """Runs an asyncio event loop on a daemon thread, for the async stream API tests."""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Wait for the loop's remaining tasks, like cancelled streams closing their connection, then close it."""
+        async def drain():
+            tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        asyncio.run_coroutine_threadsafe(drain(), self.loop).result(5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(5)
+        self.loop.close()
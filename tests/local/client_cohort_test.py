@@ -0,0 +1,109 @@
+import unittest
+from unittest import mock
+
+from src.amplitude_experiment import LocalEvaluationClient, LocalEvaluationConfig, User, CohortSyncConfig
+from src.amplitude_experiment.cohort.cohort import Cohort
+from src.amplitude_experiment.evaluation.types import EvaluationFlag
+
+
+def cohort_flag(key: str, cohort_ids, group_type: str = None) -> EvaluationFlag:
+    selector = ['context', 'groups', group_type, 'cohort_ids'] if group_type else ['context', 'user', 'cohort_ids']
+    return EvaluationFlag.schema().load({
+        'key': key,
+        'variants': {'on': {'key': 'on', 'value': 'on'}},
+        'segments': [
+            {'conditions': [[{'selector': selector, 'op': 'set contains any', 'values': list(cohort_ids)}]],
+             'variant': 'on'},
+        ],
+    })
+
+
+class LocalEvaluationClientCohortTestCase(unittest.TestCase):
+    """Evaluates against flags and cohorts put into the client's storages directly, without fetching."""
+
+    def setUp(self):
+        config = LocalEvaluationConfig(cohort_sync_config=CohortSyncConfig('api-key', 'secret-key'))
+        self.client = LocalEvaluationClient('server-key', config)
+        self.client.cohort_storage.put_cohort(Cohort('c1', 0, 1, {'user'}))
+        self.client.cohort_storage.put_cohort(Cohort('g1', 0, 1, {'acme'}, 'org'))
+        self._put_flags(cohort_flag('user-flag', ['c1']), cohort_flag('group-flag', ['g1'], 'org'))
+
+    def tearDown(self):
+        self.client.stop()
+
+    def _put_flags(self, *flags):
+        storage = self.client.flag_config_storage
+        for flag in flags:
+            storage.put_flag_config(flag)
+        storage.commit()
+
+    def test_evaluates_with_user_and_group_cohorts(self):
+        variants = self.client.evaluate_v2(User(user_id='user', groups={'org': ['acme']}))
+        self.assertEqual('on', variants['user-flag'].key)
+        self.assertEqual('on', variants['group-flag'].key)
+        variants = self.client.evaluate_v2(User(user_id='other', groups={'org': ['other']}))
+        self.assertNotIn('user-flag', variants)
+        self.assertNotIn('group-flag', variants)
+
+    def test_cohort_ids_are_not_recomputed_per_evaluation(self):
+        with mock.patch('src.amplitude_experiment.flag.flag_config_storage.get_grouped_cohort_ids_from_flag') \
+                as grouped:
+            for _ in range(3):
+                self.client.evaluate_v2(User(user_id='user'))
+            grouped.assert_not_called()
+            self._put_flags(cohort_flag('other-flag', ['c1']))
+            self.client.evaluate_v2(User(user_id='user'))
+            self.assertEqual(3, grouped.call_count)
+
+    def test_enriches_only_cohorts_of_evaluated_flags(self):
+        dependent = EvaluationFlag.schema().load({
+            'key': 'dependent-flag', 'variants': {'on': {'key': 'on'}}, 'segments': [{'variant': 'on'}],
+            'dependencies': ['user-flag'],
+        })
+        self._put_flags(dependent)
+        storage = self.client.cohort_storage
+        user = User(user_id='user', groups={'org': ['acme']})
+        with mock.patch.object(storage, 'get_cohorts_for_group', wraps=storage.get_cohorts_for_group) as lookup:
+            self.client.evaluate_v2(user, {'user-flag'})
+            lookup.assert_called_once_with('User', 'user', {'c1'})
+            lookup.reset_mock()
+            # Cohorts of dependencies are looked up as well.
+            variants = self.client.evaluate_v2(user, {'dependent-flag'})
+            lookup.assert_called_once_with('User', 'user', {'c1'})
+            self.assertEqual({'dependent-flag', 'user-flag'}, set(variants))
+            lookup.reset_mock()
+            self.client.evaluate_v2(user)
+            self.assertEqual(2, lookup.call_count)
+
+    def test_cohort_membership_is_resolved_only_when_reached(self):
+        flag = EvaluationFlag.schema().load({
+            'key': 'platform-flag',
+            'variants': {'on': {'key': 'on'}},
+            'segments': [{'conditions': [
+                [{'selector': ['context', 'user', 'platform'], 'op': 'is', 'values': ['iOS']},
+                 {'selector': ['context', 'user', 'cohort_ids'], 'op': 'set contains any', 'values': ['c1']}],
+            ], 'variant': 'on'}],
+        })
+        self._put_flags(flag)
+        storage = self.client.cohort_storage
+        with mock.patch.object(storage, 'get_cohorts_for_group', wraps=storage.get_cohorts_for_group) as lookup:
+            variants = self.client.evaluate_v2(User(user_id='user', platform='Android'), {'platform-flag'})
+            self.assertNotIn('platform-flag', variants)
+            lookup.assert_not_called()
+            variants = self.client.evaluate_v2(User(user_id='user', platform='iOS'), {'platform-flag'})
+            self.assertEqual('on', variants['platform-flag'].key)
+            lookup.assert_called_once_with('User', 'user', {'c1'})
+
+    def test_missing_cohort_warning_is_rate_limited(self):
+        self._put_flags(cohort_flag('missing-flag', ['c2']))
+        with self.assertLogs(self.client.logger, level='WARNING') as log:
+            for _ in range(3):
+                self.client.evaluate_v2(User(user_id='user'), {'missing-flag'})
+            self._put_flags(cohort_flag('missing-flag', ['c2', 'c3']))
+            self.client.evaluate_v2(User(user_id='user'), {'missing-flag'})
+        self.assertEqual(2, len(log.output))
+        self.assertIn("without {'c2'} in storage", log.output[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+import unittest
+from unittest import mock
+
+from src.amplitude_experiment import LocalEvaluationClient, LocalEvaluationConfig, User, CohortSyncConfig, \
+    EvaluationCacheConfig, Variant
+from src.amplitude_experiment.cohort.cohort import Cohort
+from src.amplitude_experiment.cohort.cohort_storage import CohortStorage, InMemoryCohortStorage
+from src.amplitude_experiment.evaluation.types import EvaluationFlag
+from src.amplitude_experiment.local.evaluation_cache import get_evaluation_cache_key
+
+
+def flag(key: str, values, selector=('context', 'user', 'user_properties', 'plan'), op='is') -> EvaluationFlag:
+    return EvaluationFlag.schema().load({
+        'key': key,
+        'variants': {'on': {'key': 'on', 'value': 'on'}},
+        'segments': [{'conditions': [[{'selector': list(selector), 'op': op, 'values': values}]], 'variant': 'on'}],
+    })
+
+
+class EvaluationCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        config = LocalEvaluationConfig(cohort_sync_config=CohortSyncConfig('api-key', 'secret-key'),
+                                       evaluation_cache_config=EvaluationCacheConfig(capacity=10))
+        self.client = LocalEvaluationClient('server-key', config)
+        self._put_flags(flag('plan-flag', ['pro']), flag('cohort-flag', ['c1'], ('context', 'user', 'cohort_ids'),
+                                                         'set contains any'))
+        self.evaluate = mock.patch.object(self.client.engine, 'evaluate', wraps=self.client.engine.evaluate).start()
+
+    def tearDown(self):
+        mock.patch.stopall()
+        self.client.stop()
+
+    def _put_flags(self, *flags):
+        storage = self.client.flag_config_storage
+        for f in flags:
+            storage.put_flag_config(f)
+        storage.commit()
+
+    def test_repeated_evaluation_returns_cached_result(self):
+        user = User(user_id='user', user_properties={'plan': 'pro'})
+        variants = self.client.evaluate_v2(user)
+        self.assertEqual('on', variants['plan-flag'].key)
+        variants.clear()
+        cached = self.client.evaluate_v2(User(user_id='user', user_properties={'plan': 'pro'}))
+        self.assertEqual('on', cached['plan-flag'].key)
+        self.assertEqual(1, self.evaluate.call_count)
+
+    def test_different_attributes_or_flag_keys_are_evaluated(self):
+        self.client.evaluate_v2(User(user_id='user', user_properties={'plan': 'pro'}))
+        variants = self.client.evaluate_v2(User(user_id='user', user_properties={'plan': 'free'}))
+        self.assertNotIn('plan-flag', variants)
+        self.client.evaluate_v2(User(user_id='user', user_properties={'plan': 'pro'}), {'plan-flag'})
+        self.assertEqual(3, self.evaluate.call_count)
+
+    def test_flag_update_invalidates_cache(self):
+        user = User(user_id='user', user_properties={'plan': 'free'})
+        self.assertNotIn('plan-flag', self.client.evaluate_v2(user))
+        self._put_flags(flag('plan-flag', ['free']))
+        self.assertEqual('on', self.client.evaluate_v2(user)['plan-flag'].key)
+
+    def test_cohort_update_invalidates_cache(self):
+        user = User(user_id='user')
+        self.assertNotIn('cohort-flag', self.client.evaluate_v2(user))
+        self.client.cohort_storage.put_cohort(Cohort('c1', 0, 1, {'user'}))
+        self.assertEqual('on', self.client.evaluate_v2(user)['cohort-flag'].key)
+        self.client.cohort_storage.delete_cohort('User', 'c1')
+        self.assertNotIn('cohort-flag', self.client.evaluate_v2(user))
+
+    def test_unchanged_flag_update_keeps_cache(self):
+        user = User(user_id='user', user_properties={'plan': 'pro'})
+        self.client.evaluate_v2(user)
+        # A poll returning the same flags removes none and re-puts equal configs.
+        storage = self.client.flag_config_storage
+        storage.remove_if(lambda f: f.key not in {'plan-flag', 'cohort-flag'})
+        self._put_flags(flag('plan-flag', ['pro']), flag('cohort-flag', ['c1'], ('context', 'user', 'cohort_ids'),
+                                                         'set contains any'))
+        self.client.evaluate_v2(user)
+        self.assertEqual(1, self.evaluate.call_count)
+
+    def test_alternating_snapshots_keep_the_cache(self):
+        storage = self.client.flag_config_storage
+        old_snapshot = storage.get_snapshot()
+        self._put_flags(flag('plan-flag', ['free']))
+        new_snapshot = storage.get_snapshot()
+        cache = self.client.evaluation_cache
+        revision = self.client.cohort_storage.get_revision()
+        key = get_evaluation_cache_key(User(user_id='user'), None)
+        other_key = get_evaluation_cache_key(User(user_id='other'), None)
+        inner_cache = cache.cache
+        with mock.patch('src.amplitude_experiment.util.cache.register_after_fork') as register_after_fork:
+            cache.put(new_snapshot, revision, other_key, {'plan-flag': Variant(key='on')})
+            for snapshot, key_for_snapshot in [(old_snapshot, key), (new_snapshot, key), (old_snapshot, key)]:
+                cache.get(snapshot, revision, key_for_snapshot)
+                cache.put(snapshot, revision, key_for_snapshot, {})
+            self.assertEqual({}, cache.get(old_snapshot, revision, key))
+            self.assertIsNone(cache.get(new_snapshot, revision, key))
+            self.assertIsNone(cache.get(old_snapshot, revision, other_key))
+            self.assertIsNone(cache.get(new_snapshot, revision + 1, other_key))
+            self.assertEqual('on', cache.get(new_snapshot, revision, other_key)['plan-flag'].key)
+        self.assertIs(inner_cache, cache.cache)
+        register_after_fork.assert_not_called()
+
+    def test_cohort_storage_without_revision_is_not_cached(self):
+        class UntrackedCohortStorage(InMemoryCohortStorage):
+            get_revision = CohortStorage.get_revision
+
+        self.client.cohort_storage = UntrackedCohortStorage()
+        user = User(user_id='user', user_properties={'plan': 'pro'})
+        self.assertEqual('on', self.client.evaluate_v2(user)['plan-flag'].key)
+        self.assertEqual('on', self.client.evaluate_v2(user)['plan-flag'].key)
+        self.assertEqual(2, self.evaluate.call_count)
+
+    def test_changes_to_returned_variants_do_not_leak(self):
+        user = User(user_id='user', user_properties={'plan': 'pro'})
+        for _ in range(2):
+            variant = self.client.evaluate_v2(user)['plan-flag']
+            self.assertEqual('on', variant.value)
+            with self.assertRaises(TypeError):
+                variant.metadata['flagType'] = 'changed'
+            variant.value = 'changed'
+        self.assertEqual(1, self.evaluate.call_count)
+        self.assertEqual('on', self.client.evaluate_v2(user)['plan-flag'].value)
+        self.client.evaluation_cache = None
+        self.assertEqual('on', self.client.evaluate_v2(user)['plan-flag'].value)
+
+    def test_exposures_are_tracked_for_cached_results(self):
+        exposure_service = mock.patch.object(self.client, 'exposure_service').start()
+        options = mock.Mock(tracks_exposure=True)
+        user = User(user_id='user', user_properties={'plan': 'pro'})
+        self.client.evaluate_v2(user, options=options)
+        self.client.evaluate_v2(user, options=options)
+        self.assertEqual(2, exposure_service.track.call_count)
+
+    def test_cache_key(self):
+        self.assertEqual(get_evaluation_cache_key(User(user_properties={'a': [1, {'b': 2}]}), {'f'}),
+                         get_evaluation_cache_key(User(user_properties={'a': [1, {'b': 2}]}), {'f'}))
+        self.assertNotEqual(get_evaluation_cache_key(User(user_properties={'a': 1}), None),
+                            get_evaluation_cache_key(User(user_properties={'a': True}), None))
+        self.assertNotEqual(get_evaluation_cache_key(User(user_properties={'a': 1}), None),
+                            get_evaluation_cache_key(User(user_properties={'a': 1}), {'f'}))
+        self.assertIsNone(get_evaluation_cache_key(User(user_properties={'a': bytearray()}), None))
+        tagged = User(user_id='user')
+        tagged.tier = 'gold'
+        self.assertNotEqual(get_evaluation_cache_key(User(user_id='user'), None),
+                            get_evaluation_cache_key(tagged, None))
+
+
+if __name__ == '__main__':
+    unittest.main()
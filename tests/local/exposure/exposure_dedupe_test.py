@@ -0,0 +1,117 @@
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+import unittest
+import uuid
+
+from src.amplitude_experiment import User, Variant
+from src.amplitude_experiment.exposure import (Exposure, ExposureFilter, InMemoryExposureDedupeBackend,
+                                               SharedMemoryExposureDedupeBackend)
+
+
+def track_in_child(name: str, capacity: int, fingerprint: int, result):
+    backend = SharedMemoryExposureDedupeBackend(name, capacity)
+    result.value = 1 if backend.put_if_absent(fingerprint) else 0
+    backend.close()
+
+
+class InMemoryExposureDedupeBackendTestCase(unittest.TestCase):
+
+    def test_put_if_absent(self):
+        backend = InMemoryExposureDedupeBackend(100)
+        self.assertTrue(backend.put_if_absent(1234))
+        self.assertFalse(backend.put_if_absent(1234))
+        self.assertTrue(backend.put_if_absent(5678))
+
+    def test_exposure_filter_uses_backend(self):
+        backend = InMemoryExposureDedupeBackend(100)
+        filter1 = ExposureFilter(100, backend=backend)
+        filter2 = ExposureFilter(100, backend=backend)
+        results = {'flag-key-1': Variant(key='on', value='on')}
+        self.assertTrue(filter1.should_track(Exposure(User(user_id='user'), results)))
+        self.assertFalse(filter2.should_track(Exposure(User(user_id='user'), results)))
+
+
+class SharedMemoryExposureDedupeBackendTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.name = f'amp-exp-test-{uuid.uuid4().hex[:16]}'
+        self.backend = SharedMemoryExposureDedupeBackend(self.name, 64)
+
+    def tearDown(self):
+        self.backend.close()
+        self.backend.unlink()
+
+    def test_put_if_absent(self):
+        self.assertTrue(self.backend.put_if_absent(1234))
+        self.assertFalse(self.backend.put_if_absent(1234))
+        self.assertTrue(self.backend.put_if_absent(1234 + 64))
+
+    def test_unlink_already_destroyed_segment(self):
+        self.backend.unlink()
+        self.backend.unlink()
+
+    def test_shared_between_instances(self):
+        other = SharedMemoryExposureDedupeBackend(self.name, 64)
+        try:
+            self.assertTrue(self.backend.put_if_absent(42))
+            self.assertFalse(other.put_if_absent(42))
+        finally:
+            other.close()
+
+    def test_expiration(self):
+        backend = SharedMemoryExposureDedupeBackend(self.name, 64, ttl_millis=100)
+        try:
+            self.assertTrue(backend.put_if_absent(42))
+            time.sleep(0.15)
+            self.assertTrue(backend.put_if_absent(42))
+        finally:
+            backend.close()
+
+    def test_evicts_least_recently_seen_when_full(self):
+        backend = SharedMemoryExposureDedupeBackend(self.name, 4)
+        try:
+            for fingerprint in [4, 8, 12, 16]:
+                self.assertTrue(backend.put_if_absent(fingerprint))
+                time.sleep(0.002)
+            self.assertTrue(backend.put_if_absent(20))
+            self.assertTrue(backend.put_if_absent(4))
+            self.assertFalse(backend.put_if_absent(16))
+        finally:
+            backend.close()
+
+    def test_capacity_larger_than_segment_raises(self):
+        with self.assertRaises(ValueError):
+            SharedMemoryExposureDedupeBackend(self.name, 1 << 20)
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'requires fork')
+    def test_shared_across_processes(self):
+        context = multiprocessing.get_context('fork')
+        self.assertTrue(self.backend.put_if_absent(42))
+        for fingerprint, expected in [(42, 0), (43, 1)]:
+            result = context.Value('i', -1)
+            process = context.Process(target=track_in_child, args=(self.name, 64, fingerprint, result))
+            process.start()
+            process.join(10)
+            self.assertEqual(expected, result.value)
+        self.assertFalse(self.backend.put_if_absent(43))
+
+
+class SharedMemoryImportTestCase(unittest.TestCase):
+
+    def test_sdk_imports_without_shared_memory(self):
+        # multiprocessing.shared_memory only exists on Python 3.8+.
+        src = os.path.join(os.path.dirname(__file__), '..', '..', '..', 'src')
+        result = subprocess.run(
+            [sys.executable, '-c', "import sys\n"
+                                   "sys.modules['multiprocessing.shared_memory'] = None\n"
+                                   "import amplitude_experiment\n"
+                                   "from amplitude_experiment.exposure import SharedMemoryExposureDedupeBackend"],
+            env={**os.environ, 'PYTHONPATH': src}, capture_output=True, text=True, timeout=60)
+        self.assertEqual(0, result.returncode, result.stderr)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,10 @@
 import time
 import unittest
+from unittest import mock
 
 from src.amplitude_experiment import Variant
 from src.amplitude_experiment import User
-from src.amplitude_experiment.exposure import Exposure, ExposureFilter
+from src.amplitude_experiment.exposure import Exposure, ExposureFilter, ProbabilisticExposureFilter
 
 
 class ExposureFilterTestCase(unittest.TestCase):
@@ -125,6 +126,85 @@ class ExposureFilterTestCase(unittest.TestCase):
         self.assertFalse(exposure_filter.should_track(exposure2))
 
 
+class ExposureFingerprintTestCase(unittest.TestCase):
+
+    def test_fingerprint_matches_canonicalization(self):
+        user = User(user_id='user', device_id='device')
+        results1 = {
+            'flag-key-1': Variant(key='on', value='on'),
+            'flag-key-2': Variant(key='control', value='control'),
+            'flag-key-3': Variant(),
+        }
+        results2 = {
+            'flag-key-2': Variant(key='control ', value='control'),
+            'flag-key-1': Variant(key='on', value='on'),
+        }
+        exposure1 = Exposure(user, results1)
+        exposure2 = Exposure(user, results2)
+        self.assertEqual(exposure1.canonicalize(), exposure2.canonicalize())
+        self.assertEqual(exposure1.fingerprint(), exposure2.fingerprint())
+
+    def test_fingerprint_differs_by_variant(self):
+        user = User(user_id='user', device_id='device')
+        exposure1 = Exposure(user, {'flag-key-1': Variant(key='on'), 'flag-key-2': Variant(key='off')})
+        exposure2 = Exposure(user, {'flag-key-1': Variant(key='off'), 'flag-key-2': Variant(key='on')})
+        self.assertNotEqual(exposure1.fingerprint(), exposure2.fingerprint())
+
+    def test_fingerprint_does_not_canonicalize(self):
+        user = User(user_id='user', device_id='device')
+        exposure = Exposure(user, {'flag-key-2': Variant(key='off'), 'flag-key-1': Variant(key='on')})
+        with mock.patch.object(Exposure, 'canonicalize', side_effect=AssertionError('canonicalize called')):
+            fingerprint = exposure.fingerprint()
+        self.assertLess(fingerprint, 2 ** 64)
+        reordered = Exposure(user, {'flag-key-1': Variant(key='on'), 'flag-key-2': Variant(key='off')})
+        self.assertEqual(reordered.fingerprint(), fingerprint)
+
+    def test_fingerprint_differs_by_user_without_variants(self):
+        exposure1 = Exposure(User(user_id='user1'), {'flag-key-1': Variant()})
+        exposure2 = Exposure(User(user_id='user2'), {'flag-key-1': Variant()})
+        self.assertNotEqual(exposure1.fingerprint(), exposure2.fingerprint())
+
+    def test_flag_fingerprints_are_stable(self):
+        user = User(user_id='user', device_id='device')
+        exposure = Exposure(user, {'flag-key-1': Variant(key='on')})
+        self.assertEqual(Exposure(user, {'flag-key-1': Variant(key='on')}).flag_fingerprints(),
+                         exposure.flag_fingerprints())
+        self.assertLess(exposure.flag_fingerprints()['flag-key-1'], 2 ** 64)
+
+
+class ProbabilisticExposureFilterTestCase(unittest.TestCase):
+
+    def test_duplicate_exposures(self):
+        exposure_filter = ProbabilisticExposureFilter(1000, 0.001)
+        user = User(user_id='user', device_id='device')
+        results = {
+            'flag-key-1': Variant(key='on', value='on'),
+            'flag-key-2': Variant(key='control', value='control'),
+        }
+        self.assertTrue(exposure_filter.should_track(Exposure(user, results)))
+        self.assertFalse(exposure_filter.should_track(Exposure(user, dict(reversed(list(results.items()))))))
+
+    def test_different_users(self):
+        exposure_filter = ProbabilisticExposureFilter(1000, 0.001)
+        results = {'flag-key-1': Variant(key='on', value='on')}
+        self.assertTrue(exposure_filter.should_track(Exposure(User(user_id='user1'), results)))
+        self.assertTrue(exposure_filter.should_track(Exposure(User(user_id='user2'), results)))
+
+    def test_empty_results(self):
+        exposure_filter = ProbabilisticExposureFilter(1000, 0.001)
+        self.assertFalse(exposure_filter.should_track(Exposure(User(user_id='user'), {})))
+
+    def test_expiration(self):
+        exposure_filter = ProbabilisticExposureFilter(1000, 0.001, 500)
+        exposure = Exposure(User(user_id='user'), {'flag-key-1': Variant(key='on', value='on')})
+        self.assertTrue(exposure_filter.should_track(exposure))
+        time.sleep(0.6)
+        # Still remembered by the previous generation.
+        self.assertFalse(exposure_filter.should_track(exposure))
+        time.sleep(1.1)
+        self.assertTrue(exposure_filter.should_track(exposure))
+
+
 if __name__ == '__main__':
     unittest.main()
 
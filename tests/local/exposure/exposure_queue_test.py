@@ -0,0 +1,133 @@
+import threading
+import unittest
+from unittest.mock import MagicMock
+
+from src.amplitude_experiment import Variant
+from src.amplitude_experiment import User
+from src.amplitude_experiment.exposure import (AsyncExposureService, Exposure, ExposureFilter,
+                                               ExposureQueueOverflowPolicy)
+
+
+def exposure_for(user_id: str) -> Exposure:
+    return Exposure(User(user_id=user_id), {'flag-key-1': Variant(key='on', value='on')})
+
+
+class AsyncExposureServiceTestCase(unittest.TestCase):
+
+    def test_track_runs_on_worker_thread(self):
+        amplitude = MagicMock()
+        threads = []
+        amplitude.track.side_effect = lambda event: threads.append(threading.current_thread())
+        service = AsyncExposureService(amplitude, ExposureFilter(100), 10)
+        service.track(exposure_for('user'))
+        self.assertTrue(service.flush(1))
+        self.assertEqual(1, len(threads))
+        self.assertIsNot(threading.current_thread(), threads[0])
+        metrics = service.get_metrics()
+        self.assertEqual(1, metrics.enqueued)
+        self.assertEqual(1, metrics.processed)
+        self.assertEqual(0, metrics.size)
+        service.stop(1)
+
+    def test_dedupe_happens_on_worker(self):
+        amplitude = MagicMock()
+        service = AsyncExposureService(amplitude, ExposureFilter(100), 10)
+        service.track(exposure_for('user'))
+        service.track(exposure_for('user'))
+        self.assertTrue(service.flush(1))
+        self.assertEqual(1, amplitude.track.call_count)
+        service.stop(1)
+
+    def _blocked_service(self, policy: ExposureQueueOverflowPolicy):
+        release = threading.Event()
+        started = threading.Event()
+        tracked = []
+
+        def track(event):
+            started.set()
+            release.wait(5)
+            tracked.append(event.user_id)
+
+        amplitude = MagicMock()
+        amplitude.track.side_effect = track
+        service = AsyncExposureService(amplitude, ExposureFilter(100), 2, policy)
+        service.track(exposure_for('in-flight'))
+        started.wait(1)
+        return service, release, tracked
+
+    def test_drop_newest_on_overflow(self):
+        service, release, tracked = self._blocked_service(ExposureQueueOverflowPolicy.DROP_NEWEST)
+        for user_id in ['a', 'b', 'c']:
+            service.track(exposure_for(user_id))
+        self.assertEqual(1, service.get_metrics().dropped)
+        release.set()
+        self.assertTrue(service.stop(1))
+        self.assertEqual(['in-flight', 'a', 'b'], tracked)
+
+    def test_drop_oldest_on_overflow(self):
+        service, release, tracked = self._blocked_service(ExposureQueueOverflowPolicy.DROP_OLDEST)
+        for user_id in ['a', 'b', 'c']:
+            service.track(exposure_for(user_id))
+        self.assertEqual(1, service.get_metrics().dropped)
+        release.set()
+        self.assertTrue(service.stop(1))
+        self.assertEqual(['in-flight', 'b', 'c'], tracked)
+
+    def test_flush_times_out_while_blocked(self):
+        service, release, tracked = self._blocked_service(ExposureQueueOverflowPolicy.DROP_NEWEST)
+        self.assertFalse(service.flush(0.1))
+        release.set()
+        self.assertTrue(service.flush(1))
+
+    def test_track_after_stop_is_dropped(self):
+        amplitude = MagicMock()
+        service = AsyncExposureService(amplitude, ExposureFilter(100), 10)
+        service.stop(1)
+        service.track(exposure_for('user'))
+        self.assertEqual(1, service.get_metrics().dropped)
+        amplitude.track.assert_not_called()
+
+    def test_worker_survives_tracking_failure(self):
+        amplitude = MagicMock()
+        amplitude.track.side_effect = [RuntimeError('test'), None]
+        service = AsyncExposureService(amplitude, ExposureFilter(100), 10, logger=MagicMock())
+        service.track(exposure_for('user1'))
+        service.track(exposure_for('user2'))
+        self.assertTrue(service.flush(1))
+        metrics = service.get_metrics()
+        self.assertEqual(1, metrics.failed)
+        self.assertEqual(1, metrics.processed)
+        service.stop(1)
+
+    def test_failed_event_does_not_drop_rest_of_batch(self):
+        amplitude = MagicMock()
+        amplitude.track.side_effect = [None, RuntimeError('test'), None, None]
+        service = AsyncExposureService(amplitude, ExposureFilter(100), 10, logger=MagicMock(),
+                                       batch_window_millis=200)
+        for user_id in ('user1', 'user2', 'user3', 'user4'):
+            service.track(exposure_for(user_id))
+        self.assertTrue(service.flush(2))
+        self.assertEqual(4, amplitude.track.call_count)
+        metrics = service.get_metrics()
+        self.assertEqual(1, metrics.failed)
+        self.assertEqual(3, metrics.processed)
+        service.stop(1)
+
+    def test_batch_window_coalesces_same_user_flag_variant(self):
+        amplitude = MagicMock()
+        service = AsyncExposureService(amplitude, ExposureFilter(100), 10, batch_window_millis=200)
+        user = User(user_id='user')
+        service.track(Exposure(user, {'flag-key-1': Variant(key='on'), 'flag-key-2': Variant(key='on')}))
+        service.track(Exposure(user, {'flag-key-1': Variant(key='on'), 'flag-key-3': Variant(key='on')}))
+        service.track(Exposure(User(user_id='other'), {'flag-key-1': Variant(key='on')}))
+        self.assertTrue(service.flush(2))
+        tracked = sorted((call.args[0].user_id, call.args[0].event_properties['[Experiment] Flag Key'])
+                         for call in amplitude.track.call_args_list)
+        self.assertEqual([('other', 'flag-key-1'), ('user', 'flag-key-1'), ('user', 'flag-key-2'),
+                          ('user', 'flag-key-3')], tracked)
+        self.assertEqual(3, service.get_metrics().processed)
+        service.stop(1)
+
+
+if __name__ == '__main__':
+    unittest.main()
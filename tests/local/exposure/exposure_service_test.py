@@ -6,7 +6,7 @@ from amplitude import Amplitude
 from src.amplitude_experiment import Variant
 from src.amplitude_experiment import User
 from src.amplitude_experiment.exposure import Exposure, ExposureFilter, DAY_MILLIS, to_exposure_events, ExposureService
-from src.amplitude_experiment.util import hash_code
+from src.amplitude_experiment.util import hash64
 
 user = User(user_id='user', device_id='device', user_properties={'user_prop': True}, country='country')
 
@@ -133,10 +133,48 @@ class ExposureServiceTestCase(unittest.TestCase):
                     self.assertEqual({}, unset_properties)
             
             # Validate insert id
-            canonicalization = exposure.canonicalize()
-            expected = f'{user.user_id} {user.device_id} {hash_code(flag_key + " " + canonicalization)} {int(exposure.timestamp / DAY_MILLIS)}'
+            variant_key = variant.key if variant.key else 'None'
+            fingerprint = hash64(f'{user.user_id} {user.device_id} {flag_key} {variant_key}')
+            expected = f'{user.user_id} {user.device_id} {fingerprint} {int(exposure.timestamp / DAY_MILLIS)}'
             self.assertEqual(expected, event.insert_id)
 
+    def test_insert_id_independent_of_other_flags(self):
+        variant = Variant(key='on', value='on')
+        exposure1 = Exposure(user, {'flag-key-1': variant})
+        exposure2 = Exposure(user, {'flag-key-1': variant, 'flag-key-2': Variant(key='off', value='off')})
+        insert_id1 = to_exposure_events(exposure1, DAY_MILLIS)[0].insert_id
+        insert_ids2 = {e.event_properties['[Experiment] Flag Key']: e.insert_id
+                       for e in to_exposure_events(exposure2, DAY_MILLIS)}
+        self.assertEqual(insert_id1, insert_ids2['flag-key-1'])
+        self.assertNotEqual(insert_ids2['flag-key-1'], insert_ids2['flag-key-2'])
+
+    def test_track_batch(self):
+        instance = Amplitude('')
+        instance.track = MagicMock()
+        service = ExposureService(instance, ExposureFilter(10))
+        results = {'flag-key-1': Variant(key='on')}
+        service.track_batch([Exposure(user, results), Exposure(user, results)])
+        self.assertEqual(1, instance.track.call_count)
+
+    def test_track_batch_coalesces_duplicate_flag_exposures(self):
+        instance = Amplitude('')
+        instance.track = MagicMock()
+        service = ExposureService(instance, ExposureFilter(10))
+        exposure1 = Exposure(user, {'flag-key-1': Variant(key='on'), 'flag-key-2': Variant(key='on')})
+        exposure2 = Exposure(user, {'flag-key-1': Variant(key='on'), 'flag-key-2': Variant(key='off')})
+        self.assertEqual(0, service.track_batch([exposure1, exposure2]))
+        insert_ids = [call.args[0].insert_id for call in instance.track.call_args_list]
+        self.assertEqual(3, len(insert_ids))
+        self.assertEqual(3, len(set(insert_ids)))
+
+    def test_track_batch_logs_with_configured_logger(self):
+        instance = Amplitude('')
+        instance.track = MagicMock(side_effect=RuntimeError('failed'))
+        logger = MagicMock()
+        service = ExposureService(instance, ExposureFilter(10), logger)
+        self.assertEqual(1, service.track_batch([Exposure(user, {'flag-key-1': Variant(key='on')})]))
+        logger.warning.assert_called_once()
+
     def test_tracking_called(self):
         instance = Amplitude('')
         instance.track = MagicMock()
@@ -0,0 +1,113 @@
+import json
+import multiprocessing
+import os
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.amplitude_experiment import LocalEvaluationClient, LocalEvaluationConfig, User
+
+
+def flag(key: str, variant: str) -> dict:
+    return {"key": key, "variants": {variant: {"key": variant, "value": variant}},
+            "segments": [{"variant": variant}]}
+
+
+class _FlagsHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = json.dumps([flag('flag', self.server.variant)]).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def evaluate_until(client: LocalEvaluationClient, variant: str, timeout: float) -> str:
+    deadline = time.monotonic() + timeout
+    value = None
+    while time.monotonic() < deadline:
+        value = client.evaluate_v2(User(user_id='user')).get('flag').value
+        if value == variant:
+            break
+        time.sleep(0.02)
+    return value
+
+
+@unittest.skipUnless(hasattr(os, 'register_at_fork'), 'requires fork')
+class LocalEvaluationClientForkTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _FlagsHandler)
+        self.server.daemon_threads = True
+        self.server.variant = 'on'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        config = LocalEvaluationConfig(server_url=f'http://127.0.0.1:{self.server.server_address[1]}',
+                                       flag_config_polling_interval_millis=50)
+        self.client = LocalEvaluationClient('server-key', config)
+
+    def tearDown(self):
+        self.client.stop()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_child_keeps_snapshot_and_restarts_polling(self):
+        self.client.start()
+        self.assertEqual('on', self.client.evaluate_v2(User(user_id='user'))['flag'].value)
+
+        context = multiprocessing.get_context('fork')
+        forked = context.Event()
+        updated = context.Event()
+        result = context.Array('c', 64)
+
+        def child():
+            client = self.client
+            initial = client.evaluate_v2(User(user_id='user'))['flag'].value
+            forked.set()
+            updated.wait(10)
+            result.value = f"{initial},{evaluate_until(client, 'off', 10)}".encode()
+
+        # A lock held by another thread at fork time stays held in the child unless it is rebuilt there.
+        holding = threading.Event()
+        release = threading.Event()
+
+        def hold_storage_lock():
+            with self.client.flag_config_storage.flag_configs_lock:
+                holding.set()
+                release.wait(10)
+
+        threading.Thread(target=hold_storage_lock, daemon=True).start()
+        holding.wait(10)
+        process = context.Process(target=child)
+        process.start()
+        release.set()
+        self.assertTrue(forked.wait(10))
+        # Only the child's own poller can pick up the change.
+        self.client.stop()
+        self.server.variant = 'off'
+        updated.set()
+        process.join(15)
+        self.assertEqual(b'on,off', result.value)
+
+    def test_child_of_unstarted_client_does_not_start(self):
+        context = multiprocessing.get_context('fork')
+        result = context.Value('i', -1)
+
+        def child():
+            time.sleep(0.2)
+            result.value = len(self.client.evaluate_v2(User(user_id='user')))
+
+        process = context.Process(target=child)
+        process.start()
+        process.join(10)
+        self.assertEqual(0, result.value)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,8 +3,9 @@ import unittest
 from concurrent.futures import Future
 from unittest.mock import MagicMock
 
-from src.amplitude_experiment import LocalEvaluationClient, LocalEvaluationConfig
+from src.amplitude_experiment import LocalEvaluationClient, LocalEvaluationConfig, User, Variant
 from src.amplitude_experiment.assignment import AssignmentConfig
+from src.amplitude_experiment.exposure import Exposure
 from src.amplitude_experiment.exposure.exposure_config import ExposureConfig
 
 API_KEY = 'server-api-key'
@@ -74,6 +75,21 @@ class LocalEvaluationClientStopTestCase(unittest.TestCase):
         exposure_amplitude.flush.assert_called_once()
         exposure_amplitude.shutdown.assert_not_called()
 
+    def test_stop_drains_async_exposure_queue_before_flush(self):
+        config = LocalEvaluationConfig(exposure_config=ExposureConfig(api_key='analytics-api-key',
+                                                                      async_tracking=True))
+        client = LocalEvaluationClient(API_KEY, config)
+        calls = []
+        exposure_amplitude = MagicMock()
+        exposure_amplitude.track.side_effect = lambda event: calls.append('track')
+        exposure_amplitude.flush.side_effect = lambda: calls.append('flush') or []
+        client.exposure_service.amplitude = exposure_amplitude
+        client.exposure_service.track(Exposure(User(user_id='user'), {'flag': Variant(key='on')}))
+
+        client.stop()
+
+        self.assertEqual(['track', 'flush'], calls)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,37 @@
+import unittest
+
+from src.amplitude_experiment.util.bloom_filter import RotatingBloomFilter
+
+
+class RotatingBloomFilterTestCase(unittest.TestCase):
+
+    def test_put_if_absent(self):
+        bloom_filter = RotatingBloomFilter(100, 0.01, 60000)
+        self.assertTrue(bloom_filter.put_if_absent('a'))
+        self.assertFalse(bloom_filter.put_if_absent('a'))
+        self.assertTrue(bloom_filter.put_if_absent('b'))
+
+    def test_memory_is_fixed(self):
+        bloom_filter = RotatingBloomFilter(10000, 0.001, 60000)
+        memory = bloom_filter.memory_bytes
+        for i in range(50000):
+            bloom_filter.put_if_absent(f'user-{i}')
+        self.assertEqual(memory, bloom_filter.memory_bytes)
+
+    def test_false_positive_rate_at_capacity(self):
+        capacity = 20000
+        bloom_filter = RotatingBloomFilter(capacity, 0.01, 60000)
+        for i in range(capacity):
+            bloom_filter.put_if_absent(f'seen-{i}')
+        false_positives = sum(1 for i in range(capacity) if bloom_filter.contains(f'unseen-{i}'))
+        self.assertLess(false_positives / capacity, 0.02)
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            RotatingBloomFilter(0, 0.01, 1000)
+        with self.assertRaises(ValueError):
+            RotatingBloomFilter(100, 1.5, 1000)
+
+
+if __name__ == '__main__':
+    unittest.main()
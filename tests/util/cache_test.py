@@ -0,0 +1,69 @@
+import threading
+import time
+import unittest
+
+from src.amplitude_experiment.util.cache import Cache, ShardedCache
+
+
+class CacheTestCase(unittest.TestCase):
+
+    def test_lru_eviction(self):
+        cache = Cache(2, 1000)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+        self.assertEqual(1, cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(3, cache.get('c'))
+
+    def test_ttl_expiration(self):
+        cache = Cache(10, 100)
+        cache.put('a', 1)
+        time.sleep(0.15)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(0, len(cache))
+
+    def test_put_if_absent(self):
+        cache = Cache(10, 1000)
+        self.assertTrue(cache.put_if_absent('a', 1))
+        self.assertFalse(cache.put_if_absent('a', 2))
+        self.assertEqual(1, cache.get('a'))
+
+
+class ShardedCacheTestCase(unittest.TestCase):
+
+    def test_small_capacity_uses_single_shard(self):
+        cache = ShardedCache(2, 1000)
+        self.assertEqual(1, len(cache.shards))
+
+    def test_shard_capacity_covers_total_capacity(self):
+        cache = ShardedCache(65536, 1000)
+        self.assertEqual(16, len(cache.shards))
+        self.assertGreaterEqual(sum(shard.capacity for shard in cache.shards), 65536)
+
+    def test_concurrent_put_if_absent_inserts_once(self):
+        cache = ShardedCache(100000, 60000)
+        keys = [f'key-{i}' for i in range(2000)]
+        inserted = []
+        lock = threading.Lock()
+
+        def worker():
+            count = 0
+            for key in keys:
+                if cache.put_if_absent(key, object()):
+                    count += 1
+            with lock:
+                inserted.append(count)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(keys), sum(inserted))
+        self.assertEqual(len(keys), len(cache))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import gc
+import os
+import subprocess
+import sys
+import threading
+import unittest
+from unittest import mock
+
+from src.amplitude_experiment.util import fork
+
+
+class _Component:
+
+    def __init__(self, calls: list, name: str):
+        self.calls = calls
+        self.name = name
+        fork.register_after_fork(self._reinit_after_fork)
+
+    def _reinit_after_fork(self):
+        self.calls.append(self.name)
+
+
+class ForkTestCase(unittest.TestCase):
+
+    def setUp(self):
+        # An isolated registry, so running the child callbacks here leaves the objects of other tests alone.
+        mock.patch.multiple(fork, _callbacks=[], _callbacks_lock=threading.Lock(), _prune_at=64).start()
+
+    def tearDown(self):
+        mock.patch.stopall()
+
+    def test_callbacks_run_in_order_and_collected_instances_are_dropped(self):
+        calls = []
+        first = _Component(calls, 'first')
+        collected = _Component(calls, 'collected')
+        second = _Component(calls, 'second')
+        del collected
+        gc.collect()
+        fork._after_fork_in_child()
+        self.assertEqual(['first', 'second'], calls)
+        self.assertFalse(any(ref() is None for ref, _ in fork._callbacks))
+        self.assertIsNotNone(first and second)
+
+    def test_collected_instances_are_pruned_on_registration(self):
+        components = [_Component([], str(i)) for i in range(64)]
+        del components
+        gc.collect()
+        kept = _Component([], 'kept')
+        self.assertEqual(1, len(fork._callbacks))
+        self.assertIs(kept, fork._callbacks[0][0]())
+
+    def test_no_errors_at_exit(self):
+        src = os.path.join(os.path.dirname(__file__), '..', '..', 'src')
+        result = subprocess.run(
+            [sys.executable, '-c', "from amplitude_experiment import Experiment\n"
+                                   "Experiment.initialize_local('server-key').stop()"],
+            env={**os.environ, 'PYTHONPATH': src}, capture_output=True, text=True, timeout=60)
+        self.assertEqual('', result.stderr)
+
+
+if __name__ == '__main__':
+    unittest.main()
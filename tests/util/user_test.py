@@ -1,7 +1,64 @@
+import json
 import unittest
 
+from typing import Any, Dict
+
 from src.amplitude_experiment import User
-from src.amplitude_experiment.util.user import user_to_evaluation_context
+from src.amplitude_experiment.user import FIELDS
+from src.amplitude_experiment.evaluation.select import select
+from src.amplitude_experiment.util.user import user_to_evaluation_context, UserEvaluationContext
+
+
+def baseline_evaluation_context(user: User) -> Dict[str, Any]:
+    """user_to_evaluation_context as it was before UserEvaluationContext, for comparison."""
+    user_groups = user.groups
+    user_group_properties = user.group_properties
+    user_group_cohort_ids = user.group_cohort_ids
+    # The attributes the baseline read from user.__dict__, before the predefined fields moved to slots.
+    attributes = {**{field: getattr(user, field) for field in FIELDS}, **user.__dict__}
+    user_dict = {key: value for key, value in attributes.items() if value is not None}
+    user_dict.pop('groups', None)
+    user_dict.pop('group_properties', None)
+    user_dict.pop('group_cohort_ids', None)
+    context = {'user': user_dict} if len(user_dict) > 0 else {}
+
+    if user_groups is None:
+        return context
+
+    groups: Dict[str, Dict[str, Any]] = {}
+    for group_type, group_names in user_groups.items():
+        if isinstance(group_names, list) and len(group_names) > 0:
+            group_name = group_names[0]
+        else:
+            continue
+
+        group_name_map = {'group_name': group_name}
+
+        if user_group_properties:
+            group_properties_type = user_group_properties.get(group_type)
+            if group_properties_type:
+                group_properties_name = group_properties_type.get(group_name)
+                if group_properties_name:
+                    group_name_map['group_properties'] = group_properties_name
+
+        if user_group_cohort_ids:
+            group_cohort_ids_type = user_group_cohort_ids.get(group_type)
+            if group_cohort_ids_type:
+                group_cohort_ids_name = group_cohort_ids_type.get(group_name)
+                if group_cohort_ids_name:
+                    group_name_map['cohort_ids'] = group_cohort_ids_name
+
+        groups[group_type] = group_name_map
+
+    context['groups'] = groups
+    return context
+
+
+def user_with_attributes(**attributes: Any) -> User:
+    user = User()
+    for name, value in attributes.items():
+        setattr(user, name, value)
+    return user
 
 
 def test_user_to_evaluation_context(self):
@@ -94,5 +151,81 @@ def test_user_to_evaluation_context_only_groups_no_group_props(self):
     }, context)
 
 
+class UserEvaluationContextTestCase(unittest.TestCase):
+
+    SELECTORS = [
+        ['context'],
+        ['context', 'user'],
+        ['context', 'user', 'user_id'],
+        ['context', 'user', 'device_id'],
+        ['context', 'user', 'country'],
+        ['context', 'user', 'user_properties'],
+        ['context', 'user', 'user_properties', 'k'],
+        ['context', 'user', 'user_properties', 'missing'],
+        ['context', 'user', 'cohort_ids'],
+        ['context', 'user', 'groups'],
+        ['context', 'user', 'unknown'],
+        ['context', 'user', 'account_tier'],
+        ['context', 'user', 'removed'],
+        ['context', 'groups'],
+        ['context', 'groups', 'type'],
+        ['context', 'groups', 'type', 'group_name'],
+        ['context', 'groups', 'type', 'group_properties'],
+        ['context', 'groups', 'type', 'group_properties', 'gk'],
+        ['context', 'groups', 'type', 'cohort_ids'],
+        ['context', 'groups', 'empty'],
+        ['context', 'groups', 'missing', 'group_name'],
+        ['context', 'unknown'],
+    ]
+
+    USERS = [
+        User(),
+        User(user_id='user_id'),
+        User(device_id='device_id', user_properties={'k': 'v'}, cohort_ids=['c1']),
+        User(groups={'type': ['name'], 'empty': []}),
+        User(user_id='user_id', country='country', user_properties={'k': None},
+             groups={'type': ['name', 'other']},
+             group_properties={'type': {'name': {'gk': 'gv'}, 'other': {'gk': 'ov'}}},
+             group_cohort_ids={'type': {'name': ['g1']}}),
+        User(groups={'type': ['name']}, group_properties={'type': {}}, group_cohort_ids={}),
+        user_with_attributes(user_id='user_id', account_tier='gold', removed=None),
+        user_with_attributes(account_tier='gold'),
+        user_with_attributes(removed=None),
+    ]
+
+    def test_selects_the_values_of_the_context_dict(self):
+        for user in self.USERS:
+            expected = {'context': baseline_evaluation_context(user)}
+            actual = {'context': UserEvaluationContext(user)}
+            for selector in self.SELECTORS:
+                with self.subTest(user=user, selector=selector):
+                    self.assertEqual(select(expected, selector), select(actual, selector))
+            self.assertEqual(expected['context'], user_to_evaluation_context(user))
+
+    def test_to_dict(self):
+        user = User(user_id='user_id', user_properties={'k': 'v'}, groups={'type': ['name']},
+                    group_properties={'type': {'name': {'gk': 'gv'}}})
+        self.assertEqual({
+            'user': {'user_id': 'user_id', 'user_properties': {'k': 'v'}},
+            'groups': {'type': {'group_name': 'name', 'group_properties': {'gk': 'gv'}}},
+        }, UserEvaluationContext(user).to_dict())
+        self.assertEqual({}, UserEvaluationContext(User()).to_dict())
+
+    def test_user_accepts_other_attributes(self):
+        user = User(user_id='user_id')
+        self.assertEqual({}, user.__dict__)
+        user.account_tier = 'gold'
+        self.assertEqual('gold', json.loads(user.to_json())['account_tier'])
+
+    def test_user_to_json(self):
+        user = User(user_id='user_id', device_id='device_id', user_properties={'k': 'v'})
+        self.assertEqual('{"device_id": "device_id", "user_id": "user_id", "country": null, "city": null, '
+                         '"region": null, "dma": null, "language": null, "platform": null, "version": null, '
+                         '"os": null, "device_manufacturer": null, "device_brand": null, "device_model": null, '
+                         '"carrier": null, "library": null, "ip_address": null, "user_properties": {"k": "v"}, '
+                         '"groups": null, "group_properties": null, "group_cohort_ids": null, "cohort_ids": null}',
+                         user.to_json())
+
+
 if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    unittest.main()